@@ -1,19 +1,99 @@
-from typing import List
-from fastapi import APIRouter
-from app.models.mongoengine_models import Notification
-from app.schema.notification import NotificationOut
+import base64
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Literal, Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.repositories.base import NotificationCursor, NotificationFilter, NotificationRepository
+from app.repositories.registry import get_notification_repository
+from app.schema.notification import NotificationMethod, NotificationOut
 
 router = APIRouter(tags=["Notifications"])
 
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+
+
+def encode_cursor(row: dict) -> str:
+    """Opaque page token for the (sent_at, _id) of the last row returned"""
+    raw = f"{row['sent_at'].isoformat()}|{row['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> NotificationCursor:
+    try:
+        sent_at, object_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(sent_at), ObjectId(object_id)
+    except (ValueError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored times are naive UTC"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _to_json(row: dict) -> dict:
+    row = {field: value for field, value in row.items() if field != "_id"}
+    if isinstance(row.get("sent_at"), datetime):
+        row["sent_at"] = row["sent_at"].isoformat()
+    return row
+
+
+async def _export(
+    notifications: NotificationRepository,
+    filters: NotificationFilter,
+    after: Optional[NotificationCursor]
+) -> AsyncIterator[bytes]:
+    # One chunk per batch, so memory stays bounded by EXPORT_BATCH_SIZE rows
+    async for batch in notifications.iter_batches(filters, EXPORT_BATCH_SIZE, after):
+        yield "".join(json.dumps(_to_json(row)) + "\n" for row in batch).encode()
+
 
 @router.get(
     "/notifications",
     response_model=List[NotificationOut],
-    summary="List recent notifications",
-    description="Retrieve the latest 100 notifications sent to users, sorted by most recent first.",
+    summary="List notifications",
+    description=(
+        "Notifications sent to users, most recent first, optionally filtered by email, method, album "
+        "and sent time range. Pages hold up to `limit` notifications; when there are more, the "
+        "`X-Next-Cursor` response header holds the `cursor` of the next page. With `format=ndjson`, "
+        "every matching notification is streamed as one JSON object per line and `limit` is ignored."
+    ),
     response_description="List of notification documents",
+    responses={200: {"content": {"application/x-ndjson": {}}}},
     tags=["Notifications"]
 )
-async def list_notifications():
-    notifications = Notification.objects.order_by('-sent_at').limit(100)
-    return list(notifications)
+async def list_notifications(
+    email: Optional[str] = Query(None, example="user@example.com"),
+    method: Optional[NotificationMethod] = Query(None),
+    album_id: Optional[str] = Query(None, example="4uLU6hMCjMI75M1A2tKUQC"),
+    since: Optional[datetime] = Query(None, description="Sent at or after this time"),
+    until: Optional[datetime] = Query(None, description="Sent before this time"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    format: Literal["json", "ndjson"] = Query("json"),
+    notifications: NotificationRepository = Depends(get_notification_repository)
+):
+    filters = NotificationFilter(
+        email=email,
+        method=method.value if method else None,
+        album_id=album_id,
+        since=_utc(since),
+        until=_utc(until),
+    )
+    after = decode_cursor(cursor) if cursor else None
+    if format == "ndjson":
+        return StreamingResponse(_export(notifications, filters, after), media_type="application/x-ndjson")
+
+    # Rows are already projected; skip model validation and serialize them directly
+    rows = await notifications.page(filters, limit + 1, after)
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(rows[-1])
+    return JSONResponse([_to_json(row) for row in rows], headers=headers)
@@ -1,19 +1,34 @@
-from fastapi import APIRouter, Query
-from app.core.spotify_client import SpotifyClient
+from fastapi import APIRouter, HTTPException, Query, status
+from app.core.spotify_client import spotify_client
+from app.core.spotify_scheduler import CircuitOpenError, RateLimitedError
 from app.models.spotify import SearchArtistsResponse
+from app.core.config import settings
+from app.services.artist_catalog import artist_catalog
+from app.services.search_cache import create_search_cache
 
 router = APIRouter(tags=["Spotify"])
-spotify_client = SpotifyClient()
+search_cache = create_search_cache()
 
 
 @router.get(
     "/search_artists",
     response_model=SearchArtistsResponse,
     summary="Search for artists on Spotify",
-    description="Search for artists by name using the Spotify API.",
+    description="Search for artists by name, served from the local artist catalog when it has enough recently updated matches and from the Spotify API otherwise.",
     response_description="List of matched artists",
     tags=["Spotify"]
 )
 async def search(q: str = Query(description="Artist name to search for")):
-    artists = await spotify_client.search_artists(q)
-    return {"artists": artists}
+    artists = artist_catalog.search(q)
+    if len(artists) >= settings.artist_catalog_min_results and artist_catalog.is_fresh(artists):
+        return {"artists": artists}
+
+    try:
+        fetched = await search_cache.get_or_fetch(q, spotify_client.search_artists)
+    except (RateLimitedError, CircuitOpenError) as e:
+        # Nothing is cached or added to the catalog for a failed lookup
+        if artists:
+            return {"artists": artists}
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Spotify search unavailable: {e}")
+    await artist_catalog.add_many(fetched)
+    return {"artists": fetched}
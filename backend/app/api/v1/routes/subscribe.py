@@ -1,16 +1,24 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import JSONResponse
-from app.models.mongoengine_models import User, ArtistSubscription as MongoEngineArtistSubscription
 from app.schema.user import UserIn, UserOut
 from fastapi import status
 from app.models.user_update import UpdateTelegramID, UpdatePhoneNumber
 from app.models.user_response import UserResponse
 from app.models.response import MessageResponse
-from datetime import datetime
+from app.repositories.base import UserRepository
+from app.repositories.registry import get_user_repository
+from app.services.artist_catalog import artist_catalog
 
 router = APIRouter(tags=["Subscription"])
 
 
+async def add_to_catalog(user: UserIn):
+    """Make subscribed artists searchable from the local catalog"""
+    await artist_catalog.add_many(
+        {"id": artist.id, "name": artist.name} for artist in (user.subscribed_artists or [])
+    )
+
+
 @router.post(
     "/subscribe",
     summary="Subscribe or update user preferences",
@@ -18,40 +26,23 @@ router = APIRouter(tags=["Subscription"])
     response_description="Confirmation of subscription update",
     status_code=status.HTTP_200_OK,
 )
-async def subscribe(user: UserIn):
-    # Check if user exists
-    existing_user = User.objects(email=user.email).first()
-    
-    # Convert Pydantic ArtistSubscription to MongoEngine ArtistSubscription
-    mongoengine_artists = [
-        MongoEngineArtistSubscription(
-            id=artist.id,
-            name=artist.name or "",
-            url=artist.url
-        ) for artist in (user.subscribed_artists or [])
-    ]
-    
-    if existing_user:
-        # Update existing user
-        existing_user.subscribed_artists = mongoengine_artists
-        existing_user.notification_methods = user.notification_methods or []
-        existing_user.telegram_chat_id = user.telegram_chat_id
-        existing_user.phone_number = user.phone_number
-        
-        existing_user.save()
-        return JSONResponse(content={"message": "User preferences updated successfully"}, status_code=200)
-    else:
-        # Create new user
-        new_user = User(
-            email=user.email,
-            subscribed_artists=mongoengine_artists,
-            notification_methods=user.notification_methods or [],
-            telegram_chat_id=user.telegram_chat_id,
-            phone_number=user.phone_number
-        )
-        
-        new_user.save()
+async def subscribe(user: UserIn, users: UserRepository = Depends(get_user_repository)):
+    # Create the user or replace their preferences in one atomic upsert
+    created = await users.upsert({
+        "email": user.email,
+        "subscribed_artists": [
+            {"id": artist.id, "name": artist.name or "", "url": artist.url}
+            for artist in (user.subscribed_artists or [])
+        ],
+        "notification_methods": user.notification_methods or [],
+        "telegram_chat_id": user.telegram_chat_id,
+        "phone_number": user.phone_number,
+    })
+    await add_to_catalog(user)
+
+    if created:
         return JSONResponse(content={"message": "User subscribed successfully"}, status_code=201)
+    return JSONResponse(content={"message": "User preferences updated successfully"}, status_code=200)
 
 
 @router.get(
@@ -63,17 +54,17 @@ async def subscribe(user: UserIn):
     status_code=status.HTTP_200_OK,
 )
 async def get_subscribe(
-    email: str = Query(description="The user's email address")
+    email: str = Query(description="The user's email address"),
+    users: UserRepository = Depends(get_user_repository)
 ):
     if not email:
         raise HTTPException(status_code=400, detail="Email is required")
-    
-    user = User.objects(email=email).first()
-    print('user ====> ', user)
+
+    user = await users.get(email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    return UserOut.from_user(user)
+    return UserOut(**user)
 
 
 @router.post(
@@ -87,15 +78,10 @@ async def get_subscribe(
         404: {"description": "User not found"},
     },
 )
-async def update_telegram_id(data: UpdateTelegramID):
-    user = User.objects(email=data.email).first()
-    if not user:
+async def update_telegram_id(data: UpdateTelegramID, users: UserRepository = Depends(get_user_repository)):
+    if not await users.update(data.email, telegram_chat_id=data.telegram_chat_id):
         raise HTTPException(status_code=404, detail="User not found")
 
-    user.telegram_chat_id = data.telegram_chat_id
-    user.updated_at = datetime.utcnow()
-    await user.save()
-
     return JSONResponse(content={"message": "Telegram ID updated successfully"}, status_code=200)
 
 
@@ -110,13 +96,8 @@ async def update_telegram_id(data: UpdateTelegramID):
         404: {"description": "User not found"},
     },
 )
-async def update_phone_number(data: UpdatePhoneNumber):
-    user = User.objects(email=data.email).first()
-    if not user:
+async def update_phone_number(data: UpdatePhoneNumber, users: UserRepository = Depends(get_user_repository)):
+    if not await users.update(data.email, phone_number=data.phone_number):
         raise HTTPException(status_code=404, detail="User not found")
 
-    user.phone_number = data.phone_number
-    user.updated_at = datetime.utcnow()
-    await user.save()
-
     return JSONResponse(content={"message": "Phone number updated successfully"}, status_code=200)
\ No newline at end of file
@@ -11,28 +11,130 @@ class Settings(BaseSettings):
     # MongoDB settings
     mongo_uri: str = "mongodb://localhost:27017/"
     database_name: str = "music_notifier"
+    # "beanie" (asyncio driver) or "mongoengine" (blocking driver in worker threads)
+    data_backend: str = "beanie"
 
     # Spotify settings
     spotify_client_id: str = ""
     spotify_client_secret: str = ""
+    spotify_http2: bool = True
+    spotify_max_connections: int = 100
+    spotify_max_keepalive_connections: int = 20
+    spotify_keepalive_expiry: float = 30
+    spotify_timeout: float = 10
+    spotify_connect_timeout: float = 5
+    # Shared budget for all Spotify requests made by one process
+    spotify_rate_limit: float = 10
+    spotify_rate_burst: float = 20
+    spotify_circuit_failure_threshold: int = 5
+    spotify_circuit_reset_timeout: float = 30
+    spotify_backoff_base: float = 0.5
+    spotify_backoff_max: float = 30
+    # Renew the access token this many seconds before it expires
+    spotify_token_refresh_margin: float = 60
+
+    # Artist search cache: "memory" (per process) or "redis" (shared)
+    search_cache_backend: str = "memory"
+    search_cache_ttl: float = 300
+    search_cache_max_size: int = 10000
+    redis_url: str = "redis://localhost:6379/0"
+
+    # Local artist catalog: fewer matches than this falls back to Spotify,
+    # and so do matches not updated from Spotify for the last refresh seconds
+    artist_catalog_min_results: int = 5
+    artist_catalog_refresh_seconds: float = 86400
 
     # Email settings
     from_email: str = ""
     smtp_server: str = "smtp.gmail.com"
-    smtp_port: int = "587"
+    smtp_port: int = 587
     smtp_user: str = ""
     smtp_password: str = ""
+    smtp_start_tls: bool = True
+    smtp_timeout: float = 30
+    smtp_pool_size: int = 4
+    smtp_max_messages_per_connection: int = 100
 
     # Notification settings
     telegram_bot_token: str = ""
+    # Bot API session: pooled connections, and at most one message per chat per interval
+    telegram_api_url: str = "https://api.telegram.org/bot"
+    telegram_pool_size: int = 32
+    telegram_timeout: float = 10
+    telegram_per_chat_interval: float = 1.0
     twilio_account_sid: str = ""
     twilio_auth_token: str = ""
     twilio_phone_number: str = ""
+    # Twilio REST API, reached through one pooled HTTP client
+    twilio_api_url: str = "https://api.twilio.com"
+    twilio_max_connections: int = 10
+    twilio_timeout: float = 30
+    # One GSM-7 segment; longer SMS bodies are shortened, keeping the link
+    sms_max_length: int = 160
+
+    # Notifier settings
+    notifier_user_batch_size: int = 1000
+    notifier_album_batch_size: int = 200
+    # "pushdown": ask Mongo for the subscribers of each album batch's artists;
+    # "scan": read every user and match in Python
+    notifier_matching: str = "pushdown"
+    # Digest mode: one message per user and channel listing all of a run's matched
+    # albums; with a window, releases accumulate until a digest is that old
+    notifier_digest: bool = False
+    notifier_digest_window_seconds: int = 0
+    # browse/new-releases markets, comma separated, and pages (of 50) per market
+    release_markets: str = "US"
+    release_max_pages: int = 2
+    # Also poll every subscribed artist's albums, not just browse/new-releases
+    notifier_poll_artists: bool = True
+    artist_poll_concurrency: int = 10
+    artist_poll_chunk_size: int = 500
+    ledger_flush_size: int = 500
+    ledger_flush_interval: float = 5.0
+
+    # Outbox: deliveries are queued in Mongo and claimed by workers; a failed send
+    # is retried after outbox_backoff_base * 2^(attempts - 1) seconds (capped at
+    # outbox_backoff_max) and dead-lettered after outbox_max_attempts attempts
+    outbox_max_attempts: int = 5
+    outbox_backoff_base: float = 30
+    outbox_backoff_max: float = 3600
+    # A claim not completed within this long (e.g. the worker died) is claimed again
+    outbox_lease_seconds: float = 300
+    # Longest a run spends sending; what is left is sent by the outbox job
+    outbox_drain_seconds: float = 600
+    # How often the outbox job sends retries that have come due
+    outbox_poll_seconds: int = 60
+    # Sent messages are deleted after this long; the ledger keeps the record
+    outbox_retention_seconds: int = 7 * 24 * 3600
+
+    # Run coordination between instances: the notifier runs every interval,
+    # one instance per shard, holding a lease renewed every ttl / 3 seconds
+    notifier_interval_seconds: int = 3600
+    notifier_lease_ttl: float = 60
+    notifier_shard_count: int = 1
+    # Worker processes that run leased shards in parallel (0 = on the event loop)
+    notifier_processes: int = 0
+    # Lease owner name; defaults to hostname:pid
+    instance_id: str = ""
+
+    # Dispatcher settings: workers and messages/second per channel (0 = unlimited)
+    dispatcher_queue_size: int = 1000
+    email_concurrency: int = 10
+    email_rate_limit: float = 0
+    telegram_concurrency: int = 30
+    telegram_rate_limit: float = 30
+    sms_concurrency: int = 5
+    sms_rate_limit: float = 1
 
     # Allow CORS origins to be overridden via environment variable
     # Format: "https://domain1.com,https://domain2.com"
     cors_origins_env: str = ""
 
+    @property
+    def get_release_markets(self) -> List[str]:
+        """Markets to fetch new releases for"""
+        return [market.strip().upper() for market in self.release_markets.split(",") if market.strip()]
+
     @property
     def get_cors_origins(self) -> List[str]:
         """Get CORS origins, with environment variable override support"""
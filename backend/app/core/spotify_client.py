@@ -1,26 +1,94 @@
 import httpx
 import base64
-from app.core.config import settings
 import asyncio
+from app.core.config import settings
+from app.core.spotify_scheduler import Priority, RateLimitedError, SpotifyRequestScheduler
 from app.utils.logger import get_logger
 from datetime import datetime, timedelta
+from typing import Optional
 
 logger = get_logger(__name__)
 
+# Spotify's limit for GET /albums?ids=
+MAX_ALBUMS_PER_REQUEST = 20
+
 
 class SpotifyClient:
-    def __init__(self):
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
         self.client_id = settings.spotify_client_id
         self.client_secret = settings.spotify_client_secret
         self.token_url = "https://accounts.spotify.com/api/token"
         self.api_url = "https://api.spotify.com/v1"
         self.access_token = None
         self.expires_at = datetime.now()
+        self._transport = transport
+        self._http: Optional[httpx.AsyncClient] = None
+        self._refresh: Optional[asyncio.Future] = None
+        self._renewal: Optional[asyncio.Task] = None
+        self.scheduler = SpotifyRequestScheduler(
+            rate_per_second=settings.spotify_rate_limit,
+            burst=settings.spotify_rate_burst,
+            failure_threshold=settings.spotify_circuit_failure_threshold,
+            reset_timeout=settings.spotify_circuit_reset_timeout,
+            backoff_base=settings.spotify_backoff_base,
+            backoff_max=settings.spotify_backoff_max,
+        )
+
+    async def start(self):
+        """Open the pooled HTTP client shared by every Spotify call"""
+        if self._http is not None:
+            return
+        self._http = httpx.AsyncClient(
+            http2=settings.spotify_http2,
+            limits=httpx.Limits(
+                max_connections=settings.spotify_max_connections,
+                max_keepalive_connections=settings.spotify_max_keepalive_connections,
+                keepalive_expiry=settings.spotify_keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                settings.spotify_timeout,
+                connect=settings.spotify_connect_timeout,
+            ),
+            transport=self._transport,
+        )
+
+    async def close(self):
+        if self._renewal is not None:
+            self._renewal.cancel()
+            self._renewal = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
 
-    async def authenticate(self):
-        if self.access_token and datetime.now() < self.expires_at:
+    async def _client(self) -> httpx.AsyncClient:
+        # Background jobs may run before the app's startup hook has opened it
+        if self._http is None:
+            await self.start()
+        return self._http
+
+    async def authenticate(self, stale_token: Optional[str] = None) -> str:
+        """Return a valid access token, refreshing it at most once at a time.
+
+        Concurrent callers share the in-flight refresh. Passing ``stale_token``
+        (a token Spotify just rejected) forces a refresh unless another caller
+        has already replaced that token.
+        """
+        if self._token_valid() and (stale_token is None or stale_token != self.access_token):
             return self.access_token
+        # No await between the check and creating the future, so exactly one
+        # coroutine starts the refresh and the rest await the same future
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.ensure_future(self._fetch_token())
+        return await asyncio.shield(self._refresh)
+
+    def _token_valid(self) -> bool:
+        margin = timedelta(seconds=settings.spotify_token_refresh_margin)
+        return bool(self.access_token) and datetime.now() < self.expires_at - margin
 
+    async def _get_access_token(self) -> str:
+        return await self.authenticate()
+
+    async def _fetch_token(self) -> str:
         logger.info("Refreshing Spotify access token...")
 
         auth_header = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode()
@@ -30,54 +98,121 @@ class SpotifyClient:
         }
         data = {"grant_type": "client_credentials"}
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(self.token_url, data=data, headers=headers)
-            response.raise_for_status()
-            token_info = response.json()
-            self.access_token = token_info["access_token"]
-            expires_in = token_info.get("expires_in", 3600)  # default 1 hour
-            self.expires_at = datetime.now() + timedelta(seconds=expires_in)
+        client = await self._client()
+        response = await client.post(self.token_url, data=data, headers=headers)
+        response.raise_for_status()
+        token_info = response.json()
+        self.access_token = token_info["access_token"]
+        expires_in = token_info.get("expires_in", 3600)  # default 1 hour
+        self.expires_at = datetime.now() + timedelta(seconds=expires_in)
+        self._schedule_renewal()
         return self.access_token
 
-    # add rety logic
-    async def request_with_retry(self, url: str, headers: dict, params: dict = None, max_retries: int = 3):
-        retries = 0
-        while retries < max_retries:
-            try:
-                retries += 1
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(url, headers=headers, params=params)
-                    if response.status_code == 429:
-                        logger.warning(f"Spotify rate limited. Retrying after {response.headers['Retry-After']} seconds.")
-                        await asyncio.sleep(response.headers["Retry-After"])
-                        continue
-                    response.raise_for_status()
-                    return response.json()
-            except httpx.HTTPError as e:
-                if retries >= max_retries:
-                    raise e
-                await asyncio.sleep(2 ** retries)
-        logger.error(f"Failed to fetch from Spotify after {max_retries} attempts.")
-        return None
-
-    async def get_new_releases(self, country: str = "US", limit: int = 10):
-        if not self.access_token:
-            await self.authenticate()
-
-        print(self.access_token)
+    def _schedule_renewal(self):
+        """Refresh in the background shortly before the token expires, while the client is open"""
+        if self._http is None:
+            return
+        if self._renewal is not None and not self._renewal.done():
+            self._renewal.cancel()
+        self._renewal = asyncio.create_task(self._renew_before_expiry())
+
+    async def _renew_before_expiry(self):
+        margin = timedelta(seconds=settings.spotify_token_refresh_margin)
+        delay = (self.expires_at - margin - datetime.now()).total_seconds()
+        await asyncio.sleep(max(delay, 0))
+        try:
+            await self.authenticate(stale_token=self.access_token)
+        except Exception as e:
+            logger.warning(f"Background Spotify token renewal failed: {e}")
+
+    async def request_with_retry(
+        self,
+        url: str,
+        headers: dict,
+        params: dict = None,
+        max_retries: int = 3,
+        priority: Priority = Priority.BACKGROUND
+    ):
+        client = await self._client()
+        response = await self.scheduler.run(
+            lambda: client.get(url, headers=headers, params=params),
+            priority=priority,
+            max_retries=max_retries,
+        )
+        if response.status_code == 401:
+            # Token expired or revoked early: refresh once and retry transparently
+            rejected = headers.get("Authorization", "").removeprefix("Bearer ")
+            token = await self.authenticate(stale_token=rejected)
+            headers = {**headers, "Authorization": f"Bearer {token}"}
+            response = await self.scheduler.run(
+                lambda: client.get(url, headers=headers, params=params),
+                priority=priority,
+                max_retries=max_retries,
+            )
+        if response.status_code == 429:
+            logger.error(f"Failed to fetch from Spotify after {max_retries} attempts.")
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    async def get_new_releases(self, country: str = "US", limit: int = 10, offset: int = 0):
         headers = {
-            "Authorization": f"Bearer {self.access_token}"
+            "Authorization": f"Bearer {await self._get_access_token()}"
         }
 
-        releases = await self.request_with_retry(f"{self.api_url}/browse/new-releases", headers, params={"country": country, "limit": limit})
+        params = {"country": country, "limit": limit, "offset": offset}
+        releases = await self.request_with_retry(f"{self.api_url}/browse/new-releases", headers, params=params)
         return releases
     
+    async def get_artist_albums(
+        self,
+        artist_id: str,
+        include_groups: str = "album,single",
+        limit: int = 50,
+        since: Optional[str] = None,
+        max_pages: int = 5
+    ):
+        """An artist's albums, newest first within each group.
+
+        Groups are fetched one at a time, so a long album list can't push the
+        singles off the first page. With ``since`` (a release date), pages
+        are followed until they reach albums released before it. Raises
+        RateLimitedError rather than returning a partial list.
+        """
+        albums = []
+        for group in include_groups.split(","):
+            url = f"{self.api_url}/artists/{artist_id}/albums"
+            params = {"include_groups": group, "limit": limit}
+            for _ in range(max_pages):
+                headers = {
+                    "Authorization": f"Bearer {await self._get_access_token()}"
+                }
+                data = await self.request_with_retry(url, headers, params=params)
+                if data is None:
+                    raise RateLimitedError(f"Spotify rate limited the albums of artist {artist_id}")
+                albums.extend(data["items"])
+                oldest = (data["items"][-1].get("release_date") or "") if data["items"] else ""
+                if since is None or not data.get("next") or oldest < since:
+                    break
+                # The next URL carries its own query string
+                url, params = data["next"], None
+        return albums
+
+    async def get_albums(self, album_ids: list):
+        """Full album objects, up to MAX_ALBUMS_PER_REQUEST ids per call"""
+        if len(album_ids) > MAX_ALBUMS_PER_REQUEST:
+            raise ValueError(f"At most {MAX_ALBUMS_PER_REQUEST} album ids per request")
+        headers = {
+            "Authorization": f"Bearer {await self._get_access_token()}"
+        }
+        data = await self.request_with_retry(f"{self.api_url}/albums", headers, params={"ids": ",".join(album_ids)})
+        if data is None:
+            raise RateLimitedError(f"Spotify rate limited {len(album_ids)} album lookups")
+        return [album for album in data["albums"] if album]
+
     async def search_artists(self, keyword: str):
-        # implment call spotify search
-        if not self.access_token:
-            await self.authenticate()
         headers = {
-            "Authorization": f"Bearer {self.access_token}"
+            "Authorization": f"Bearer {await self._get_access_token()}"
         }
         params = {
             "q": keyword,
@@ -88,8 +223,12 @@ class SpotifyClient:
         data = await self.request_with_retry(
                 f"{self.api_url}/search",
                 headers=headers,
-                params=params   
+                params=params,
+                priority=Priority.INTERACTIVE
             )
+        if data is None:
+            # Not "no artists": an empty result would be cached as one
+            raise RateLimitedError(f"Spotify rate limited the search for {keyword!r}")
         return [
             {
                 "name": item["name"],
@@ -99,3 +238,7 @@ class SpotifyClient:
             }
             for item in data["artists"]["items"]
         ]
+
+
+# Shared by the API routes and the notifier so they reuse one connection pool
+spotify_client = SpotifyClient()
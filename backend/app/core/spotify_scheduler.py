@@ -0,0 +1,179 @@
+"""
+Process-wide scheduler for Spotify Web API requests
+"""
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Awaitable, Callable, List, Optional
+import httpx
+from app.utils.logger import get_logger
+from app.utils.rate_limit import TokenBucket
+
+logger = get_logger(__name__)
+
+
+class Priority(IntEnum):
+    """Lower values are served first"""
+    INTERACTIVE = 0  # user-facing requests such as /search_artists
+    BACKGROUND = 1  # scheduled polling
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised without calling Spotify while the circuit breaker is open"""
+
+
+class RateLimitedError(ConnectionError):
+    """Spotify still answered 429 after every retry"""
+
+
+def parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    """Seconds to wait from a Retry-After header given as seconds or an HTTP date"""
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+class SpotifyRequestScheduler:
+    """Coordinates every Spotify request made by this process.
+
+    - one token bucket shared by all coroutines, handing out permits by priority
+      so interactive traffic overtakes queued background polling;
+    - a 429 ``Retry-After`` pauses all callers, not just the one that got it;
+    - transport errors and 5xx responses are retried with full-jitter
+      exponential backoff and feed a circuit breaker that fails fast for
+      ``reset_timeout`` seconds after ``failure_threshold`` consecutive failures.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float = 10,
+        burst: Optional[float] = None,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30
+    ):
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._waiters: List[tuple] = []
+        self._sequence = itertools.count()
+        self._pump_task: Optional[asyncio.Task] = None
+        self._paused_until = 0.0
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._half_open_trial = False
+
+    @property
+    def circuit_open(self) -> bool:
+        return self._opened_at is not None
+
+    def pause(self, seconds: float):
+        """Hold back every queued request for ``seconds``"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def run(
+        self,
+        send: Callable[[], Awaitable[httpx.Response]],
+        priority: Priority = Priority.BACKGROUND,
+        max_retries: int = 3
+    ) -> httpx.Response:
+        """Call ``send`` when a permit is available, retrying 429s, 5xx and transport errors.
+
+        Returns the last response, which may still be a 429 or 5xx once the
+        retries are used up; transport errors are re-raised.
+        """
+        response = None
+        for attempt in range(1, max_retries + 1):
+            probing = self._check_circuit()
+            try:
+                await self._acquire(priority)
+                try:
+                    response = await send()
+                except httpx.TransportError:
+                    self._record_failure()
+                    if attempt >= max_retries:
+                        raise
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+
+                if response.status_code == 429:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    logger.warning(f"Spotify rate limited. Pausing all requests for {retry_after} seconds.")
+                    self.pause(retry_after)
+                    continue
+                if response.status_code >= 500:
+                    self._record_failure()
+                    if attempt < max_retries:
+                        await asyncio.sleep(self._backoff(attempt))
+                    continue
+
+                self._record_success()
+                return response
+            finally:
+                # However the probe ended (a 429, cancellation, any other error),
+                # the next request may probe again
+                if probing:
+                    self._half_open_trial = False
+        return response
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _acquire(self, priority: Priority):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        await future
+
+    async def _pump(self):
+        """Hand out permits to the highest-priority waiter as tokens become available"""
+        while self._waiters:
+            delay = self._paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            await self.bucket.acquire()
+            while self._waiters:
+                _, _, future = heapq.heappop(self._waiters)
+                if not future.done():  # skip callers that gave up
+                    future.set_result(None)
+                    break
+
+    def _check_circuit(self) -> bool:
+        """Raise while the circuit is open; True if this request is the half-open probe"""
+        if self._opened_at is None:
+            return False
+        if time.monotonic() - self._opened_at < self.reset_timeout or self._half_open_trial:
+            raise CircuitOpenError("Spotify circuit breaker is open")
+        self._half_open_trial = True  # let one request probe the API
+        return True
+
+    def _record_success(self):
+        if self._opened_at is not None:
+            logger.info("Spotify circuit breaker closed")
+        self._failures = 0
+        self._opened_at = None
+        self._half_open_trial = False
+
+    def _record_failure(self):
+        self._failures += 1
+        if self._half_open_trial or self._failures >= self.failure_threshold:
+            if not self._half_open_trial:
+                logger.error(f"Spotify circuit breaker opened after {self._failures} consecutive failures")
+            self._opened_at = time.monotonic()
+            self._half_open_trial = False
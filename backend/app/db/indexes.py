@@ -0,0 +1,135 @@
+"""
+Indexes for the users, notifications and outbox collections, created at startup
+"""
+from typing import Dict, List
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.collection import Collection
+from pymongo.database import Database
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Exactly what the hot queries need
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        # Profile reads and the subscribe upsert
+        IndexModel([("email", ASCENDING)], name="email_1", unique=True),
+        # Multikey: the subscribers of a set of artists
+        IndexModel([("subscribed_artists.id", ASCENDING)], name="subscribed_artists.id_1"),
+        # Range scans over one notifier shard
+        IndexModel([("shard_key", ASCENDING)], name="shard_key_1"),
+    ],
+    "notifications": [
+        # Dedup key; its email and (email, album_id) prefixes serve the other lookups
+        IndexModel(
+            [("email", ASCENDING), ("album_id", ASCENDING), ("method", ASCENDING)],
+            name="email_1_album_id_1_method_1",
+            unique=True,
+        ),
+        # Admin list, newest first, paged on (sent_at, _id) with or without
+        # an email or album filter; method and time range filter within these
+        IndexModel([("sent_at", DESCENDING), ("_id", DESCENDING)], name="sent_at_-1__id_-1"),
+        IndexModel(
+            [("email", ASCENDING), ("sent_at", DESCENDING), ("_id", DESCENDING)],
+            name="email_1_sent_at_-1__id_-1",
+        ),
+        IndexModel(
+            [("album_id", ASCENDING), ("sent_at", DESCENDING), ("_id", DESCENDING)],
+            name="album_id_1_sent_at_-1__id_-1",
+        ),
+    ],
+    "outbox": [
+        # Dedup: a (user, album, method) is queued once, whatever its state
+        IndexModel([("keys", ASCENDING)], name="keys_1", unique=True),
+        # Claims: the oldest due message of a channel
+        IndexModel(
+            [("channel", ASCENDING), ("state", ASCENDING), ("next_attempt_at", ASCENDING)],
+            name="channel_1_state_1_next_attempt_at_1",
+        ),
+        # Sent messages expire; dead letters are kept for inspection
+        IndexModel(
+            [("sent_at", ASCENDING)],
+            name="sent_at_1",
+            expireAfterSeconds=settings.outbox_retention_seconds,
+        ),
+    ],
+}
+
+
+# Indexes earlier versions of the models created, now covered by the ones above;
+# indexes not listed here or in INDEXES (e.g. created by hand) are left alone
+REDUNDANT: Dict[str, List[str]] = {
+    "users": ["created_at_1"],
+    "notifications": ["email_1", "album_id_1", "sent_at_1", "sent_at_-1"],
+}
+
+# Index options that must match for an existing index to count as the wanted one
+_OPTIONS = ("unique", "sparse", "expireAfterSeconds")
+
+
+def _spec(info: dict) -> tuple:
+    """(keys, options) of an index, from either IndexModel.document or index_information()"""
+    key = info["key"]
+    pairs = key.items() if hasattr(key, "items") else key
+    options = {
+        option: info[option] for option in _OPTIONS
+        if info.get(option) not in (None, False)
+    }
+    if "expireAfterSeconds" in options:
+        options["expireAfterSeconds"] = int(options["expireAfterSeconds"])
+    return [(field, int(direction)) for field, direction in pairs], options
+
+
+def _has_duplicates(collection: Collection, fields: List[str]) -> bool:
+    """Whether two documents share a value of ``fields``, so a unique index on them can't be built"""
+    # $unwind counts each element of an array field separately, like a multikey index
+    pipeline = [{"$unwind": {"path": f"${field}", "preserveNullAndEmptyArrays": True}} for field in fields]
+    pipeline += [
+        {"$group": {"_id": {field.replace(".", "_"): f"${field}" for field in fields}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": 1},
+    ]
+    return bool(list(collection.aggregate(pipeline, allowDiskUse=True)))
+
+
+def ensure_indexes(database: Database) -> Dict[str, List[str]]:
+    """Create the indexes in INDEXES and drop the REDUNDANT ones; returns the dropped names per collection.
+
+    A unique index is not built while the collection holds duplicates of its
+    keys; that is logged and any existing index of that name is kept.
+    """
+    dropped: Dict[str, List[str]] = {}
+    for collection_name, wanted in INDEXES.items():
+        collection = database[collection_name]
+        existing = collection.index_information()
+        to_create = []
+        for index in wanted:
+            name = index.document["name"]
+            keys, options = _spec(index.document)
+            if name in existing and _spec(existing[name]) == (keys, options):
+                continue
+            if options.get("unique") and _has_duplicates(collection, [field for field, _ in keys]):
+                logger.error(
+                    f"Not building unique index {name} on {collection_name}: "
+                    f"the collection holds duplicates, remove them first"
+                )
+                continue
+            # Same name with different keys or options would make create_indexes fail
+            if name in existing:
+                collection.drop_index(name)
+                dropped.setdefault(collection_name, []).append(name)
+            to_create.append(index)
+        if to_create:
+            collection.create_indexes(to_create)
+
+        # Only drop the redundant ones once their replacements exist
+        wanted_names = {index.document["name"] for index in wanted}
+        for name in REDUNDANT.get(collection_name, []):
+            if name in existing and name not in wanted_names:
+                collection.drop_index(name)
+                dropped.setdefault(collection_name, []).append(name)
+
+    for collection_name, names in dropped.items():
+        logger.info(f"Dropped indexes on {collection_name}: {', '.join(names)}")
+    return dropped
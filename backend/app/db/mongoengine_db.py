@@ -11,6 +11,17 @@ logger = logging.getLogger(__name__)
 _connected = False
 
 
+def database_uri() -> str:
+    """Connection string shared by the MongoEngine and Beanie connections"""
+    allow_invalid_host_cert = "true"
+    read_preference = 'primaryPreferred'
+    return (
+        f"{settings.mongo_uri}/{settings.database_name}"
+        "?retryWrites=true&w=majority&serverSelectionTimeoutMS=10000"
+        f"&tlsAllowInvalidHostnames={allow_invalid_host_cert}&tlsAllowInvalidCertificates={allow_invalid_host_cert}&tls=true&readPreference={read_preference}"
+    )
+
+
 def init_database():
     """Initialize MongoEngine database connection"""
     global _connected
@@ -21,13 +32,7 @@ def init_database():
             return True
             
         # Connect to MongoDB using MongoEngine
-        allow_invalid_host_cert = "true"
-        read_preference = 'primaryPreferred'
-        connect(
-            host=f"{settings.mongo_uri}/{settings.database_name}"
-                "?retryWrites=true&w=majority&serverSelectionTimeoutMS=10000"
-                f"&tlsAllowInvalidHostnames={allow_invalid_host_cert}&tlsAllowInvalidCertificates={allow_invalid_host_cert}&tls=true&readPreference={read_preference}"
-        )
+        connect(host=database_uri())
         
         _connected = True
         logger.info(f"MongoEngine database connected: {settings.database_name}")
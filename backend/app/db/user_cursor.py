@@ -0,0 +1,59 @@
+"""
+Streaming access to the users collection for background jobs
+"""
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+from pymongo import UpdateOne
+from app.models.mongoengine_models import User
+from app.repositories.base import USER_PROJECTION
+from app.utils.sharding import Shard, shard_key_for
+
+
+def iter_user_batches(
+    batch_size: int = 1000,
+    shard: Optional[Shard] = None,
+    artist_ids: Optional[Iterable[str]] = None
+) -> Iterator[List[dict]]:
+    """Stream users as raw pymongo dicts, ``batch_size`` at a time.
+
+    Uses a server-side cursor with a field projection and no result cache, so
+    memory stays bounded by one batch regardless of the collection size.
+    With ``shard``, only users whose shard key falls in its range are read;
+    with ``artist_ids``, only users subscribed to at least one of them.
+    """
+    queryset = User.objects
+    if artist_ids is not None:
+        queryset = queryset(subscribed_artists__id__in=list(artist_ids))
+    if shard is not None:
+        low, high = shard.bounds()
+        queryset = queryset(shard_key__gte=low, shard_key__lt=high)
+    queryset = (
+        queryset
+        .only(*USER_PROJECTION)
+        .as_pymongo()
+        .no_cache()
+        .batch_size(batch_size)
+    )
+    # A no-cache queryset rewinds whenever iter() is called on it again,
+    # so wrap it in a generator that consumes one cursor end to end
+    cursor = (row for row in queryset)
+    while True:
+        batch = list(islice(cursor, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def ensure_shard_keys(batch_size: int = 1000) -> int:
+    """Set the shard key on users saved before it existed; returns how many were updated"""
+    collection = User._get_collection()
+    updated = 0
+    while True:
+        rows = list(collection.find({"shard_key": None}, {"email": 1}).limit(batch_size))
+        if not rows:
+            return updated
+        collection.bulk_write([
+            UpdateOne({"_id": row["_id"]}, {"$set": {"shard_key": shard_key_for(row["email"])}})
+            for row in rows
+        ], ordered=False)
+        updated += len(rows)
@@ -7,8 +7,19 @@ from app.db.mongoengine_db import init_database, test_connection
 from app.middleware.error_handler import ErrorHandler
 from app.middleware.http_middleware import error_handling_middleware
 from app.models.mongoengine_models import User
-from app.services.notifier import check_new_releases_and_notify
+from app.services.notifier import deliver_outbox, run_notifier_cycle
+from app.services.email_sender import close_smtp_pool
+from app.services.sms_sender import close_sms_client
+from app.services.telegram_sender import close_telegram_sender, get_telegram_sender
+from app.core.spotify_client import spotify_client
+from app.services.artist_catalog import artist_catalog
+from app.db.user_cursor import ensure_shard_keys
+from app.db.indexes import ensure_indexes
+from mongoengine.connection import get_db
+from app.repositories.registry import close_repositories, init_repositories
+from app.core.config import settings
 from app.utils.scheduler import scheduler
+import asyncio
 import logging
 
 init_database()
@@ -49,6 +60,7 @@ async def startup_event():
         success = init_database()
         if success:
             logging.info("MongoEngine database initialized successfully")
+            await asyncio.to_thread(ensure_indexes, get_db())
         else:
             logging.warning("Database initialization failed, but app will continue")
     except Exception as e:
@@ -59,17 +71,52 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Application shutdown event"""
-    try:
-        from app.db.mongoengine_db import close_connection
+    from app.db.mongoengine_db import close_connection
+
+    async def close_database():
         close_connection()
         logging.info("Database connection closed")
-    except Exception as e:
-        logging.error(f"Shutdown error: {e}")
+
+    # Each in its own try, so one failure doesn't leave the rest open;
+    # the database goes last, after everything that may still write to it
+    for name, close in (
+        ("SMTP pool", close_smtp_pool),
+        ("SMS client", close_sms_client),
+        ("Telegram sender", close_telegram_sender),
+        ("Spotify client", spotify_client.close),
+        ("repositories", close_repositories),
+        ("database connection", close_database),
+    ):
+        try:
+            await close()
+        except Exception as e:
+            logging.error(f"Shutdown error closing {name}: {e}")
         
 @app.on_event("startup")
 async def startup_event():
-    # Schedule check_new_releases_and_notify to run every 1 hour
-    scheduler.add_job(check_new_releases_and_notify, "interval", hours=1)
+    try:
+        await init_repositories()
+    except Exception as e:
+        logging.error(f"Repository initialization failed: {e}")
+    await spotify_client.start()
+    if settings.telegram_bot_token:
+        try:
+            await get_telegram_sender().start()
+        except Exception as e:
+            logging.error(f"Telegram bot initialization failed, retrying on first send: {e}")
+    try:
+        await artist_catalog.load()
+    except Exception as e:
+        logging.error(f"Artist catalog load failed, search will use Spotify: {e}")
+    if settings.notifier_shard_count > 1:
+        try:
+            await asyncio.to_thread(ensure_shard_keys)
+        except Exception as e:
+            logging.error(f"Shard key backfill failed: {e}")
+    # Every worker schedules the notifier; leases make one instance run each shard per cycle
+    scheduler.add_job(run_notifier_cycle, "interval", seconds=settings.notifier_interval_seconds)
+    # Retries of failed sends; claims are atomic, so every worker can poll the outbox
+    scheduler.add_job(deliver_outbox, "interval", seconds=settings.outbox_poll_seconds)
     scheduler.start()
 
 
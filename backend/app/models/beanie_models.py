@@ -1,7 +1,7 @@
 """
 Beanie ODM models for MongoDB
 """
-from beanie import Document, Indexed
+from beanie import Document
 from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional, Literal
 from datetime import datetime
@@ -16,20 +16,18 @@ class ArtistSubscription(BaseModel):
 
 class User(Document):
     """User document model"""
-    email: Indexed(EmailStr, unique=True) = Field(..., example="user@example.com")
+    email: EmailStr = Field(..., example="user@example.com")
     subscribed_artists: List[ArtistSubscription] = Field(default_factory=list)
     notification_methods: List[str] = Field(default_factory=list, example=["telegram", "sms"])
     telegram_chat_id: Optional[str] = Field(default=None, example="123456789")
     phone_number: Optional[str] = Field(default=None, example="+201234567890")
+    shard_key: Optional[int] = Field(default=None, example=2941026151)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
     class Settings:
         name = "users"  # Collection name
-        indexes = [
-            "email",  # Single field index
-            "created_at",  # Single field index
-        ]
+        # Indexes are managed by app.db.indexes
 
     def __str__(self) -> str:
         return f"User(email={self.email})"
@@ -37,7 +35,7 @@ class User(Document):
 
 class Notification(Document):
     """Notification document model"""
-    email: Indexed(EmailStr) = Field(..., example="user@example.com")
+    email: EmailStr = Field(..., example="user@example.com")
     album_id: str = Field(..., example="4uLU6hMCjMI75M1A2tKUQC")
     album_name: str = Field(..., example="Dawn FM")
     album_artists_ids: List[str] = Field(default_factory=list)
@@ -50,12 +48,7 @@ class Notification(Document):
 
     class Settings:
         name = "notifications"  # Collection name
-        indexes = [
-            "email",  # Single field index
-            "album_id",  # Single field index
-            "sent_at",  # Single field index
-            [("email", 1), ("album_id", 1), ("method", 1)],  # Compound index
-        ]
+        # Indexes are managed by app.db.indexes
 
     def __str__(self) -> str:
         return f"Notification(email={self.email}, album={self.album_name})"
@@ -8,9 +8,12 @@ from mongoengine import (
     EmbeddedDocumentField,
     ListField,
     StringField,
-    DateTimeField
+    DateTimeField,
+    DictField,
+    IntField
 )
 from datetime import datetime
+from app.utils.sharding import shard_key_for
 
 
 class ArtistSubscription(EmbeddedDocument):
@@ -27,23 +30,24 @@ class User(Document):
     notification_methods = ListField(StringField(), default=list, example=["telegram", "sms"])
     telegram_chat_id = StringField(example="123456789")
     phone_number = StringField(example="+201234567890")
+    # crc32 of the email, used to split users between notifier shards
+    shard_key = IntField(example=2941026151)
     created_at = DateTimeField(default=datetime.utcnow)
     updated_at = DateTimeField(default=datetime.utcnow)
 
     meta = {
         'collection': 'users',
-        'indexes': [
-            'email',
-            'created_at',
-        ]
+        # Indexes are managed by app.db.indexes
+        'auto_create_index': False,
     }
 
     def __str__(self) -> str:
         return f"User(email={self.email})"
 
     def save(self, *args, **kwargs):
-        """Override save to update updated_at timestamp"""
+        """Override save to update updated_at timestamp and the shard key"""
         self.updated_at = datetime.utcnow()
+        self.shard_key = shard_key_for(self.email)
         return super().save(*args, **kwargs)
 
 
@@ -62,14 +66,110 @@ class Notification(Document):
 
     meta = {
         'collection': 'notifications',
+        # Indexes are managed by app.db.indexes
+        'auto_create_index': False,
+    }
+
+    def __str__(self) -> str:
+        return f"Notification(email={self.email}, album={self.album_name})"
+
+
+class Artist(Document):
+    """Local catalog of Spotify artists used for typeahead search"""
+    id = StringField(primary_key=True, example="1Xyo4u8uXC1ZmMpatF05PJ")
+    name = StringField(required=True, example="The Weeknd")
+    popularity = IntField(default=0, example=85)
+    image_url = StringField(example="https://i.scdn.co/image/abc123")
+    updated_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'collection': 'artists',
+    }
+
+    def __str__(self) -> str:
+        return f"Artist(name={self.name})"
+
+
+class ArtistWatermark(Document):
+    """Newest release already seen for an artist by the album poller"""
+    artist_id = StringField(primary_key=True, example="1Xyo4u8uXC1ZmMpatF05PJ")
+    last_release_date = StringField(example="2022-01-07")
+    # Albums released on last_release_date that were already handled
+    last_album_ids = ListField(StringField(), default=list)
+    polled_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'collection': 'artist_watermarks',
+    }
+
+
+class Release(Document):
+    """An album recorded the first time the notifier saw it"""
+    album_id = StringField(primary_key=True, example="4uLU6hMCjMI75M1A2tKUQC")
+    name = StringField(required=True, example="Dawn FM")
+    release_date = StringField(example="2022-01-07")
+    artist_ids = ListField(StringField(), default=list)
+    source = StringField(required=True, choices=['new_releases', 'artists'], example="new_releases")
+    # The fields of the Spotify album object that notifications need
+    album = DictField()
+    first_seen_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'collection': 'releases',
         'indexes': [
-            'email',
-            'album_id',
-            'sent_at',
-            [('email', 1), ('album_id', 1), ('method', 1)],  # Compound index
+            'first_seen_at',
+            'artist_ids',
         ]
     }
 
     def __str__(self) -> str:
-        return f"Notification(email={self.email}, album={self.album_name})"
+        return f"Release(name={self.name})"
+
+
+class IngestCursor(Document):
+    """End of the last successful notifier run for a release source, or when the last digest was sent"""
+    source = StringField(primary_key=True, example="new_releases")
+    last_success_at = DateTimeField(required=True)
+
+    meta = {
+        'collection': 'ingest_cursors',
+    }
+
 
+class JobLease(Document):
+    """Lease that lets one instance at a time run a scheduled job (or one shard of it)"""
+    name = StringField(primary_key=True, example="notifier:shard-1-of-4")
+    owner = StringField(example="worker-1:4242")
+    acquired_at = DateTimeField()
+    expires_at = DateTimeField(required=True)
+    # When the last run finished, so a cycle isn't repeated by a late instance
+    completed_at = DateTimeField()
+
+    meta = {
+        'collection': 'job_leases',
+    }
+
+
+class OutboxMessage(Document):
+    """A delivery in the outbox: pending, being sent, sent, or dead-lettered after its last attempt"""
+    channel = StringField(required=True, choices=['email', 'telegram', 'sms'], example="email")
+    recipient = StringField(required=True, example="user@example.com")
+    subject = StringField()
+    body = StringField(required=True)
+    html = StringField()
+    # "email|album_id|method" of every album the message covers; unique, so nothing is queued twice
+    keys = ListField(StringField(), default=list)
+    # Ledger records written once the message is sent
+    notifications = ListField(DictField(), default=list)
+    state = StringField(required=True, default='pending', choices=['pending', 'sending', 'sent', 'dead'])
+    attempts = IntField(default=0)
+    # When a pending message is due, or when a claim on a sending one expires
+    next_attempt_at = DateTimeField(required=True, default=datetime.utcnow)
+    claimed_by = StringField(example="worker-1:4242")
+    last_error = StringField()
+    created_at = DateTimeField(default=datetime.utcnow)
+    sent_at = DateTimeField()
+
+    meta = {
+        'collection': 'outbox',
+    }
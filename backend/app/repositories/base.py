@@ -0,0 +1,174 @@
+"""
+Data access interfaces used by the API routes and the notifier
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import AsyncIterator, Iterable, List, NamedTuple, Optional, Set, Tuple
+from bson import ObjectId
+from pymongo import DESCENDING
+from app.utils.sharding import Shard, shard_key_for
+
+# (email, album_id, method)
+SentKey = Tuple[str, str, str]
+
+# Only the fields the notifier needs to match and deliver
+USER_PROJECTION = {
+    "email": 1,
+    "subscribed_artists.id": 1,
+    "notification_methods": 1,
+    "telegram_chat_id": 1,
+    "phone_number": 1,
+}
+
+# What the admin listing returns; _id comes along for the page cursor
+NOTIFICATION_PROJECTION = {
+    "email": 1,
+    "album_id": 1,
+    "album_name": 1,
+    "album_artists_ids": 1,
+    "method": 1,
+    "sent_at": 1,
+    "spotify_url": 1,
+    "telegram_chat_id": 1,
+    "phone_number": 1,
+    "matched_artist_ids": 1,
+}
+
+# Newest first; _id breaks ties between notifications sent in the same millisecond
+NOTIFICATION_SORT = [("sent_at", DESCENDING), ("_id", DESCENDING)]
+
+# (sent_at, _id) of the last notification of the previous page
+NotificationCursor = Tuple[datetime, ObjectId]
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class NotificationFilter(NamedTuple):
+    """Admin listing filters; None means no restriction"""
+    email: Optional[str] = None
+    method: Optional[str] = None
+    album_id: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+
+
+class UserRepository(ABC):
+    """Users are plain dicts with the fields of the ``users`` collection"""
+
+    @abstractmethod
+    async def get(self, email: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def upsert(self, user: dict) -> bool:
+        """Create the user or replace their preferences; True if the user was created"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update(self, email: str, **fields) -> bool:
+        """Set fields on an existing user; False if there is no such user"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_batches(self, batch_size: int = 1000, shard: Optional[Shard] = None) -> AsyncIterator[List[dict]]:
+        """Stream users projected to USER_PROJECTION, ``batch_size`` at a time"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def find_subscribers(
+        self,
+        artist_ids: Iterable[str],
+        batch_size: int = 1000,
+        shard: Optional[Shard] = None
+    ) -> AsyncIterator[List[dict]]:
+        """Like iter_batches, but only users subscribed to at least one of ``artist_ids``"""
+        raise NotImplementedError
+
+
+class NotificationRepository(ABC):
+    """Notifications are plain dicts with the fields of the ``notifications`` collection"""
+
+    @abstractmethod
+    async def sent_keys(self, emails: Iterable[str], album_ids: Iterable[str]) -> Set[SentKey]:
+        """Every (email, album_id, method) already delivered for these users and albums"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def insert_many(self, documents: List[dict]) -> int:
+        """Insert notifications, skipping ones already recorded; returns how many were new"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def page(
+        self,
+        filters: NotificationFilter,
+        limit: int,
+        after: Optional[NotificationCursor] = None
+    ) -> List[dict]:
+        """Up to ``limit`` notifications in NOTIFICATION_SORT order that come after ``after``,
+        projected to NOTIFICATION_PROJECTION"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_batches(
+        self,
+        filters: NotificationFilter,
+        batch_size: int = 1000,
+        after: Optional[NotificationCursor] = None
+    ) -> AsyncIterator[List[dict]]:
+        """Stream every matching notification, in the same order and projection as page"""
+        raise NotImplementedError
+
+
+def user_upsert(user: dict, now: Optional[datetime] = None) -> Tuple[dict, dict]:
+    """Filter and update documents that create or update a user in one round trip"""
+    now = now or datetime.utcnow()
+    return {"email": user["email"]}, {
+        "$set": {
+            "subscribed_artists": user.get("subscribed_artists") or [],
+            "notification_methods": user.get("notification_methods") or [],
+            "telegram_chat_id": user.get("telegram_chat_id"),
+            "phone_number": user.get("phone_number"),
+            "updated_at": now,
+        },
+        "$setOnInsert": {
+            "shard_key": shard_key_for(user["email"]),
+            "created_at": now,
+        },
+    }
+
+
+def user_filter(shard: Optional[Shard] = None, artist_ids: Optional[Iterable[str]] = None) -> dict:
+    query = {}
+    if artist_ids is not None:
+        # Served by the multikey subscribed_artists.id index
+        query["subscribed_artists.id"] = {"$in": list(artist_ids)}
+    if shard is not None:
+        low, high = shard.bounds()
+        query["shard_key"] = {"$gte": low, "$lt": high}
+    return query
+
+
+def notification_filter(filters: NotificationFilter, after: Optional[NotificationCursor] = None) -> dict:
+    query = {
+        field: value
+        for field, value in (("email", filters.email), ("method", filters.method), ("album_id", filters.album_id))
+        if value is not None
+    }
+    sent_at = {}
+    if filters.since is not None:
+        sent_at["$gte"] = filters.since
+    if filters.until is not None:
+        sent_at["$lt"] = filters.until
+    if after is not None:
+        # Keyset pagination: strictly after the last row in NOTIFICATION_SORT order.
+        # The $lte bound lets the index scan start at the cursor; $or only trims ties.
+        after_sent_at, after_id = after
+        sent_at["$lte"] = after_sent_at
+        query["$or"] = [
+            {"sent_at": {"$lt": after_sent_at}},
+            {"sent_at": after_sent_at, "_id": {"$lt": after_id}},
+        ]
+    if sent_at:
+        query["sent_at"] = sent_at
+    return query
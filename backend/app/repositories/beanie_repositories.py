@@ -0,0 +1,122 @@
+"""
+Repositories on Beanie and PyMongo's native asyncio client
+"""
+from datetime import datetime
+from typing import AsyncIterator, Iterable, List, Optional, Set
+from beanie import init_beanie
+from pymongo import AsyncMongoClient
+from pymongo.errors import BulkWriteError
+from app.models.beanie_models import Notification, User
+from app.repositories.base import (
+    DUPLICATE_KEY_ERROR,
+    NOTIFICATION_PROJECTION,
+    NOTIFICATION_SORT,
+    USER_PROJECTION,
+    NotificationCursor,
+    NotificationFilter,
+    NotificationRepository,
+    SentKey,
+    UserRepository,
+    notification_filter,
+    user_filter,
+    user_upsert,
+)
+from app.utils.logger import get_logger
+from app.utils.sharding import Shard
+
+logger = get_logger(__name__)
+
+
+async def connect_beanie(uri: str, database_name: str) -> AsyncMongoClient:
+    client = AsyncMongoClient(uri)
+    # Indexes are created by app.db.indexes at startup
+    await init_beanie(database=client[database_name], document_models=[User, Notification], skip_indexes=True)
+    return client
+
+
+async def _stream(cursor, batch_size: int) -> AsyncIterator[List[dict]]:
+    """Group the rows of an async cursor into lists of ``batch_size``"""
+    cursor.batch_size(batch_size)
+    batch = []
+    async for row in cursor:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class BeanieUserRepository(UserRepository):
+
+    async def get(self, email: str) -> Optional[dict]:
+        user = await User.find_one(User.email == email)
+        return user.model_dump(exclude={"id", "revision_id"}) if user else None
+
+    async def upsert(self, user: dict) -> bool:
+        query, update = user_upsert(user)
+        result = await User.get_pymongo_collection().update_one(query, update, upsert=True)
+        return result.upserted_id is not None
+
+    async def update(self, email: str, **fields) -> bool:
+        update = {"$set": {**fields, "updated_at": datetime.utcnow()}}
+        result = await User.get_pymongo_collection().update_one({"email": email}, update)
+        return result.matched_count == 1
+
+    def iter_batches(self, batch_size: int = 1000, shard: Optional[Shard] = None) -> AsyncIterator[List[dict]]:
+        return _stream(User.get_pymongo_collection().find(user_filter(shard), USER_PROJECTION), batch_size)
+
+    def find_subscribers(
+        self,
+        artist_ids: Iterable[str],
+        batch_size: int = 1000,
+        shard: Optional[Shard] = None
+    ) -> AsyncIterator[List[dict]]:
+        query = user_filter(shard, artist_ids)
+        return _stream(User.get_pymongo_collection().find(query, USER_PROJECTION), batch_size)
+
+
+class BeanieNotificationRepository(NotificationRepository):
+
+    async def sent_keys(self, emails: Iterable[str], album_ids: Iterable[str]) -> Set[SentKey]:
+        emails, album_ids = list(set(emails)), list(set(album_ids))
+        if not emails or not album_ids:
+            return set()
+        cursor = Notification.get_pymongo_collection().find(
+            {"email": {"$in": emails}, "album_id": {"$in": album_ids}},
+            {"_id": 0, "email": 1, "album_id": 1, "method": 1},
+        )
+        return {(row["email"], row["album_id"], row["method"]) async for row in cursor}
+
+    async def insert_many(self, documents: List[dict]) -> int:
+        try:
+            result = await Notification.get_pymongo_collection().insert_many(documents, ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            logger.info(f"Skipped {len(errors)} notifications already in the ledger")
+            return e.details.get("nInserted", 0)
+
+    async def page(
+        self,
+        filters: NotificationFilter,
+        limit: int,
+        after: Optional[NotificationCursor] = None
+    ) -> List[dict]:
+        cursor = Notification.get_pymongo_collection().find(
+            notification_filter(filters, after), NOTIFICATION_PROJECTION, sort=NOTIFICATION_SORT, limit=limit
+        )
+        return await cursor.to_list()
+
+    def iter_batches(
+        self,
+        filters: NotificationFilter,
+        batch_size: int = 1000,
+        after: Optional[NotificationCursor] = None
+    ) -> AsyncIterator[List[dict]]:
+        cursor = Notification.get_pymongo_collection().find(
+            notification_filter(filters, after), NOTIFICATION_PROJECTION, sort=NOTIFICATION_SORT
+        )
+        return _stream(cursor, batch_size)
@@ -0,0 +1,136 @@
+"""
+In-memory repositories with the same behaviour as the Mongo ones, for tests
+"""
+import copy
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set
+from bson import ObjectId
+from app.repositories.base import (
+    NOTIFICATION_PROJECTION,
+    NotificationCursor,
+    NotificationFilter,
+    NotificationRepository,
+    SentKey,
+    UserRepository,
+    user_upsert,
+)
+from app.utils.sharding import Shard
+
+
+class InMemoryUserRepository(UserRepository):
+
+    def __init__(self):
+        self.users: Dict[str, dict] = {}
+
+    async def get(self, email: str) -> Optional[dict]:
+        user = self.users.get(email)
+        return copy.deepcopy(user) if user is not None else None
+
+    async def upsert(self, user: dict) -> bool:
+        _, update = user_upsert(user)
+        created = user["email"] not in self.users
+        stored = self.users.setdefault(user["email"], {"email": user["email"]})
+        if created:
+            stored.update(update["$setOnInsert"])
+        stored.update(copy.deepcopy(update["$set"]))
+        return created
+
+    async def update(self, email: str, **fields) -> bool:
+        user = self.users.get(email)
+        if user is None:
+            return False
+        user.update(fields, updated_at=datetime.utcnow())
+        return True
+
+    def iter_batches(self, batch_size: int = 1000, shard: Optional[Shard] = None) -> AsyncIterator[List[dict]]:
+        return self._stream(batch_size, shard)
+
+    def find_subscribers(
+        self,
+        artist_ids: Iterable[str],
+        batch_size: int = 1000,
+        shard: Optional[Shard] = None
+    ) -> AsyncIterator[List[dict]]:
+        return self._stream(batch_size, shard, set(artist_ids))
+
+    async def _stream(
+        self,
+        batch_size: int,
+        shard: Optional[Shard] = None,
+        artist_ids: Optional[Set[str]] = None
+    ) -> AsyncIterator[List[dict]]:
+        batch = []
+        for user in list(self.users.values()):
+            if shard is not None and user.get("shard_key") not in shard:
+                continue
+            if artist_ids is not None and not any(a["id"] in artist_ids for a in user.get("subscribed_artists") or []):
+                continue
+            batch.append(self._project(user))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _project(user: dict) -> dict:
+        row = {
+            field: copy.deepcopy(user[field])
+            for field in ("email", "notification_methods", "telegram_chat_id", "phone_number")
+            if field in user
+        }
+        row["subscribed_artists"] = [{"id": artist["id"]} for artist in user.get("subscribed_artists") or []]
+        return row
+
+
+class InMemoryNotificationRepository(NotificationRepository):
+
+    def __init__(self):
+        self.notifications: Dict[SentKey, dict] = {}
+
+    async def sent_keys(self, emails: Iterable[str], album_ids: Iterable[str]) -> Set[SentKey]:
+        emails, album_ids = set(emails), set(album_ids)
+        return {key for key in self.notifications if key[0] in emails and key[1] in album_ids}
+
+    async def insert_many(self, documents: List[dict]) -> int:
+        inserted = 0
+        for document in documents:
+            key = (document["email"], document["album_id"], document["method"])
+            if key not in self.notifications:
+                self.notifications[key] = {"_id": ObjectId(), **document}
+                inserted += 1
+        return inserted
+
+    async def page(
+        self,
+        filters: NotificationFilter,
+        limit: int,
+        after: Optional[NotificationCursor] = None
+    ) -> List[dict]:
+        return self._select(filters, after)[:limit]
+
+    async def iter_batches(
+        self,
+        filters: NotificationFilter,
+        batch_size: int = 1000,
+        after: Optional[NotificationCursor] = None
+    ) -> AsyncIterator[List[dict]]:
+        rows = self._select(filters, after)
+        for start in range(0, len(rows), batch_size):
+            yield rows[start:start + batch_size]
+
+    def _select(self, filters: NotificationFilter, after: Optional[NotificationCursor]) -> List[dict]:
+        rows = [
+            document for document in self.notifications.values()
+            if (filters.email is None or document["email"] == filters.email)
+            and (filters.method is None or document["method"] == filters.method)
+            and (filters.album_id is None or document["album_id"] == filters.album_id)
+            and (filters.since is None or document["sent_at"] >= filters.since)
+            and (filters.until is None or document["sent_at"] < filters.until)
+            and (after is None or (document["sent_at"], document["_id"]) < after)
+        ]
+        rows.sort(key=lambda document: (document["sent_at"], document["_id"]), reverse=True)
+        return [
+            {field: copy.deepcopy(value) for field, value in row.items() if field == "_id" or field in NOTIFICATION_PROJECTION}
+            for row in rows
+        ]
@@ -0,0 +1,118 @@
+"""
+Repositories over the MongoEngine connection, for deployments without Beanie
+"""
+import asyncio
+from datetime import datetime
+from itertools import islice
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Set
+from pymongo.errors import BulkWriteError
+from app.db.user_cursor import iter_user_batches
+from app.models.mongoengine_models import Notification, User
+from app.repositories.base import (
+    DUPLICATE_KEY_ERROR,
+    NOTIFICATION_PROJECTION,
+    NOTIFICATION_SORT,
+    NotificationCursor,
+    NotificationFilter,
+    NotificationRepository,
+    SentKey,
+    UserRepository,
+    notification_filter,
+    user_upsert,
+)
+from app.services.dedup import fetch_sent_keys
+from app.utils.logger import get_logger
+from app.utils.sharding import Shard
+
+logger = get_logger(__name__)
+
+
+async def _stream(batches: Iterator[List[dict]]) -> AsyncIterator[List[dict]]:
+    """Pull each batch from a blocking iterator in a worker thread"""
+    while True:
+        batch = await asyncio.to_thread(next, batches, None)
+        if batch is None:
+            return
+        yield batch
+
+
+class MongoEngineUserRepository(UserRepository):
+    """pymongo is blocking, so every call runs in a worker thread"""
+
+    async def get(self, email: str) -> Optional[dict]:
+        return await asyncio.to_thread(lambda: User._get_collection().find_one({"email": email}, {"_id": 0}))
+
+    async def upsert(self, user: dict) -> bool:
+        query, update = user_upsert(user)
+        result = await asyncio.to_thread(lambda: User._get_collection().update_one(query, update, upsert=True))
+        return result.upserted_id is not None
+
+    async def update(self, email: str, **fields) -> bool:
+        update = {"$set": {**fields, "updated_at": datetime.utcnow()}}
+        result = await asyncio.to_thread(lambda: User._get_collection().update_one({"email": email}, update))
+        return result.matched_count == 1
+
+    def iter_batches(self, batch_size: int = 1000, shard: Optional[Shard] = None) -> AsyncIterator[List[dict]]:
+        return _stream(iter_user_batches(batch_size, shard))
+
+    def find_subscribers(
+        self,
+        artist_ids: Iterable[str],
+        batch_size: int = 1000,
+        shard: Optional[Shard] = None
+    ) -> AsyncIterator[List[dict]]:
+        return _stream(iter_user_batches(batch_size, shard, artist_ids))
+
+
+class MongoEngineNotificationRepository(NotificationRepository):
+
+    async def sent_keys(self, emails: Iterable[str], album_ids: Iterable[str]) -> Set[SentKey]:
+        return await asyncio.to_thread(fetch_sent_keys, list(emails), list(album_ids))
+
+    async def insert_many(self, documents: List[dict]) -> int:
+        return await asyncio.to_thread(self._insert, documents)
+
+    @staticmethod
+    def _insert(documents: List[dict]) -> int:
+        try:
+            result = Notification._get_collection().insert_many(documents, ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            logger.info(f"Skipped {len(errors)} notifications already in the ledger")
+            return e.details.get("nInserted", 0)
+
+    async def page(
+        self,
+        filters: NotificationFilter,
+        limit: int,
+        after: Optional[NotificationCursor] = None
+    ) -> List[dict]:
+        query = notification_filter(filters, after)
+        return await asyncio.to_thread(
+            lambda: list(Notification._get_collection().find(query, NOTIFICATION_PROJECTION, sort=NOTIFICATION_SORT, limit=limit))
+        )
+
+    def iter_batches(
+        self,
+        filters: NotificationFilter,
+        batch_size: int = 1000,
+        after: Optional[NotificationCursor] = None
+    ) -> AsyncIterator[List[dict]]:
+        return _stream(self._batches(notification_filter(filters, after), batch_size))
+
+    @staticmethod
+    def _batches(query: dict, batch_size: int) -> Iterator[List[dict]]:
+        cursor = Notification._get_collection().find(
+            query, NOTIFICATION_PROJECTION, sort=NOTIFICATION_SORT, batch_size=batch_size
+        )
+        try:
+            while True:
+                batch = list(islice(cursor, batch_size))
+                if not batch:
+                    return
+                yield batch
+        finally:
+            cursor.close()
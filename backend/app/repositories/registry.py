@@ -0,0 +1,67 @@
+"""
+Process-wide repositories, chosen by DATA_BACKEND at startup
+"""
+from typing import Optional
+from app.core.config import settings
+from app.db.mongoengine_db import database_uri
+from app.repositories.base import NotificationRepository, UserRepository
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_users: Optional[UserRepository] = None
+_notifications: Optional[NotificationRepository] = None
+_client = None
+
+
+def set_repositories(users: UserRepository, notifications: NotificationRepository):
+    global _users, _notifications
+    _users, _notifications = users, notifications
+
+
+def _use_mongoengine():
+    from app.repositories.mongoengine_repositories import (
+        MongoEngineNotificationRepository,
+        MongoEngineUserRepository,
+    )
+    set_repositories(MongoEngineUserRepository(), MongoEngineNotificationRepository())
+
+
+def get_user_repository() -> UserRepository:
+    """FastAPI dependency; falls back to MongoEngine until init_repositories() has run"""
+    if _users is None:
+        _use_mongoengine()
+    return _users
+
+
+def get_notification_repository() -> NotificationRepository:
+    if _notifications is None:
+        _use_mongoengine()
+    return _notifications
+
+
+async def init_repositories():
+    """Connect the backend configured by DATA_BACKEND ("beanie" or "mongoengine")"""
+    global _client
+    if settings.data_backend == "beanie":
+        try:
+            from app.repositories.beanie_repositories import (
+                BeanieNotificationRepository,
+                BeanieUserRepository,
+                connect_beanie,
+            )
+        except ImportError:  # optional, MongoEngine in worker threads still keeps the loop free
+            logger.warning("DATA_BACKEND=beanie but beanie is not installed, using MongoEngine")
+        else:
+            _client = await connect_beanie(database_uri(), settings.database_name)
+            set_repositories(BeanieUserRepository(), BeanieNotificationRepository())
+            return
+    _use_mongoengine()
+
+
+async def close_repositories():
+    global _client, _users, _notifications
+    if _client is not None:
+        await _client.close()
+        _client = None
+    _users = _notifications = None
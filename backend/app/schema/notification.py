@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from enum import Enum
 from datetime import datetime
+from typing import Optional
 
 
 class NotificationMethod(Enum):
@@ -17,7 +18,7 @@ class NotificationOut(BaseModel):
     method: NotificationMethod = Field(choices=['email', 'telegram', 'sms'], example="email")
     sent_at: datetime = Field(default=datetime.utcnow)
     spotify_url: str = Field(example="https://open.spotify.com/album/4uLU6hMCjMI75M1A2tKUQC")
-    telegram_chat_id: str = Field(example="123456789")
-    phone_number: str = Field(example="+201234567890")
-    matched_artist_ids: list[str] = Field()
+    telegram_chat_id: Optional[str] = Field(default=None, example="123456789")
+    phone_number: Optional[str] = Field(default=None, example="+201234567890")
+    matched_artist_ids: list[str] = Field(default_factory=list)
     
\ No newline at end of file
@@ -0,0 +1,237 @@
+"""
+Local artist catalog with an in-memory prefix index for typeahead search
+"""
+import asyncio
+import heapq
+import itertools
+import unicodedata
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from pymongo import UpdateOne
+from app.core.config import settings
+from app.models.mongoengine_models import Artist
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MAX_CACHED_RESULTS = 10_000
+
+# Index changes per batch above which the index is rebuilt off the event
+# loop instead of updated in place
+MAX_IN_PLACE_KEYS = 1_000
+
+
+def normalize_name(name: str) -> str:
+    """Case-fold, strip accents and collapse whitespace, e.g. "Beyoncé " becomes "beyonce"."""
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.split())
+
+
+def name_keys(name: str) -> List[str]:
+    """Index keys for a name: the full name and every suffix starting at a word,
+    so "the weeknd" is found by both "the w" and "week"."""
+    words = normalize_name(name).split(" ")
+    return [" ".join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+class PrefixIndex:
+    """Sorted array of (key, artist id) pairs searched with bisect"""
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._ids: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def build(self, entries: Iterable[tuple]):
+        """Replace the index with (key, artist_id) entries, sorting once"""
+        pairs = sorted(set(entries))
+        self._keys = [key for key, _ in pairs]
+        self._ids = [artist_id for _, artist_id in pairs]
+
+    def add(self, key: str, artist_id: str):
+        i = bisect_left(self._keys, key)
+        while i < len(self._keys) and self._keys[i] == key:
+            if self._ids[i] == artist_id:
+                return
+            i += 1
+        self._keys.insert(i, key)
+        self._ids.insert(i, artist_id)
+
+    def remove(self, key: str, artist_id: str):
+        i = bisect_left(self._keys, key)
+        while i < len(self._keys) and self._keys[i] == key:
+            if self._ids[i] == artist_id:
+                del self._keys[i]
+                del self._ids[i]
+                return
+            i += 1
+
+    def merged(self, added: Iterable[tuple], removed: Iterable[tuple]) -> "PrefixIndex":
+        """A new index with (key, artist_id) entries added and removed, in one pass over this one"""
+        removed = set(removed)
+        kept = (pair for pair in zip(self._keys, self._ids) if pair not in removed)
+        pairs = [pair for pair, _ in itertools.groupby(heapq.merge(kept, sorted(set(added) - removed)))]
+        index = PrefixIndex()
+        index._keys = [key for key, _ in pairs]
+        index._ids = [artist_id for _, artist_id in pairs]
+        return index
+
+    def lookup(self, prefix: str) -> Iterator[str]:
+        """Artist ids with at least one key starting with ``prefix``"""
+        i = bisect_left(self._keys, prefix)
+        while i < len(self._keys) and self._keys[i].startswith(prefix):
+            yield self._ids[i]
+            i += 1
+
+
+class ArtistCatalog:
+    """Artists seen in search results and subscriptions, ranked by popularity.
+
+    The catalog lives in the ``artists`` collection and is mirrored in memory,
+    so typeahead queries are answered without a Spotify round trip. Each
+    artist's ``updated_at`` records when it last came back from Spotify or a
+    subscription; results with an artist older than ``refresh_seconds`` are
+    stale, and the search route asks Spotify again, which refreshes them and
+    adds artists the catalog hasn't seen yet.
+    """
+
+    def __init__(self, refresh_seconds: float = 86400, clock: Callable[[], datetime] = datetime.utcnow):
+        self.refresh_seconds = refresh_seconds
+        self._clock = clock
+        self._artists: Dict[str, dict] = {}
+        self._updated_at: Dict[str, datetime] = {}
+        self._index = PrefixIndex()
+        self._results: Dict[tuple, List[dict]] = {}
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._artists)
+
+    async def load(self):
+        """Build the in-memory index from the artists collection"""
+        rows = await asyncio.to_thread(
+            lambda: list(Artist.objects.only("name", "popularity", "image_url", "updated_at").as_pymongo().no_cache())
+        )
+        self.load_artists(
+            {
+                "id": row["_id"],
+                "name": row["name"],
+                "popularity": row.get("popularity"),
+                "image_url": row.get("image_url"),
+                "updated_at": row.get("updated_at"),
+            }
+            for row in rows
+        )
+        logger.info(f"Loaded {len(self._artists)} artists into the catalog index")
+
+    def load_artists(self, artists: Iterable[dict]):
+        """Replace the in-memory catalog in one pass; artists without ``updated_at`` are stale"""
+        artists = list(artists)
+        self._artists = {artist["id"]: self._entry(artist) for artist in artists}
+        self._updated_at = {artist["id"]: artist["updated_at"] for artist in artists if artist.get("updated_at")}
+        self._index.build(
+            (key, artist_id)
+            for artist_id, artist in self._artists.items()
+            for key in name_keys(artist["name"])
+        )
+        self._results.clear()
+
+    def search(self, query: str, limit: int = 50) -> List[dict]:
+        """Artists whose name (or a word in it) starts with ``query``, most popular first"""
+        prefix = normalize_name(query)
+        if not prefix:
+            return []
+        cached = self._results.get((prefix, limit))
+        if cached is not None:
+            return cached
+
+        ids = set(self._index.lookup(prefix))
+        results = heapq.nlargest(limit, (self._artists[i] for i in ids), key=lambda a: (a["popularity"], a["id"]))
+        if len(self._results) >= MAX_CACHED_RESULTS:
+            self._results.clear()
+        self._results[(prefix, limit)] = results
+        return results
+
+    def is_fresh(self, artists: Iterable[dict]) -> bool:
+        """Whether every one of ``artists`` was updated within ``refresh_seconds``"""
+        cutoff = self._clock() - timedelta(seconds=self.refresh_seconds)
+        return all(self._updated_at.get(artist["id"], datetime.min) >= cutoff for artist in artists)
+
+    async def add_many(self, artists: Iterable[dict]):
+        """Add or refresh artists in memory and persist them, with their update time, to the collection"""
+        added: Set[Tuple[str, str]] = set()
+        removed: Set[Tuple[str, str]] = set()
+        artists = list(artists)
+        if not artists:
+            return
+        now = self._clock()
+        for artist in artists:
+            self._upsert_in_memory(artist, added, removed)
+            self._updated_at[artist["id"]] = now
+        try:
+            await asyncio.to_thread(self._persist, [self._artists[artist["id"]] for artist in artists], now)
+        except Exception as e:
+            logger.exception("Error saving artists to the catalog:", exc_info=e)
+        if not added and not removed:
+            return
+        async with self._lock:
+            if len(added) + len(removed) <= MAX_IN_PLACE_KEYS:
+                for key, artist_id in removed:
+                    self._index.remove(key, artist_id)
+                for key, artist_id in added:
+                    self._index.add(key, artist_id)
+            else:
+                # Searches keep reading the current index until the new one is swapped in
+                self._index = await asyncio.to_thread(self._index.merged, added, removed)
+        self._results.clear()
+
+    def _upsert_in_memory(self, artist: dict, added: Set[tuple], removed: Set[tuple]):
+        """Update the artist in memory, collecting its index changes into ``added`` and ``removed``"""
+        existing = self._artists.get(artist["id"])
+        entry = self._entry(artist, existing)
+        if entry == existing:
+            return
+        if existing is not None and existing["name"] != entry["name"]:
+            old_keys = {(key, entry["id"]) for key in name_keys(existing["name"])}
+            added -= old_keys
+            removed |= old_keys
+        new_keys = {(key, entry["id"]) for key in name_keys(entry["name"])}
+        removed -= new_keys
+        added |= new_keys
+        self._artists[entry["id"]] = entry
+        self._results.clear()
+
+    @staticmethod
+    def _entry(artist: dict, existing: Optional[dict] = None) -> dict:
+        # Subscriptions carry no popularity or image; keep what search gave us
+        existing = existing or {}
+        return {
+            "id": artist["id"],
+            "name": artist.get("name") or existing.get("name") or "",
+            "popularity": artist.get("popularity") if artist.get("popularity") is not None else existing.get("popularity", 0),
+            "image_url": artist.get("image_url") or existing.get("image_url"),
+        }
+
+    @staticmethod
+    def _persist(artists: List[dict], now: datetime):
+        Artist._get_collection().bulk_write([
+            UpdateOne(
+                {"_id": artist["id"]},
+                {"$set": {
+                    "name": artist["name"],
+                    "popularity": artist["popularity"],
+                    "image_url": artist["image_url"],
+                    "updated_at": now,
+                }},
+                upsert=True,
+            )
+            for artist in artists
+        ], ordered=False)
+
+
+# Shared by the search and subscribe routes
+artist_catalog = ArtistCatalog(refresh_seconds=settings.artist_catalog_refresh_seconds)
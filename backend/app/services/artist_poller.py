@@ -0,0 +1,193 @@
+"""
+Per-artist album polling with a "last seen release" watermark per artist
+"""
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+from pymongo import UpdateOne
+from app.core.config import settings
+from app.core.spotify_client import MAX_ALBUMS_PER_REQUEST, SpotifyClient
+from app.models.mongoengine_models import ArtistWatermark, User
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def subscribed_artist_ids() -> List[str]:
+    """Distinct artist ids across all user subscriptions"""
+    return User._get_collection().distinct("subscribed_artists.id")
+
+
+class ArtistPoller:
+    """Finds albums released by subscribed artists since the previous poll.
+
+    Artists are polled in chunks with at most ``concurrency`` requests in flight;
+    the request rate is governed by the client's shared scheduler, which lets
+    interactive searches go first. Only albums newer than
+    each artist's watermark are kept; they are de-duplicated across artists and
+    hydrated through the batched ``/albums?ids=`` endpoint. An artist seen for
+    the first time only gets a watermark, so subscribing never replays a back
+    catalog. An artist whose albums failed to poll or hydrate keeps its old
+    watermark, so the next poll picks them up again.
+
+    Watermarks are saved by ``commit``, which the consumer calls once it has
+    stored every album yielded so far; albums lost to a failure before that
+    are polled again next time.
+    """
+
+    def __init__(
+        self,
+        client: SpotifyClient,
+        concurrency: int = 10,
+        chunk_size: int = 500
+    ):
+        self.client = client
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.requests = 0
+        # Watermarks of chunks whose albums have all been yielded
+        self._uncommitted: List[dict] = []
+
+    @classmethod
+    def from_settings(cls, client: SpotifyClient) -> "ArtistPoller":
+        return cls(
+            client,
+            concurrency=settings.artist_poll_concurrency,
+            chunk_size=settings.artist_poll_chunk_size,
+        )
+
+    async def poll(self, artist_ids: Iterable[str]) -> AsyncIterator[dict]:
+        """Yield full album objects that are new since the last poll"""
+        artist_ids = list(artist_ids)
+        seen_album_ids = set()
+        failed_album_ids = set()
+        for start in range(0, len(artist_ids), self.chunk_size):
+            chunk = artist_ids[start:start + self.chunk_size]
+            new_by_artist, watermarks = await self._poll_chunk(chunk)
+            new_album_ids = [
+                album_id
+                for album_id in dict.fromkeys(a for ids in new_by_artist.values() for a in ids)
+                if album_id not in seen_album_ids
+            ]
+            seen_album_ids.update(new_album_ids)
+            albums, failed = await self._hydrate(new_album_ids)
+            failed_album_ids |= failed
+            watermarks = [
+                watermark for watermark in watermarks
+                if failed_album_ids.isdisjoint(new_by_artist.get(watermark["_id"], ()))
+            ]
+            if not albums:
+                self._uncommitted.extend(watermarks)
+            for i, album in enumerate(albums):
+                if i == len(albums) - 1:
+                    # The consumer holds every album of the chunk once this one is yielded
+                    self._uncommitted.extend(watermarks)
+                yield album
+
+    async def commit(self):
+        """Save the watermarks of every chunk yielded so far; call once its albums are stored"""
+        watermarks, self._uncommitted = self._uncommitted, []
+        if watermarks:
+            await asyncio.to_thread(self._save_watermarks, watermarks)
+
+    async def _poll_chunk(self, artist_ids: List[str]) -> Tuple[Dict[str, List[str]], List[dict]]:
+        """New album ids per artist, and the watermarks to save once they are hydrated"""
+        watermarks = await asyncio.to_thread(self._load_watermarks, artist_ids)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(artist_id):
+            watermark = watermarks.get(artist_id)
+            # Page back to the watermark; a new artist only needs its latest page
+            since = watermark.get("last_release_date") if watermark else None
+            async with semaphore:
+                self.requests += 1
+                try:
+                    return await self.client.get_artist_albums(artist_id, since=since)
+                except Exception as e:
+                    logger.warning(f"Failed to poll albums for artist {artist_id}: {e}")
+                    return None
+
+        results = await asyncio.gather(*(fetch(artist_id) for artist_id in artist_ids))
+
+        new_album_ids = {}
+        updates = []
+        for artist_id, albums in zip(artist_ids, results):
+            if albums is None:
+                continue  # keep the old watermark so the next poll retries
+            watermark = watermarks.get(artist_id)
+            if watermark is not None:
+                new_album_ids[artist_id] = [album["id"] for album in albums if self._is_new(album, watermark)]
+            update = self._advance(artist_id, watermark, albums)
+            if update is not None:
+                updates.append(update)
+        return new_album_ids, updates
+
+    async def _hydrate(self, album_ids: List[str]) -> Tuple[List[dict], Set[str]]:
+        """Full albums, and the ids of those whose batch failed"""
+        batches = [album_ids[i:i + MAX_ALBUMS_PER_REQUEST] for i in range(0, len(album_ids), MAX_ALBUMS_PER_REQUEST)]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(batch):
+            async with semaphore:
+                self.requests += 1
+                try:
+                    return await self.client.get_albums(batch)
+                except Exception as e:
+                    logger.warning(f"Failed to fetch {len(batch)} albums: {e}")
+                    return None
+
+        albums = []
+        failed = set()
+        for batch, result in zip(batches, await asyncio.gather(*(fetch(batch) for batch in batches))):
+            if result is None:
+                failed.update(batch)
+            else:
+                albums.extend(result)
+        return albums, failed
+
+    @staticmethod
+    def _is_new(album: dict, watermark: Optional[dict]) -> bool:
+        if watermark is None:
+            return True
+        release_date = album.get("release_date") or ""
+        last = watermark.get("last_release_date") or ""
+        if release_date != last:
+            return release_date > last
+        return album["id"] not in watermark.get("last_album_ids", [])
+
+    @staticmethod
+    def _advance(artist_id: str, watermark: Optional[dict], albums: List[dict]) -> Optional[dict]:
+        """New watermark covering ``albums``, or None if nothing changed"""
+        dated = [album for album in albums if album.get("release_date")]
+        last = (watermark or {}).get("last_release_date") or ""
+        last_ids = set((watermark or {}).get("last_album_ids", []))
+        newest = max([album["release_date"] for album in dated] + [last])
+        newest_ids = {album["id"] for album in dated if album["release_date"] == newest}
+        if newest == last:
+            newest_ids |= last_ids
+        if watermark is not None and newest == last and newest_ids == last_ids:
+            return None
+        return {"_id": artist_id, "last_release_date": newest or None, "last_album_ids": sorted(newest_ids)}
+
+    @staticmethod
+    def _load_watermarks(artist_ids: List[str]) -> Dict[str, dict]:
+        rows = ArtistWatermark._get_collection().find({"_id": {"$in": artist_ids}})
+        return {row["_id"]: row for row in rows}
+
+    @staticmethod
+    def _save_watermarks(watermarks: List[dict]):
+        if not watermarks:
+            return
+        now = datetime.utcnow()
+        ArtistWatermark._get_collection().bulk_write([
+            UpdateOne(
+                {"_id": watermark["_id"]},
+                {"$set": {
+                    "last_release_date": watermark["last_release_date"],
+                    "last_album_ids": watermark["last_album_ids"],
+                    "polled_at": now,
+                }},
+                upsert=True,
+            )
+            for watermark in watermarks
+        ], ordered=False)
@@ -0,0 +1,26 @@
+"""
+Batched lookup of notifications that were already delivered
+"""
+from typing import Iterable, Set
+from app.models.mongoengine_models import Notification
+from app.repositories.base import SentKey
+
+
+def fetch_sent_keys(emails: Iterable[str], album_ids: Iterable[str]) -> Set[SentKey]:
+    """Return every (email, album_id, method) already in the ledger for these users and albums.
+
+    One ``$in`` query served by the (email, album_id, method) compound index
+    replaces a ``.first()`` round trip per user x album x method.
+    """
+    emails = list(set(emails))
+    album_ids = list(set(album_ids))
+    if not emails or not album_ids:
+        return set()
+
+    rows = (
+        Notification.objects(email__in=emails, album_id__in=album_ids)
+        .only("email", "album_id", "method")
+        .as_pymongo()
+        .no_cache()
+    )
+    return {(row["email"], row["album_id"], row["method"]) for row in rows}
@@ -0,0 +1,151 @@
+"""
+Concurrent fan-out of outgoing notifications with per-channel limits
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+from app.utils.logger import get_logger
+from app.utils.rate_limit import TokenBucket
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class OutgoingMessage:
+    """One message to deliver on one channel"""
+    channel: str
+    recipient: str
+    body: str
+    subject: Optional[str] = None
+    html: Optional[str] = None  # email only, sent as an alternative to the text body
+    # Awaited after a successful send, e.g. to record it in the ledger
+    on_sent: Optional[Callable[[], Awaitable[Any]]] = None
+    # Awaited with the exception when the send fails, e.g. to schedule a retry
+    on_failed: Optional[Callable[[Exception], Awaitable[Any]]] = None
+
+
+class ChannelLimits(NamedTuple):
+    concurrency: int
+    rate_per_second: float = 0  # 0 means unlimited
+
+
+@dataclass
+class ChannelStats:
+    sent: int = 0
+    failed: int = 0
+    queue_depth: int = 0
+
+
+class _Channel:
+    def __init__(self, send: Callable[[OutgoingMessage], Awaitable[Any]], limits: ChannelLimits, queue_size: int):
+        self.send = send
+        self.limits = limits
+        self.bucket = TokenBucket(limits.rate_per_second)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.stats = ChannelStats()
+        self.workers: List[asyncio.Task] = []
+
+
+class Dispatcher:
+    """Queues outgoing messages and delivers them with a worker pool per channel.
+
+    Each channel gets ``concurrency`` workers and its own token bucket, so a slow
+    SMTP server or a provider rate limit only holds back its own channel. A
+    failed send is logged and counted and its ``on_failed`` callback is run
+    instead of ``on_sent``.
+    """
+
+    def __init__(
+        self,
+        senders: Dict[str, Callable[[OutgoingMessage], Awaitable[Any]]],
+        limits: Dict[str, ChannelLimits],
+        queue_size: int = 1000
+    ):
+        self._channels = {
+            name: _Channel(send, limits.get(name, ChannelLimits(concurrency=1)), queue_size)
+            for name, send in senders.items()
+        }
+        self._started_at: Optional[float] = None
+
+    async def __aenter__(self) -> "Dispatcher":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def start(self):
+        self._started_at = time.monotonic()
+        for channel in self._channels.values():
+            channel.workers = [
+                asyncio.create_task(self._work(channel))
+                for _ in range(max(channel.limits.concurrency, 1))
+            ]
+
+    @property
+    def channels(self) -> Dict[str, ChannelLimits]:
+        return {name: channel.limits for name, channel in self._channels.items()}
+
+    async def submit(self, message: OutgoingMessage):
+        """Enqueue a message, waiting if its channel's queue is full"""
+        await self._channels[message.channel].queue.put(message)
+
+    async def join(self):
+        """Wait until every queued message has been handled"""
+        await asyncio.gather(*(channel.queue.join() for channel in self._channels.values()))
+
+    async def close(self):
+        """Drain the queues, stop the workers and log a summary"""
+        await self.join()
+        for channel in self._channels.values():
+            for worker in channel.workers:
+                worker.cancel()
+            await asyncio.gather(*channel.workers, return_exceptions=True)
+            channel.workers = []
+        logger.info(f"Dispatcher finished: {self.report()}")
+
+    def stats(self) -> Dict[str, ChannelStats]:
+        """Per-channel counters, including the current queue depth"""
+        for channel in self._channels.values():
+            channel.stats.queue_depth = channel.queue.qsize()
+        return {name: channel.stats for name, channel in self._channels.items()}
+
+    def throughput(self) -> float:
+        """Messages delivered per second since start()"""
+        if self._started_at is None:
+            return 0.0
+        elapsed = time.monotonic() - self._started_at
+        sent = sum(channel.stats.sent for channel in self._channels.values())
+        return sent / elapsed if elapsed > 0 else 0.0
+
+    def report(self) -> str:
+        channels = ", ".join(
+            f"{name}: sent={stats.sent} failed={stats.failed} queued={stats.queue_depth}"
+            for name, stats in self.stats().items()
+        )
+        return f"{self.throughput():.1f} msg/s ({channels})"
+
+    async def _work(self, channel: _Channel):
+        while True:
+            message = await channel.queue.get()
+            try:
+                await channel.bucket.acquire()
+                await channel.send(message)
+            except Exception as e:
+                channel.stats.failed += 1
+                logger.exception(f"Failed to send {message.channel} notification to {message.recipient}:", exc_info=e)
+                if message.on_failed:
+                    try:
+                        await message.on_failed(e)
+                    except Exception as callback_error:
+                        logger.exception(f"Error after failing {message.channel} notification:", exc_info=callback_error)
+            else:
+                channel.stats.sent += 1
+                if message.on_sent:
+                    try:
+                        await message.on_sent()
+                    except Exception as e:
+                        logger.exception(f"Error after sending {message.channel} notification:", exc_info=e)
+            finally:
+                channel.queue.task_done()
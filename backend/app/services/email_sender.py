@@ -1,20 +1,142 @@
+import asyncio
 import aiosmtplib
 from email.message import EmailMessage
+from typing import Optional
 from app.core.config import settings
+from app.utils.logger import get_logger
 
+logger = get_logger(__name__)
 
-async def send_email(to_email: str, subject: str, body: str):
+
+class _PooledConnection:
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.messages_sent = 0
+
+
+class SMTPPool:
+    """A fixed number of authenticated SMTP sessions reused across messages.
+
+    Sessions are opened lazily, reconnected once if the server dropped them,
+    and recycled after ``max_messages_per_connection`` messages.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        start_tls: bool = True,
+        size: int = 4,
+        max_messages_per_connection: int = 100,
+        timeout: float = 30
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username or None
+        self.password = password or None
+        self.start_tls = start_tls
+        self.size = size
+        self.max_messages_per_connection = max_messages_per_connection
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._idle: asyncio.Queue = asyncio.Queue()
+        for _ in range(size):
+            self._idle.put_nowait(None)  # free slot, connected on first use
+
+    @classmethod
+    def from_settings(cls) -> "SMTPPool":
+        return cls(
+            hostname=settings.smtp_server,
+            port=settings.smtp_port,
+            username=settings.smtp_user,
+            password=settings.smtp_password,
+            start_tls=settings.smtp_start_tls,
+            size=settings.smtp_pool_size,
+            max_messages_per_connection=settings.smtp_max_messages_per_connection,
+            timeout=settings.smtp_timeout,
+        )
+
+    async def _connect(self) -> _PooledConnection:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            start_tls=self.start_tls,
+            timeout=self.timeout,
+        )
+        await smtp.connect()
+        self.connections_opened += 1
+        return _PooledConnection(smtp)
+
+    @staticmethod
+    async def _disconnect(connection: Optional[_PooledConnection]):
+        if connection is None or not connection.smtp.is_connected:
+            return
+        try:
+            await connection.smtp.quit()
+        except aiosmtplib.SMTPException:
+            connection.smtp.close()
+
+    async def send(self, message: EmailMessage):
+        """Send a message on an idle pooled session, waiting for one if all are busy"""
+        connection = await self._idle.get()
+        try:
+            if connection is None or not connection.smtp.is_connected:
+                connection = await self._connect()
+            try:
+                await connection.smtp.send_message(message)
+            except aiosmtplib.SMTPServerDisconnected:
+                logger.warning("SMTP session dropped, reconnecting")
+                connection = await self._connect()
+                await connection.smtp.send_message(message)
+
+            connection.messages_sent += 1
+            if connection.messages_sent >= self.max_messages_per_connection:
+                await self._disconnect(connection)
+                connection = None
+        except Exception:
+            await self._disconnect(connection)
+            connection = None
+            raise
+        finally:
+            self._idle.put_nowait(connection)
+
+    async def close(self):
+        """Close every idle session"""
+        for _ in range(self._idle.qsize()):
+            connection = self._idle.get_nowait()
+            await self._disconnect(connection)
+            self._idle.put_nowait(None)
+
+
+_pool: Optional[SMTPPool] = None
+
+
+def get_smtp_pool() -> SMTPPool:
+    """Process-wide SMTP pool, created on first use"""
+    global _pool
+    if _pool is None:
+        _pool = SMTPPool.from_settings()
+    return _pool
+
+
+async def close_smtp_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+async def send_email(to_email: str, subject: str, body: str, html: Optional[str] = None):
     message = EmailMessage()
     message["From"] = settings.from_email
     message["To"] = to_email
     message["Subject"] = subject
     message.set_content(body)
+    if html:
+        message.add_alternative(html, subtype="html")
 
-    await aiosmtplib.send(
-        message,
-        hostname=settings.smtp_server,
-        port=settings.smtp_port,
-        username=settings.smtp_user,
-        password=settings.smtp_password,
-        start_tls=True,
-    )
+    await get_smtp_pool().send(message)
@@ -0,0 +1,98 @@
+"""
+Buffered, asynchronous writer for the notifications ledger
+"""
+import asyncio
+from datetime import datetime
+from typing import Iterable, List, Optional
+from app.repositories.base import NotificationRepository
+from app.repositories.registry import get_notification_repository
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def notification_record(method: str, user: dict, album: dict, matched_artist_ids: Iterable[str]) -> dict:
+    """Ledger document for one album delivered to one user on one channel, without its sent_at"""
+    return {
+        "email": user["email"],
+        "album_id": album["id"],
+        "album_name": album["name"],
+        "album_artists_ids": [artist["id"] for artist in album["artists"]],
+        "method": method,
+        "spotify_url": album["external_urls"]["spotify"],
+        "telegram_chat_id": user.get("telegram_chat_id"),
+        "phone_number": user.get("phone_number"),
+        "matched_artist_ids": sorted(matched_artist_ids),
+    }
+
+
+class NotificationLedger:
+    """Collects notification records during a run and writes them in bulk.
+
+    Records are flushed with one ``insert_many`` once ``flush_size`` are
+    buffered or every ``flush_interval`` seconds, whichever comes first.
+    The repository skips re-inserts of an already recorded delivery. Records
+    of a failed flush go back into the buffer for the next one; those still
+    unwritten when the ledger closes are logged.
+    """
+
+    def __init__(
+        self,
+        flush_size: int = 500,
+        flush_interval: float = 5.0,
+        repository: Optional[NotificationRepository] = None
+    ):
+        self.repository = repository or get_notification_repository()
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.inserted = 0
+        self.write_ops = 0
+        self._buffer: List[dict] = []
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "NotificationLedger":
+        self._timer = asyncio.create_task(self._flush_periodically())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.error(
+                f"Could not record {len(self._buffer)} sent notifications: "
+                + ", ".join(f"{r['email']}|{r['album_id']}|{r['method']}" for r in self._buffer)
+            )
+            raise
+
+    async def record_many(self, records: List[dict]):
+        """Buffer records built by ``notification_record``, stamped with the send time"""
+        sent_at = datetime.utcnow()
+        self._buffer.extend({**record, "sent_at": sent_at} for record in records)
+        if len(self._buffer) >= self.flush_size:
+            await self.flush()
+
+    async def flush(self):
+        """Write everything buffered so far in a single bulk insert"""
+        async with self._lock:
+            if not self._buffer:
+                return
+            documents, self._buffer = self._buffer, []
+            try:
+                self.inserted += await self.repository.insert_many(documents)
+            except Exception:
+                # Keep them for the next flush, ahead of anything buffered since
+                self._buffer[:0] = documents
+                raise
+            self.write_ops += 1
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception("Error flushing notification ledger:", exc_info=e)
@@ -0,0 +1,56 @@
+"""
+Release matching engine: maps album artists straight to their subscribers
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Set
+
+
+class Match(NamedTuple):
+    """A user subscribed to at least one of an album's artists"""
+    user: dict
+    album: dict
+    matched_artist_ids: Set[str]
+
+
+class SubscriberIndex:
+    """Inverted index from Spotify artist id to the users subscribed to it.
+
+    Built once per run, so matching a batch of albums costs one dict lookup per
+    album artist plus the number of matches, instead of users x albums.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[dict]] = defaultdict(list)
+
+    @classmethod
+    def build(cls, users: Iterable[dict]) -> "SubscriberIndex":
+        """Create an index from an iterable of user documents or rows"""
+        index = cls()
+        for user in users:
+            index.add_user(user)
+        return index
+
+    def add_user(self, user: dict):
+        """Register a user under every artist they are subscribed to"""
+        artist_ids = {artist["id"] for artist in (user["subscribed_artists"] or [])}
+        for artist_id in artist_ids:
+            self._subscribers[artist_id].append(user)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribers(self, artist_id: str) -> List[dict]:
+        """Users subscribed to the given artist"""
+        return self._subscribers.get(artist_id, [])
+
+    def match(self, albums: Iterable[dict]) -> Iterator[Match]:
+        """Yield one Match per (user, album) pair sharing at least one artist"""
+        for album in albums:
+            matched: Dict[int, Match] = {}
+            for artist in album["artists"]:
+                for user in self._subscribers.get(artist["id"], ()):
+                    entry = matched.get(id(user))
+                    if entry is None:
+                        entry = matched[id(user)] = Match(user, album, set())
+                    entry.matched_artist_ids.add(artist["id"])
+            yield from matched.values()
@@ -0,0 +1,281 @@
+"""
+Release notification messages, rendered once per (album, matched artists, channel),
+and digests that list several albums in one message
+"""
+import html
+import re
+import textwrap
+from string import Template
+from typing import Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+TELEGRAM_PARSE_MODE = "MarkdownV2"
+TELEGRAM_MAX_LENGTH = 4096
+
+EMAIL_SUBJECT = Template("🎵 New Release: $artists just dropped $album!")
+EMAIL_TEXT = Template(textwrap.dedent("""
+    Hi there!
+
+    🎵 New Album Released: $album
+    👤 By: $artists (matched your subscriptions)
+    📅 Release Date: $release_date
+
+    🎧 Listen on Spotify:
+    $url
+
+    Enjoy the music! 🎶
+"""))
+EMAIL_HTML = Template(textwrap.dedent("""\
+    <p>Hi there!</p>
+    <p>🎵 New Album Released: <strong>$album</strong><br>
+    👤 By: $artists (matched your subscriptions)<br>
+    📅 Release Date: $release_date</p>
+    <p>🎧 <a href="$url">Listen on Spotify</a></p>
+    <p>Enjoy the music! 🎶</p>
+"""))
+# Static text must already be valid MarkdownV2: no unescaped _*[]()~`>#+-=|{}.!
+TELEGRAM = Template(
+    "🎵 *New Album Released: $album*\n"
+    "👤 By: $artists\n"
+    "📅 Release Date: $release_date\n\n"
+    "🎧 [Listen on Spotify]($url)"
+)
+# No emoji, so the message stays in the GSM-7 alphabet
+SMS = Template("New release: $album by $artists $url")
+
+DIGEST_EMAIL_SUBJECT = Template("🎵 $count new releases from artists you follow")
+DIGEST_EMAIL_TEXT = Template(textwrap.dedent("""
+    Hi there!
+
+    New releases from artists you follow:
+
+    $items
+
+    Enjoy the music! 🎶
+"""))
+DIGEST_EMAIL_TEXT_ITEM = Template("🎵 $album by $artists ($release_date)\n$url")
+DIGEST_EMAIL_HTML = Template(textwrap.dedent("""\
+    <p>Hi there!</p>
+    <p>New releases from artists you follow:</p>
+    <ul>
+    $items
+    </ul>
+    <p>Enjoy the music! 🎶</p>
+"""))
+DIGEST_EMAIL_HTML_ITEM = Template('<li><a href="$url"><strong>$album</strong></a> by $artists ($release_date)</li>')
+DIGEST_TELEGRAM = Template("🎵 *$count new releases from artists you follow*\n\n$items")
+DIGEST_TELEGRAM_ITEM = Template("• [$album]($url) by $artists")
+DIGEST_SMS = Template("$count new releases: $items")
+DIGEST_SMS_ITEM = Template("$album ($artists)")
+
+_MARKDOWN_V2_SPECIAL = re.compile(r"([_*\[\]()~`>#+\-=|{}.!\\])")
+_MARKDOWN_V2_URL_SPECIAL = re.compile(r"([)\\])")
+
+
+def escape_markdown_v2(text: str) -> str:
+    return _MARKDOWN_V2_SPECIAL.sub(r"\\\1", text)
+
+
+def _escape_markdown_v2_url(url: str) -> str:
+    return _MARKDOWN_V2_URL_SPECIAL.sub(r"\\\1", url)
+
+
+def _fields(album: dict, artist_names: List[str]) -> Dict[str, str]:
+    return {
+        "album": album["name"],
+        "artists": ", ".join(artist_names),
+        "release_date": album["release_date"] or "",
+        "url": album["external_urls"]["spotify"],
+    }
+
+
+def _shorten(text: str, max_length: int, suffix: str = "") -> str:
+    """Cut ``text`` to fit ``max_length`` together with ``suffix``, marking the cut with ..."""
+    if len(text) + len(suffix) <= max_length:
+        return text + suffix
+    return text[:max(max_length - len(suffix) - 3, 0)].rstrip() + "..." + suffix
+
+
+class RenderedMessage(NamedTuple):
+    subject: Optional[str]
+    body: str
+    html: Optional[str] = None
+
+
+def render_email(album: dict, artist_names: List[str], sms_max_length: int) -> RenderedMessage:
+    fields = _fields(album, artist_names)
+    escaped = {name: html.escape(value) for name, value in fields.items()}
+    return RenderedMessage(EMAIL_SUBJECT.substitute(fields), EMAIL_TEXT.substitute(fields), EMAIL_HTML.substitute(escaped))
+
+
+def render_telegram(album: dict, artist_names: List[str], sms_max_length: int) -> RenderedMessage:
+    return RenderedMessage(None, TELEGRAM.substitute(
+        album=escape_markdown_v2(album["name"]),
+        artists=escape_markdown_v2(", ".join(artist_names)),
+        release_date=escape_markdown_v2(album["release_date"] or ""),
+        url=_escape_markdown_v2_url(album["external_urls"]["spotify"]),
+    ))
+
+
+def render_sms(album: dict, artist_names: List[str], sms_max_length: int) -> RenderedMessage:
+    url = album["external_urls"]["spotify"]
+    body = SMS.substitute(album=album["name"], artists=", ".join(artist_names), url="")
+    # Shorten the album and artist names, never the link
+    return RenderedMessage(None, _shorten(body.rstrip(), sms_max_length, " " + url))
+
+
+def render_email_digest_item(album: dict, artist_names: List[str], sms_max_length: int) -> RenderedMessage:
+    fields = _fields(album, artist_names)
+    escaped = {name: html.escape(value) for name, value in fields.items()}
+    return RenderedMessage(None, DIGEST_EMAIL_TEXT_ITEM.substitute(fields), DIGEST_EMAIL_HTML_ITEM.substitute(escaped))
+
+
+def render_telegram_digest_item(album: dict, artist_names: List[str], sms_max_length: int) -> RenderedMessage:
+    return RenderedMessage(None, DIGEST_TELEGRAM_ITEM.substitute(
+        album=escape_markdown_v2(album["name"]),
+        artists=escape_markdown_v2(", ".join(artist_names)),
+        url=_escape_markdown_v2_url(album["external_urls"]["spotify"]),
+    ))
+
+
+def render_sms_digest_item(album: dict, artist_names: List[str], sms_max_length: int) -> RenderedMessage:
+    return RenderedMessage(None, DIGEST_SMS_ITEM.substitute(album=album["name"], artists=", ".join(artist_names)))
+
+
+def compose_email_digest(items: List[RenderedMessage], sms_max_length: int) -> RenderedMessage:
+    return RenderedMessage(
+        DIGEST_EMAIL_SUBJECT.substitute(count=len(items)),
+        DIGEST_EMAIL_TEXT.substitute(items="\n\n".join(item.body for item in items)),
+        DIGEST_EMAIL_HTML.substitute(items="\n".join(item.html for item in items)),
+    )
+
+
+def compose_telegram_digest(items: List[RenderedMessage], sms_max_length: int) -> RenderedMessage:
+    return RenderedMessage(None, DIGEST_TELEGRAM.substitute(
+        count=len(items),
+        items=DIGEST_SEPARATORS["telegram"].join(item.body for item in items),
+    ))
+
+
+def compose_sms_digest(items: List[RenderedMessage], sms_max_length: int) -> RenderedMessage:
+    return RenderedMessage(None, DIGEST_SMS.substitute(
+        count=len(items),
+        items=DIGEST_SEPARATORS["sms"].join(item.body for item in items),
+    ))
+
+
+RENDERERS: Dict[str, Callable[[dict, List[str], int], RenderedMessage]] = {
+    "email": render_email,
+    "telegram": render_telegram,
+    "sms": render_sms,
+}
+
+# One line per album, memoized like whole messages, then joined per user
+DIGEST_ITEM_RENDERERS: Dict[str, Callable[[dict, List[str], int], RenderedMessage]] = {
+    "email": render_email_digest_item,
+    "telegram": render_telegram_digest_item,
+    "sms": render_sms_digest_item,
+}
+
+# Longest digest body per channel (SMS uses the renderer's sms_max_length); email has no limit
+DIGEST_MAX_LENGTHS: Dict[str, int] = {
+    "telegram": TELEGRAM_MAX_LENGTH,
+}
+
+# What joins the album lines of a length-limited digest body
+DIGEST_SEPARATORS: Dict[str, str] = {
+    "telegram": "\n",
+    "sms": ", ",
+}
+
+DIGEST_COMPOSERS: Dict[str, Callable[[List[RenderedMessage], int], RenderedMessage]] = {
+    "email": compose_email_digest,
+    "telegram": compose_telegram_digest,
+    "sms": compose_sms_digest,
+}
+
+
+class DigestPart(NamedTuple):
+    """One digest message and the (album, matched artist ids) it lists"""
+    message: RenderedMessage
+    items: List[Tuple[dict, Iterable[str]]]
+
+
+class MessageRenderer:
+    """Memoizes rendered messages for one notifier run.
+
+    Messages carry nothing user-specific, so every subscriber matched to the
+    same album through the same artists gets the same rendered message and
+    only the recipient is filled in at send time.
+    """
+
+    def __init__(self, sms_max_length: int = 160):
+        self.sms_max_length = sms_max_length
+        self.renders = 0
+        self.hits = 0
+        self._cache: Dict[Tuple[str, FrozenSet[str], str], RenderedMessage] = {}
+        self._digest_items: Dict[Tuple[str, FrozenSet[str], str], RenderedMessage] = {}
+
+    def render(self, album: dict, matched_artist_ids: Iterable[str], channel: str) -> RenderedMessage:
+        return self._render(RENDERERS, self._cache, album, matched_artist_ids, channel)
+
+    def render_digest(self, items: List[Tuple[dict, Iterable[str]]], channel: str) -> List[DigestPart]:
+        """Messages listing several (album, matched artist ids) each.
+
+        A digest longer than the channel allows is split into as many messages
+        as it takes, so every album is listed somewhere; a message for a
+        single album is the regular one.
+        """
+        if len(items) <= 1:
+            return [DigestPart(self.render(*item, channel), items) for item in items]
+        lines = [
+            self._render(DIGEST_ITEM_RENDERERS, self._digest_items, album, matched_artist_ids, channel)
+            for album, matched_artist_ids in items
+        ]
+        max_length = self.sms_max_length if channel == "sms" else DIGEST_MAX_LENGTHS.get(channel)
+        compose = DIGEST_COMPOSERS[channel]
+        if max_length is None:
+            return [DigestPart(compose(lines, self.sms_max_length), items)]
+
+        # Body length of a part: the template around the lines, with its count,
+        # plus the lines and the separators between them
+        overhead = len(compose([], self.sms_max_length).body) - len("0")
+        separator = len(DIGEST_SEPARATORS[channel])
+        parts: List[DigestPart] = []
+        start = 0
+        while start < len(items):
+            end = start + 1
+            length = len(lines[start].body)
+            # Greedily take the albums that still fit
+            while end < len(items):
+                longer = length + separator + len(lines[end].body)
+                if overhead + len(str(end + 1 - start)) + longer > max_length:
+                    break
+                length = longer
+                end += 1
+            if end - start > 1:
+                message = compose(lines[start:end], self.sms_max_length)
+            else:
+                # A single album gets the regular message
+                message = self.render(*items[start], channel)
+            parts.append(DigestPart(message, items[start:end]))
+            start = end
+        return parts
+
+    def _render(
+        self,
+        renderers: Dict[str, Callable[[dict, List[str], int], RenderedMessage]],
+        cache: Dict[Tuple[str, FrozenSet[str], str], RenderedMessage],
+        album: dict,
+        matched_artist_ids: Iterable[str],
+        channel: str
+    ) -> RenderedMessage:
+        matched = frozenset(matched_artist_ids)
+        key = (album["id"], matched, channel)
+        message = cache.get(key)
+        if message is not None:
+            self.hits += 1
+            return message
+        artist_names = [artist["name"] for artist in album["artists"] if artist["id"] in matched]
+        message = cache[key] = renderers[channel](album, artist_names, self.sms_max_length)
+        self.renders += 1
+        return message
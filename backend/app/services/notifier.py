@@ -1,120 +1,320 @@
-from app.models.mongoengine_models import User, Notification
-from app.core.spotify_client import SpotifyClient
+from app.core.config import settings
+from app.core.spotify_client import spotify_client
 from app.services.email_sender import send_email
 from app.services.telegram_sender import send_telegram_message
 from app.services.sms_sender import send_sms
+from app.services.matching import SubscriberIndex
+from app.services.message_templates import TELEGRAM_PARSE_MODE, MessageRenderer
+from app.repositories.base import SentKey
+from app.repositories.registry import get_notification_repository, get_user_repository
+from app.services.run_stats import RunStats
+from app.services.ledger import NotificationLedger, notification_record
+from app.services.dispatcher import ChannelLimits, Dispatcher, OutgoingMessage
+from app.services.outbox import Outbox, delivery_key
+from app.services.artist_poller import ArtistPoller
+from app.services.release_ingest import batched, iter_release_albums
+from app.services.release_store import ReleaseStore
+from app.services.run_coordinator import RunCoordinator
+from app.services.shard_runner import ShardProcessPool
+from app.utils.sharding import Shard, all_shards
 from app.utils.logger import get_logger
-import textwrap
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
 
 logger = get_logger(__name__)
-spotify_client = SpotifyClient()
 
 
-async def save_notification(
-    notification_method: str,
-    user_email: str,
-    album_artists_ids: list,
-    album: dict,
-    user: dict = None,  # optional user data for telegram and sms notifications (if provided)
-    matched_artist_ids: list = None  # optional for telegram and sms notifications (if provided)
+def create_dispatcher() -> Dispatcher:
+    """Dispatcher with one worker pool per notification channel"""
+    senders = {
+        "email": lambda message: send_email(message.recipient, message.subject, message.body, message.html),
+        "telegram": lambda message: send_telegram_message(message.recipient, message.body, TELEGRAM_PARSE_MODE),
+        "sms": lambda message: send_sms(message.recipient, message.body),
+    }
+    limits = {
+        "email": ChannelLimits(settings.email_concurrency, settings.email_rate_limit),
+        # The Telegram and Twilio senders apply TELEGRAM_RATE_LIMIT and
+        # SMS_RATE_LIMIT themselves, for every caller
+        "telegram": ChannelLimits(settings.telegram_concurrency),
+        "sms": ChannelLimits(settings.sms_concurrency),
+    }
+    return Dispatcher(senders, limits, queue_size=settings.dispatcher_queue_size)
+
+
+async def notify_user(
+    user: dict,
+    albums: List[Tuple[dict, Set[str]]],
+    sent_keys: Set[SentKey],
+    outbox: Outbox,
+    renderer: MessageRenderer,
+    stats: RunStats
 ):
-    notification_doc = Notification(
-        email=user_email,
-        artist_ids=album_artists_ids,
-        album_id=album["id"],
-        method=notification_method,
-        spotify_url=album["external_urls"]["spotify"],
-        telegram_chat_id=user.get("telegram_chat_id"),
-        phone_number=user.get("phone_number"),
-        matched_artist_ids=matched_artist_ids
-    )
+    """Queue one message per preferred channel in the outbox (more for an oversized digest), covering
+    every (album, matched artist ids) not already in ``sent_keys``; each album is recorded in the
+    ledger once the message listing it is sent"""
+    user_email = user["email"]
+    preferred_methods = user.get("notification_methods", ["email"])  # default to email
 
-    # Create notification document
-    notification = Notification(
-        email=notification_doc.email,
-        album_id=notification_doc.album_id,
-        album_name=notification_doc.album_name,
-        album_artists_ids=notification_doc.album_artists_ids,
-        method=notification_doc.method,
-        spotify_url=notification_doc.spotify_url,
-        telegram_chat_id=notification_doc.telegram_chat_id,
-        phone_number=notification_doc.phone_number,
-        matched_artist_ids=notification_doc.matched_artist_ids
-    )
-    notification.save()
+    recipients = {
+        "email": user_email,
+        "telegram": user.get("telegram_chat_id"),
+        "sms": user.get("phone_number"),
+    }
+    for method, recipient in recipients.items():
+        if method not in preferred_methods or not recipient:
+            continue
+        unsent = []
+        for album, matched_artist_ids in albums:
+            key = (user_email, album["id"], method)
+            if key in sent_keys:
+                stats.duplicates_skipped += 1
+                continue
+            sent_keys.add(key)
+            unsent.append((album, matched_artist_ids))
+        if not unsent:
+            continue
+
+        # A digest too long for the channel comes in several parts; each
+        # records in the ledger only the albums it lists
+        for message, listed in renderer.render_digest(unsent, method):
+            await outbox.add(
+                OutgoingMessage(
+                    channel=method,
+                    recipient=recipient,
+                    subject=message.subject,
+                    body=message.body,
+                    html=message.html,
+                ),
+                keys=[delivery_key(user_email, album["id"], method) for album, _ in listed],
+                notifications=[
+                    notification_record(method, user, album, matched_artist_ids)
+                    for album, matched_artist_ids in listed
+                ],
+            )
+
+
+async def notify_albums(
+    albums: List[dict],
+    outbox: Outbox,
+    renderer: MessageRenderer,
+    stats: RunStats,
+    shard: Optional[Shard] = None
+):
+    """Match a batch of albums against every user (or one shard of users) and queue the deliveries"""
+    # Stream users in projected batches and go from each album's
+    # artists straight to that batch's subscribers
+    users_repository = get_user_repository()
+    notifications = get_notification_repository()
+    if settings.notifier_matching == "scan":
+        batches = users_repository.iter_batches(settings.notifier_user_batch_size, shard)
+    else:
+        # Only users subscribed to one of the batch's artists leave the database
+        artist_ids = {artist["id"] for album in albums for artist in album["artists"]}
+        if not artist_ids:
+            return
+        batches = users_repository.find_subscribers(artist_ids, settings.notifier_user_batch_size, shard)
+    async for users in batches:
+        stats.users += len(users)
+        matches = list(SubscriberIndex.build(users).match(albums))
+        if not matches:
+            continue
+        stats.matches += len(matches)
+
+        # One ledger query per batch tells us what was already delivered
+        sent_keys = await notifications.sent_keys(
+            (match.user["email"] for match in matches),
+            (match.album["id"] for match in matches),
+        )
+        # ...and one outbox query what is queued but not sent yet, so a digest
+        # isn't built around albums another message already covers
+        sent_keys |= await outbox.queued_keys((match.user["email"], match.album["id"]) for match in matches)
+        stats.dedup_queries += 2
 
+        # Queue the deliveries; the outbox workers send them
+        if settings.notifier_digest:
+            # One message per user and channel for all of this batch's albums
+            by_user: Dict[int, Tuple[dict, List[Tuple[dict, Set[str]]]]] = {}
+            for user, album, matched_artist_ids in matches:
+                by_user.setdefault(id(user), (user, []))[1].append((album, matched_artist_ids))
+            for user, albums_for_user in by_user.values():
+                await notify_user(user, albums_for_user, sent_keys, outbox, renderer, stats)
+        else:
+            for user, album, matched_artist_ids in matches:
+                await notify_user(user, [(album, matched_artist_ids)], sent_keys, outbox, renderer, stats)
 
-async def check_notifications_sent(notification_method: str, user_email: str, album_id: str):
-    notification = Notification.objects(
-        email=user_email,
-        album_id=album_id,
-        method=notification_method
-    ).first()
-    return notification is not None
 
+async def handle_pending(store: ReleaseStore, handle: Callable[[List[dict]], Awaitable[None]]):
+    """Pass albums recorded since the last successful run that this run hasn't seen
+    in its own stream to ``handle``, in batches"""
+    pending = await store.pending()
+    for start in range(0, len(pending), settings.notifier_album_batch_size):
+        await handle(pending[start:start + settings.notifier_album_batch_size])
 
-async def check_new_releases_and_notify():
-    logger.info("Checking for new releases... 🎵")
+
+async def check_new_releases_and_notify(shard: Optional[Shard] = None, fetch: bool = True) -> RunStats:
+    """Notify users (or one shard of them) about albums new since the last successful run.
+
+    With ``fetch`` False nothing is requested from Spotify; only albums
+    already recorded by ``ingest_releases`` are handled. In digest mode the
+    run's albums are matched together once all are known, so each user gets
+    one message per channel.
+
+    Deliveries are queued in the outbox and sent while matching goes on. The
+    run stops sending after OUTBOX_DRAIN_SECONDS; failed sends and anything
+    left over are retried from the outbox by ``deliver_outbox``, so release
+    cursors advance once everything is queued.
+    """
+    logger.info(f"Checking for new releases{f' for {shard.name}' if shard else ''}... 🎵")
+    stats = RunStats()
+    digest = settings.notifier_digest
     try:
-        # 1. Get all users from the database
-        users = list(User.objects.all())
-        print('Users: ', users)
-
-        # 2. Get latest Spotify releases
-        new_releases_data = await spotify_client.get_new_releases()
-        print(new_releases_data)
-        albums = new_releases_data["albums"]["items"]
-
-        notifications_sent = 0
-        for user in users:
-            user_email = user["email"]
-            subscribed_artists = {artist["id"] for artist in user["subscribed_artists"]}
-            preferred_methods = user.get("notification_methods", ["email"])  # default to email
-
-            for album in albums:
-                album_artists_ids = {artist["id"] for artist in album["artists"]}
-                matched_artist_ids = album_artists_ids.intersection(subscribed_artists)
-                if not album_artists_ids or not matched_artist_ids:
-                    continue
-
-                artist_names = [a['name'] for a in album["artists"] if a["id"] in subscribed_artists]
-
-                subject = f"🎵 New Release: {artist_names} just dropped {album['name']}!"
-                body = textwrap.dedent(f"""
-                    Hi there!
-
-                    🎵 New Album Released: {album['name']}
-                    👤 By: {', '.join(artist_names)} (matched your subscriptions)
-                    📅 Release Date: {album['release_date']}
-
-                    🎧 Listen on Spotify:
-                    {album['external_urls']['spotify']}
-
-                    Enjoy the music! 🎶
-                """)
-
-                if "email" in preferred_methods:
-                    exists = await check_notifications_sent("email", user_email, album["id"])
-                    if not exists:
-                        await send_email(user_email, subject, body)
-                        await save_notification("email", user_email, album_artists_ids, album, user, matched_artist_ids)
-                        notifications_sent += 1
-
-                if "telegram" in preferred_methods and user.get("telegram_chat_id"):
-                    exists = await check_notifications_sent("telegram", user_email, album["id"])
-                    if not exists:
-                        await send_telegram_message(user["telegram_chat_id"], body)
-                        await save_notification("telegram", user_email, album_artists_ids, album, user, matched_artist_ids)
-                        notifications_sent += 1
-                    
-                if "sms" in preferred_methods and user.get("phone_number"):
-                    print('Attempting to send SMS...')
-                    exists = await check_notifications_sent("sms", user_email, album["id"])
-                    print('exists: ', exists)
-                    if not exists:
-                        send_sms(user["phone_number"], body)
-                        await save_notification("sms", user_email, album_artists_ids, album, user, matched_artist_ids)
-                        notifications_sent += 1
-        logger.info(f"✅ Sent {notifications_sent} notifications.")
+        store = ReleaseStore(
+            scope=shard.name if shard else None,
+            peers=[peer.name for peer in all_shards(shard.count)] if shard else (),
+        )
+        await store.load_cursors()
+        if digest and not store.digest_due(settings.notifier_digest_window_seconds):
+            # Releases recorded now stay pending until the window closes
+            logger.info(f"Digest window still open since {store.last_digest_at}, only recording releases")
+            return await ingest_releases() if fetch else stats
+
+        ledger = NotificationLedger(settings.ledger_flush_size, settings.ledger_flush_interval)
+        dispatcher = create_dispatcher()
+        outbox = Outbox.from_settings()
+        renderer = MessageRenderer(settings.sms_max_length)
+        digest_albums: List[dict] = []
+        queued = asyncio.Event()
+
+        async def handle(albums: List[dict]):
+            stats.albums += len(albums)
+            if digest:
+                digest_albums.extend(albums)
+            else:
+                await notify_albums(albums, outbox, renderer, stats, shard)
+
+        async with ledger:
+            async with dispatcher:
+                delivery = asyncio.create_task(
+                    outbox.deliver(dispatcher, ledger, stats, queued, settings.outbox_drain_seconds)
+                )
+                try:
+                    # Finish albums first seen by a run that did not complete
+                    await handle_pending(store, handle)
+
+                    if fetch:
+                        # Match only albums new since the last run, in batches as the stream produces them
+                        poller = ArtistPoller.from_settings(spotify_client)
+                        releases = iter_release_albums(spotify_client, poller)
+                        async for batch in batched(releases, settings.notifier_album_batch_size):
+                            stats.releases_seen += len(batch)
+                            albums = await store.record_new(batch)
+                            # Artist watermarks advance only past recorded albums
+                            await poller.commit()
+                            if albums:
+                                await handle(albums)
+                        await poller.commit()
+
+                        # Pick up albums other shards recorded meanwhile, e.g. from artist
+                        # watermarks they advanced before this shard polled
+                        await handle_pending(store, handle)
+
+                    if digest_albums:
+                        await notify_albums(digest_albums, outbox, renderer, stats, shard)
+                    await outbox.flush()
+                finally:
+                    queued.set()
+                    await delivery
+        stats.ledger_writes += ledger.write_ops
+        stats.messages_rendered += renderer.renders
+        stats.notifications_queued += outbox.queued
+
+        # Everything matched is in the outbox now, failed sends included
+        if stats.notifications_failed:
+            logger.warning(f"{stats.notifications_failed} notifications failed, retrying them from the outbox")
+        await store.commit(digest=digest)
+        logger.info(f"✅ Sent {stats.notifications_sent} notifications. ({stats.summary()})")
     except Exception as e:
         logger.exception("Error checking new releases:", exc_info=e)
+    return stats
+
+
+async def deliver_outbox() -> RunStats:
+    """Scheduled entry point: send outbox messages that have come due, e.g. retries of failed sends"""
+    stats = RunStats()
+    try:
+        ledger = NotificationLedger(settings.ledger_flush_size, settings.ledger_flush_interval)
+        dispatcher = create_dispatcher()
+        async with ledger:
+            async with dispatcher:
+                await Outbox.from_settings().deliver(dispatcher, ledger, stats, timeout=settings.outbox_drain_seconds)
+        stats.ledger_writes += ledger.write_ops
+        if stats.notifications_sent or stats.notifications_failed:
+            logger.info(
+                f"Outbox: sent {stats.notifications_sent}, failed {stats.notifications_failed}, "
+                f"dead-lettered {stats.notifications_dead}"
+            )
+    except Exception as e:
+        logger.exception("Error delivering outbox messages:", exc_info=e)
+    return stats
+
+
+async def ingest_releases() -> RunStats:
+    """Record this cycle's albums from every source without notifying anyone"""
+    stats = RunStats()
+    store = ReleaseStore()
+    try:
+        poller = ArtistPoller.from_settings(spotify_client)
+        async for batch in batched(iter_release_albums(spotify_client, poller), settings.notifier_album_batch_size):
+            stats.releases_seen += len(batch)
+            await store.record(batch)
+            # Artist watermarks advance only past recorded albums
+            await poller.commit()
+        await poller.commit()
+        logger.info(f"Ingested {stats.releases_seen} releases, {store.inserted} new")
+    except Exception as e:
+        # Shards still handle whatever was recorded before the failure
+        logger.exception("Error ingesting new releases:", exc_info=e)
+    return stats
+
+
+async def run_notifier_cycle() -> RunStats:
+    """Scheduled entry point: run the shards of this cycle that this instance wins a lease for"""
+    coordinator = RunCoordinator(
+        "notifier",
+        ttl=settings.notifier_lease_ttl,
+        shard_count=settings.notifier_shard_count,
+        # Half an interval, so clock drift between instances can't skip a cycle
+        min_interval=settings.notifier_interval_seconds / 2,
+        concurrency=max(settings.notifier_processes, 1),
+    )
+    stats = RunStats()
+    ingestion: Optional[asyncio.Future] = None
+
+    async def ingest_once():
+        # Fetch from Spotify once per cycle, when this instance leases its first
+        # shard; every shard then matches what was recorded
+        nonlocal ingestion
+        if ingestion is None:
+            ingestion = asyncio.ensure_future(ingest_releases())
+            stats.merge(await asyncio.shield(ingestion))
+        else:
+            await asyncio.shield(ingestion)
+
+    if settings.notifier_processes > 0:
+        # Worker processes match and deliver
+        async with ShardProcessPool(settings.notifier_processes) as pool:
+            async def run_in_pool(shard: Optional[Shard]) -> RunStats:
+                await ingest_once()
+                return await pool.run(shard)
+
+            results = await coordinator.run_cycle(run_in_pool)
+    else:
+        async def run_here(shard: Optional[Shard]) -> RunStats:
+            await ingest_once()
+            return await check_new_releases_and_notify(shard, fetch=False)
+
+        results = await coordinator.run_cycle(run_here)
+
+    for shard_stats in results:
+        stats.merge(shard_stats)
+    return stats
@@ -0,0 +1,311 @@
+"""
+Durable outbox of deliveries: queued in Mongo, claimed atomically, retried with backoff
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Set, Tuple
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError
+from app.core.config import settings
+from app.models.mongoengine_models import OutboxMessage
+from app.repositories.base import DUPLICATE_KEY_ERROR, SentKey
+from app.schema.notification import NotificationMethod
+from app.services.dispatcher import ChannelLimits, Dispatcher, OutgoingMessage
+from app.services.ledger import NotificationLedger
+from app.services.run_coordinator import instance_id
+from app.services.run_stats import RunStats
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+DEAD = "dead"
+
+CLAIM_SORT = [("next_attempt_at", ASCENDING)]
+
+
+def delivery_key(email: str, album_id: str, method: str) -> str:
+    """Outbox dedup key of one album for one user on one channel, like the ledger's"""
+    return f"{email}|{album_id}|{method}"
+
+
+def claim_filter(channel: str, now: datetime) -> dict:
+    """Due messages of a channel: pending ones, and sending ones whose claim expired"""
+    return {"channel": channel, "state": {"$in": [PENDING, SENDING]}, "next_attempt_at": {"$lte": now}}
+
+
+def _collection() -> Collection:
+    return OutboxMessage._get_collection()
+
+
+def _without_queued(document: dict) -> dict:
+    """``document`` with only the keys, and their ledger records, not in the outbox yet"""
+    queued = {
+        key for row in _collection().find({"keys": {"$in": document["keys"]}}, {"keys": 1})
+        for key in row["keys"]
+    }
+    keep = [i for i, key in enumerate(document["keys"]) if key not in queued]
+    return {
+        **{field: value for field, value in document.items() if field != "_id"},
+        "keys": [document["keys"][i] for i in keep],
+        "notifications": [document["notifications"][i] for i in keep],
+    }
+
+
+class Outbox:
+    """Deliveries kept in the ``outbox`` collection until they are sent.
+
+    ``add`` buffers messages and inserts them in bulk; a (user, album, method)
+    already in the outbox is skipped by the unique ``keys`` index. ``deliver``
+    claims due messages one at a time with ``find_one_and_update``, so workers
+    in any number of runs and instances never get the same message, and feeds
+    them to a Dispatcher. A failed send goes back to pending after an
+    exponential backoff and is dead-lettered after ``max_attempts``. A claim
+    expires after ``lease_seconds``, so a message held by a worker that died
+    is sent again.
+
+    Delivery is at least once: a sent message is recorded in the ledger right
+    away and marked sent with a few retries, but if that write keeps failing
+    the message is sent again once its claim expires.
+    """
+
+    def __init__(
+        self,
+        owner: Optional[str] = None,
+        max_attempts: int = 5,
+        backoff_base: float = 30,
+        backoff_max: float = 3600,
+        lease_seconds: float = 300,
+        flush_size: int = 500,
+        poll_interval: float = 0.2
+    ):
+        self.owner = owner or instance_id()
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self.flush_size = flush_size
+        self.poll_interval = poll_interval
+        self.queued = 0
+        self._buffer: List[dict] = []
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "Outbox":
+        return cls(
+            max_attempts=settings.outbox_max_attempts,
+            backoff_base=settings.outbox_backoff_base,
+            backoff_max=settings.outbox_backoff_max,
+            lease_seconds=settings.outbox_lease_seconds,
+            flush_size=settings.ledger_flush_size,
+        )
+
+    async def add(self, message: OutgoingMessage, keys: List[str], notifications: List[dict]):
+        """Buffer a message covering ``keys``; ``notifications`` go to the ledger once it is sent"""
+        now = datetime.utcnow()
+        self._buffer.append({
+            "channel": message.channel,
+            "recipient": message.recipient,
+            "subject": message.subject,
+            "body": message.body,
+            "html": message.html,
+            "keys": keys,
+            "notifications": notifications,
+            "state": PENDING,
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+        })
+        if len(self._buffer) >= self.flush_size:
+            await self.flush()
+
+    async def flush(self):
+        """Insert everything buffered so far in a single bulk insert"""
+        async with self._lock:
+            if not self._buffer:
+                return
+            documents, self._buffer = self._buffer, []
+            self.queued += await asyncio.to_thread(self._insert, documents)
+
+    async def queued_keys(self, pairs: Iterable[Tuple[str, str]]) -> Set[SentKey]:
+        """(email, album_id, method) of the given (email, album_id) pairs already in the outbox"""
+        keys = list({
+            delivery_key(email, album_id, method.value)
+            for email, album_id in pairs
+            for method in NotificationMethod
+        })
+        if not keys:
+            return set()
+        rows = await asyncio.to_thread(lambda: list(_collection().find({"keys": {"$in": keys}}, {"keys": 1, "_id": 0})))
+        wanted = set(keys)
+        return {tuple(key.rsplit("|", 2)) for row in rows for key in row["keys"] if key in wanted}
+
+    @staticmethod
+    def _insert(documents: List[dict]) -> int:
+        try:
+            return len(_collection().insert_many(documents, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            # A digest is rejected as a whole when only some of its albums are
+            # queued already; queue it again for the others
+            rest = [_without_queued(documents[error["index"]]) for error in errors]
+            rest = [document for document in rest if document["keys"]]
+            logger.info(f"Skipped {len(errors) - len(rest)} deliveries already in the outbox")
+            return e.details.get("nInserted", 0) + (Outbox._insert(rest) if rest else 0)
+
+    async def claim(self, channel: str) -> Optional[dict]:
+        """Take the oldest due message of a channel, or None if nothing is due"""
+        return await asyncio.to_thread(self._claim, channel)
+
+    def _claim(self, channel: str) -> Optional[dict]:
+        now = datetime.utcnow()
+        return _collection().find_one_and_update(
+            claim_filter(channel, now),
+            {
+                "$set": {
+                    "state": SENDING,
+                    "claimed_by": self.owner,
+                    "next_attempt_at": now + timedelta(seconds=self.lease_seconds),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=CLAIM_SORT,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def complete(self, message: dict):
+        await asyncio.to_thread(
+            _collection().update_one,
+            {"_id": message["_id"]},
+            {"$set": {"state": SENT, "sent_at": datetime.utcnow()}},
+        )
+
+    async def _complete_after_send(self, message: dict, attempts: int = 3, delay: float = 0.5):
+        """Mark a sent message sent, retrying; if every try fails it is sent again once its claim expires"""
+        for attempt in range(1, attempts + 1):
+            try:
+                return await self.complete(message)
+            except Exception as e:
+                if attempt == attempts:
+                    logger.error(
+                        f"Could not mark {message['channel']} notification to {message['recipient']} as sent, "
+                        f"it will be sent again after its claim expires: {e}"
+                    )
+                    return
+                await asyncio.sleep(delay * attempt)
+
+    async def fail(self, message: dict, error: Exception) -> str:
+        """Schedule a claimed message's next attempt, or dead-letter it; returns its new state"""
+        attempts = message["attempts"]
+        if attempts >= self.max_attempts:
+            update = {"state": DEAD}
+        else:
+            update = {
+                "state": PENDING,
+                "next_attempt_at": datetime.utcnow() + timedelta(seconds=self.backoff(attempts)),
+            }
+        update["last_error"] = f"{type(error).__name__}: {error}"
+        # attempts fences the update: if the claim expired and another worker
+        # took the message over, its outcome wins
+        await asyncio.to_thread(
+            _collection().update_one,
+            {"_id": message["_id"], "state": SENDING, "attempts": attempts},
+            {"$set": update},
+        )
+        return update["state"]
+
+    def backoff(self, attempts: int) -> float:
+        """Seconds to wait after the given number of failed attempts"""
+        return min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+
+    async def deliver(
+        self,
+        dispatcher: Dispatcher,
+        ledger: NotificationLedger,
+        stats: RunStats,
+        producer_done: Optional[asyncio.Event] = None,
+        timeout: Optional[float] = None
+    ):
+        """Send due messages on every dispatcher channel until none are due, or for at most ``timeout`` seconds.
+
+        Until ``producer_done`` is set, channels keep polling for messages still being added.
+        Messages not claimed in time stay in the outbox for the next delivery.
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        await asyncio.gather(*(
+            self._deliver_channel(channel, limits, dispatcher, ledger, stats, producer_done, deadline)
+            for channel, limits in dispatcher.channels.items()
+        ))
+        await dispatcher.join()
+
+    async def _deliver_channel(
+        self,
+        channel: str,
+        limits: ChannelLimits,
+        dispatcher: Dispatcher,
+        ledger: NotificationLedger,
+        stats: RunStats,
+        producer_done: Optional[asyncio.Event],
+        deadline: Optional[float]
+    ):
+        # Claim only a little ahead of the workers, so a claim never expires
+        # while its message waits in the dispatcher queue
+        in_flight = asyncio.Semaphore(2 * max(limits.concurrency, 1))
+        while deadline is None or time.monotonic() < deadline:
+            # Checked before claiming: everything was flushed before the event was set
+            done = producer_done is None or producer_done.is_set()
+            await in_flight.acquire()
+            message = await self.claim(channel)
+            if message is None:
+                in_flight.release()
+                if done:
+                    return
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await dispatcher.submit(self._outgoing(message, ledger, stats, in_flight))
+        logger.warning(f"Outbox delivery for {channel} stopped at its deadline; due messages wait for the next one")
+
+    def _outgoing(
+        self,
+        message: dict,
+        ledger: NotificationLedger,
+        stats: RunStats,
+        in_flight: asyncio.Semaphore
+    ) -> OutgoingMessage:
+        async def on_sent():
+            try:
+                stats.notifications_sent += 1
+                try:
+                    await ledger.record_many(message["notifications"])
+                finally:
+                    await self._complete_after_send(message)
+            finally:
+                in_flight.release()
+
+        async def on_failed(error: Exception):
+            try:
+                stats.notifications_failed += 1
+                if await self.fail(message, error) == DEAD:
+                    stats.notifications_dead += 1
+                    logger.error(
+                        f"Dead-lettered {message['channel']} notification to {message['recipient']} "
+                        f"after {message['attempts']} attempts"
+                    )
+            finally:
+                in_flight.release()
+
+        return OutgoingMessage(
+            channel=message["channel"],
+            recipient=message["recipient"],
+            body=message["body"],
+            subject=message.get("subject"),
+            html=message.get("html"),
+            on_sent=on_sent,
+            on_failed=on_failed,
+        )
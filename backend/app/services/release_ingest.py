@@ -0,0 +1,98 @@
+"""
+Release ingestion: new albums from browse/new-releases and subscribed artists
+"""
+import asyncio
+from typing import AsyncIterator, Iterable, List, Tuple, TypeVar
+from app.core.config import settings
+from app.core.spotify_client import SpotifyClient
+from app.services.artist_poller import ArtistPoller, subscribed_artist_ids
+from app.services.release_store import SOURCE_ARTISTS, SOURCE_NEW_RELEASES
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Spotify's maximum page size for browse/new-releases
+PAGE_SIZE = 50
+
+T = TypeVar("T")
+
+
+async def iter_new_releases(
+    client: SpotifyClient,
+    markets: Iterable[str],
+    max_pages: int = 2
+) -> AsyncIterator[dict]:
+    """Yield new-release albums for every market, de-duplicated by album id.
+
+    The first page of each market tells us how many more exist; the remaining
+    pages (up to ``max_pages``) are fetched concurrently, and albums are
+    yielded as soon as each page arrives.
+    """
+    seen = set()
+    queue: asyncio.Queue = asyncio.Queue()
+    pending = 0
+
+    async def fetch(market: str, offset: int):
+        try:
+            data = await client.get_new_releases(country=market, limit=PAGE_SIZE, offset=offset)
+            await queue.put((market, offset, (data or {}).get("albums") or {}))
+        except Exception as e:
+            logger.warning(f"Failed to fetch new releases for {market} at offset {offset}: {e}")
+            await queue.put((market, offset, {}))
+
+    tasks = []
+    for market in markets:
+        tasks.append(asyncio.create_task(fetch(market, 0)))
+        pending += 1
+
+    try:
+        while pending:
+            market, offset, page = await queue.get()
+            pending -= 1
+
+            if offset == 0 and page.get("next"):
+                total = page.get("total") or 0
+                last_offset = min(total, max_pages * PAGE_SIZE)
+                for next_offset in range(PAGE_SIZE, last_offset, PAGE_SIZE):
+                    tasks.append(asyncio.create_task(fetch(market, next_offset)))
+                    pending += 1
+
+            for album in page.get("items") or []:
+                if album and album["id"] not in seen:
+                    seen.add(album["id"])
+                    yield album
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def iter_release_albums(client: SpotifyClient, poller: ArtistPoller) -> AsyncIterator[Tuple[str, dict]]:
+    """All albums seen this run as (source, album) pairs: new releases across the
+    configured markets, then (if enabled) new albums of subscribed artists, each album once.
+
+    The caller commits ``poller`` once it has stored the albums yielded so far.
+    """
+    seen = set()
+    async for album in iter_new_releases(client, settings.get_release_markets, settings.release_max_pages):
+        seen.add(album["id"])
+        yield SOURCE_NEW_RELEASES, album
+
+    if settings.notifier_poll_artists:
+        artist_ids = await asyncio.to_thread(subscribed_artist_ids)
+        async for album in poller.poll(artist_ids):
+            if album["id"] not in seen:
+                seen.add(album["id"])
+                yield SOURCE_ARTISTS, album
+        logger.info(f"Polled {len(artist_ids)} artists with {poller.requests} Spotify requests")
+
+
+async def batched(items: AsyncIterator[T], size: int) -> AsyncIterator[List[T]]:
+    """Group an async stream into lists of at most ``size``"""
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
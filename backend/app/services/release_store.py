@@ -0,0 +1,192 @@
+"""
+Persistent release history and per-source "since last run" cursors
+"""
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from pymongo import UpdateOne
+from app.models.mongoengine_models import IngestCursor, Release
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SOURCE_NEW_RELEASES = "new_releases"
+SOURCE_ARTISTS = "artists"
+SOURCES = (SOURCE_NEW_RELEASES, SOURCE_ARTISTS)
+# Kept with the source cursors: when the last digest went out
+DIGEST_CURSOR = "digest"
+
+RELEASE_PROJECTION = {"source": 1, "first_seen_at": 1, "album": 1}
+
+
+def compact_album(album: dict) -> dict:
+    """The fields of a Spotify album object that matching and notifications use"""
+    return {
+        "id": album["id"],
+        "name": album["name"],
+        "release_date": album.get("release_date"),
+        "album_type": album.get("album_type"),
+        "artists": [{"id": artist["id"], "name": artist["name"]} for artist in album.get("artists") or []],
+        "external_urls": {"spotify": (album.get("external_urls") or {}).get("spotify")},
+    }
+
+
+class ReleaseStore:
+    """Records every album the first time it is seen and decides which ones a run handles.
+
+    Albums are upserted into ``releases`` with ``$setOnInsert``, so
+    ``first_seen_at`` belongs to the first run that saw them. A run handles
+    every album first seen after its source's cursor, whichever instance
+    recorded it; once the run succeeds, ``commit()`` moves each cursor to the
+    newest album it handled. A ``scope`` (e.g. a user shard) keeps its own
+    cursors, so shards sharing one release history each handle every album;
+    a scope without cursors yet starts where earlier runs left off.
+    """
+
+    def __init__(self, scope: Optional[str] = None, peers: Iterable[str] = ()):
+        self.scope = scope
+        # The other scopes of the same layout, e.g. the other shards of this shard count
+        self.peers = [peer for peer in peers if peer != scope]
+        self.cursors: Dict[str, datetime] = {}
+        self.last_digest_at: Optional[datetime] = None
+        self.inserted = 0
+        self._handled: Set[str] = set()
+        self._high_water: Dict[str, datetime] = {}
+
+    def _cursor_id(self, source: str) -> str:
+        return f"{self.scope}:{source}" if self.scope else source
+
+    async def load_cursors(self):
+        ids = {self._cursor_id(source): source for source in SOURCES + (DIGEST_CURSOR,)}
+        rows = await asyncio.to_thread(lambda: list(IngestCursor.objects(source__in=list(ids)).as_pymongo()))
+        cursors = {ids[row["_id"]]: row["last_success_at"] for row in rows}
+        self.last_digest_at = cursors.pop(DIGEST_CURSOR, None)
+        missing = [source for source in SOURCES if source not in cursors]
+        if self.scope and missing:
+            cursors.update(await asyncio.to_thread(self._seed_cursors, missing))
+        self.cursors = cursors
+
+    def _seed_cursors(self, sources: List[str]) -> Dict[str, datetime]:
+        """Start a scope without cursors (the first sharded run, or shards after a shard count
+        change) where earlier runs left off instead of replaying the whole release history.
+
+        Its peers are seeded at the same time, so a peer that commits first can't move the
+        starting point of the others past albums they still have to handle.
+        """
+        collection = IngestCursor._get_collection()
+        scopes = {self.scope, *self.peers}
+        seeds = {}
+        for source in sources:
+            # The unscoped cursor, else the oldest of an earlier layout: no user missed what came after it
+            earlier = {
+                row["_id"]: row["last_success_at"]
+                for row in collection.find({"_id": {"$regex": f"(^|:){source}$"}})
+                if row["_id"].rpartition(":")[0] not in scopes
+            }
+            start = earlier.get(source) or min(earlier.values(), default=None)
+            if start is None:
+                # No run ever finished, so the history holds only what those runs recorded
+                continue
+            # $setOnInsert, so peers and concurrent runs agree on one seed
+            for scope in sorted(scopes):
+                collection.update_one(
+                    {"_id": f"{scope}:{source}"},
+                    {"$setOnInsert": {"last_success_at": start}},
+                    upsert=True,
+                )
+            seeds[source] = collection.find_one({"_id": self._cursor_id(source)})["last_success_at"]
+        if seeds:
+            logger.info(f"Started release cursors of {self.scope} at {seeds}")
+        return seeds
+
+    def digest_due(self, window: float, now: Optional[datetime] = None) -> bool:
+        """Whether ``window`` seconds have passed since the last digest was sent"""
+        if self.last_digest_at is None or window <= 0:
+            return True
+        return ((now or datetime.utcnow()) - self.last_digest_at).total_seconds() >= window
+
+    async def pending(self) -> List[dict]:
+        """Albums first seen after the cursors that this run has not handled yet"""
+        clauses = []
+        for source in SOURCES:
+            cursor = self.cursors.get(source)
+            clause = {"source": source}
+            if cursor is not None:
+                clause["first_seen_at"] = {"$gt": cursor}
+            clauses.append(clause)
+
+        rows = await asyncio.to_thread(
+            lambda: list(Release._get_collection().find({"$or": clauses}, RELEASE_PROJECTION))
+        )
+        return self._take_unhandled(rows)
+
+    async def record(self, releases: List[Tuple[str, dict]]):
+        """Record (source, album) pairs without handling them, e.g. for shards to pick up later"""
+        if releases:
+            await asyncio.to_thread(self._upsert, releases)
+
+    async def record_new(self, releases: List[Tuple[str, dict]]) -> List[dict]:
+        """Record (source, album) pairs and return the albums new since the last successful run"""
+        if not releases:
+            return []
+        rows = await asyncio.to_thread(lambda: self._read_back(self._upsert(releases)))
+        return self._take_unhandled(rows)
+
+    async def commit(self, digest: bool = False):
+        """Advance the cursors past every album handled; call only after a successful run.
+
+        With ``digest``, the handled albums went out as a digest and its window restarts now.
+        """
+        if not self._high_water:
+            return
+        updates = dict(self._high_water)
+        if digest:
+            updates[DIGEST_CURSOR] = datetime.utcnow()
+        await asyncio.to_thread(
+            lambda: IngestCursor._get_collection().bulk_write([
+                UpdateOne({"_id": self._cursor_id(source)}, {"$set": {"last_success_at": seen_at}}, upsert=True)
+                for source, seen_at in updates.items()
+            ])
+        )
+        self.cursors.update(self._high_water)
+        if digest:
+            self.last_digest_at = updates[DIGEST_CURSOR]
+
+    def _take_unhandled(self, rows: List[dict]) -> List[dict]:
+        albums = []
+        for row in rows:
+            cursor = self.cursors.get(row["source"])
+            if row["_id"] in self._handled or (cursor is not None and row["first_seen_at"] <= cursor):
+                continue
+            self._handled.add(row["_id"])
+            if row["first_seen_at"] > self._high_water.get(row["source"], datetime.min):
+                self._high_water[row["source"]] = row["first_seen_at"]
+            albums.append(row["album"])
+        return albums
+
+    def _upsert(self, releases: List[Tuple[str, dict]]) -> List[str]:
+        now = datetime.utcnow()
+        albums = {album["id"]: (source, compact_album(album)) for source, album in releases}
+        result = Release._get_collection().bulk_write([
+            UpdateOne(
+                {"_id": album_id},
+                {"$setOnInsert": {
+                    "name": album["name"],
+                    "release_date": album["release_date"],
+                    "artist_ids": [artist["id"] for artist in album["artists"]],
+                    "source": source,
+                    "album": album,
+                    "first_seen_at": now,
+                }},
+                upsert=True,
+            )
+            for album_id, (source, album) in albums.items()
+        ], ordered=False)
+        self.inserted += result.upserted_count
+        return list(albums)
+
+    @staticmethod
+    def _read_back(album_ids: List[str]) -> List[dict]:
+        """When each album was first seen, by this run or an earlier one"""
+        rows = {row["_id"]: row for row in Release._get_collection().find({"_id": {"$in": album_ids}}, RELEASE_PROJECTION)}
+        return [rows[album_id] for album_id in album_ids if album_id in rows]
@@ -0,0 +1,183 @@
+"""
+Mongo-backed leases so each notifier cycle (or shard of it) runs on one instance
+"""
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional, TypeVar
+from pymongo.errors import DuplicateKeyError
+from app.core.config import settings
+from app.models.mongoengine_models import JobLease
+from app.utils.logger import get_logger
+from app.utils.sharding import Shard, all_shards
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+def instance_id() -> str:
+    """Owner name for leases taken by this process"""
+    return settings.instance_id or f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseLost(Exception):
+    """The lease expired or was taken over while the job was running"""
+
+
+class LeaseLock:
+    """A named lease in the ``job_leases`` collection.
+
+    ``acquire`` is a single ``find_one_and_update`` upsert: it matches only an
+    expired lease (or one we already own), so when another instance holds it
+    the upsert collides on ``_id`` and the duplicate-key error means "taken".
+    ``min_interval`` also refuses a lease whose last run finished less than
+    that long ago, so an instance that wakes up late doesn't repeat the cycle.
+    """
+
+    def __init__(self, name: str, owner: str, ttl: float = 60, min_interval: float = 0):
+        self.name = name
+        self.owner = owner
+        self.ttl = ttl
+        self.min_interval = min_interval
+
+    async def acquire(self) -> bool:
+        return await asyncio.to_thread(self._acquire)
+
+    async def renew(self) -> bool:
+        """Extend the lease; False if we no longer hold it"""
+        return await asyncio.to_thread(self._renew)
+
+    async def release(self, completed: bool = True):
+        await asyncio.to_thread(self._release, completed)
+
+    def _acquire(self) -> bool:
+        now = datetime.utcnow()
+        query = {
+            "_id": self.name,
+            "$or": [{"owner": self.owner}, {"expires_at": {"$lte": now}}],
+        }
+        if self.min_interval:
+            query["$and"] = [{"$or": [
+                {"completed_at": None},
+                {"completed_at": {"$lte": now - timedelta(seconds=self.min_interval)}},
+            ]}]
+        try:
+            JobLease._get_collection().find_one_and_update(
+                query,
+                {"$set": {
+                    "owner": self.owner,
+                    "acquired_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl),
+                }},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def _renew(self) -> bool:
+        result = JobLease._get_collection().update_one(
+            {"_id": self.name, "owner": self.owner},
+            {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=self.ttl)}},
+        )
+        return result.matched_count == 1
+
+    def _release(self, completed: bool):
+        now = datetime.utcnow()
+        update = {"expires_at": now}
+        if completed:
+            update["completed_at"] = now
+        JobLease._get_collection().update_one({"_id": self.name, "owner": self.owner}, {"$set": update})
+
+
+class RunCoordinator:
+    """Runs a job on whichever instance wins its lease, one lease per shard.
+
+    With ``shard_count`` 1 the whole job is a single lease; with more, every
+    instance walks the shards and runs each one it can lease, up to
+    ``concurrency`` at a time, so N instances split the users between them. A heartbeat renews the lease every ``ttl / 3``
+    seconds and cancels the job if the lease is lost.
+    """
+
+    def __init__(
+        self,
+        job_name: str,
+        owner: Optional[str] = None,
+        ttl: float = 60,
+        shard_count: int = 1,
+        min_interval: float = 0,
+        concurrency: int = 1
+    ):
+        self.job_name = job_name
+        self.owner = owner or instance_id()
+        self.ttl = ttl
+        self.shard_count = shard_count
+        self.min_interval = min_interval
+        self.concurrency = concurrency
+
+    def lease_for(self, shard: Shard) -> LeaseLock:
+        name = self.job_name if shard.count == 1 else f"{self.job_name}:{shard.name}"
+        return LeaseLock(name, self.owner, self.ttl, self.min_interval)
+
+    async def run_cycle(self, job: Callable[[Optional[Shard]], Awaitable[T]]) -> List[T]:
+        """Run ``job`` for every shard this instance can lease; returns the results of those that finished"""
+        semaphore = asyncio.Semaphore(max(self.concurrency, 1))
+
+        async def run_shard(shard: Shard) -> list:
+            async with semaphore:
+                return await self._run_shard(shard, job)
+
+        shards = all_shards(self.shard_count)
+        # Every shard runs to its end, and releases its lease, even when another fails
+        outcomes = await asyncio.gather(*(run_shard(shard) for shard in shards), return_exceptions=True)
+        results = []
+        for shard, outcome in zip(shards, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error(f"{self.job_name} failed for {shard.name}: {outcome!r}")
+            else:
+                results.extend(outcome)
+        return results
+
+    async def _run_shard(self, shard: Shard, job: Callable[[Optional[Shard]], Awaitable[T]]) -> List[T]:
+        lock = self.lease_for(shard)
+        if not await lock.acquire():
+            logger.info(f"{lock.name} is running elsewhere or already ran this cycle")
+            return []
+        logger.info(f"{self.owner} acquired {lock.name}")
+        completed = False
+        try:
+            result = await self._run_with_heartbeat(lock, job(shard if shard.count > 1 else None))
+            completed = True
+            return [result]
+        except LeaseLost:
+            logger.error(f"Lost {lock.name} while running, stopped this shard")
+            return []
+        finally:
+            await lock.release(completed)
+
+    async def _run_with_heartbeat(self, lock: LeaseLock, job: Awaitable[T]) -> T:
+        task = asyncio.ensure_future(job)
+        heartbeat = asyncio.create_task(self._heartbeat(lock, task))
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if heartbeat.done() and not heartbeat.cancelled() and heartbeat.result() is False:
+                raise LeaseLost(lock.name)
+            raise
+        finally:
+            heartbeat.cancel()
+
+    @staticmethod
+    async def _heartbeat(lock: LeaseLock, task: asyncio.Future) -> bool:
+        while True:
+            await asyncio.sleep(lock.ttl / 3)
+            try:
+                held = await lock.renew()
+            except Exception as e:
+                logger.exception(f"Error renewing {lock.name}:", exc_info=e)
+                continue
+            if not held:
+                task.cancel()
+                return False
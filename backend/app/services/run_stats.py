@@ -0,0 +1,29 @@
+"""
+Counters collected during a notifier run
+"""
+from dataclasses import dataclass, fields
+
+
+@dataclass
+class RunStats:
+    releases_seen: int = 0
+    albums: int = 0
+    users: int = 0
+    matches: int = 0
+    notifications_queued: int = 0
+    notifications_sent: int = 0
+    notifications_failed: int = 0  # failed send attempts; retried from the outbox
+    notifications_dead: int = 0  # dead-lettered after their last attempt
+    duplicates_skipped: int = 0
+    messages_rendered: int = 0
+    dedup_queries: int = 0
+    ledger_writes: int = 0
+
+    def merge(self, other: "RunStats") -> "RunStats":
+        """Add another run's counters into this one"""
+        for field in fields(self):
+            setattr(self, field.name, getattr(self, field.name) + getattr(other, field.name))
+        return self
+
+    def summary(self) -> str:
+        return ", ".join(f"{field.name}={getattr(self, field.name)}" for field in fields(self))
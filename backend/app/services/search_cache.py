@@ -0,0 +1,137 @@
+"""
+Cache for artist search results, keyed on the normalized query
+"""
+import asyncio
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from app.core.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # optional, only needed for SEARCH_CACHE_BACKEND=redis
+    aioredis = None
+
+
+class CacheBackend(ABC):
+    """Storage interface used by SearchCache"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float):
+        raise NotImplementedError
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """Bounded in-process cache with LRU eviction and per-entry expiry"""
+
+    def __init__(self, max_size: int = 10_000, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self._entries[key] = (self._clock() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Cache shared between workers; size is bounded by Redis' own maxmemory policy"""
+
+    def __init__(self, client, prefix: str = "search_artists:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: float):
+        await self.client.set(self.prefix + key, json.dumps(value), ex=max(int(ttl), 1))
+
+
+class SearchCache:
+    """Read-through cache for search results.
+
+    Concurrent misses for the same normalized query share one in-flight fetch
+    (single-flight), so a burst of identical keystrokes costs one Spotify call.
+    The fetch runs in its own task: a caller that goes away, the one that
+    started it included, doesn't cancel it for the others.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float = 300):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.casefold().split())
+
+    async def get_or_fetch(self, query: str, fetch: Callable[[str], Awaitable[Any]]) -> Any:
+        """Return the cached result for ``query`` or fetch, cache and return it"""
+        key = self.normalize(query)
+        cached = await self.backend.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_and_store(key, query, fetch))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(self, key: str, query: str, fetch: Callable[[str], Awaitable[Any]]) -> Any:
+        result = await fetch(query)
+        await self.backend.set(key, result, self.ttl)
+        return result
+
+    def _finished(self, key: str, task: asyncio.Task):
+        del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every caller went away
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+def create_search_cache() -> SearchCache:
+    """Build the search cache configured by SEARCH_CACHE_BACKEND ("memory" or "redis")"""
+    if settings.search_cache_backend == "redis":
+        if aioredis is None:
+            raise RuntimeError("SEARCH_CACHE_BACKEND=redis requires the 'redis' package")
+        backend = RedisCacheBackend(aioredis.from_url(settings.redis_url))
+    else:
+        backend = InMemoryCacheBackend(max_size=settings.search_cache_max_size)
+    return SearchCache(backend, ttl=settings.search_cache_ttl)
@@ -0,0 +1,76 @@
+"""
+Run notifier shards in worker processes, off the API's event loop
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Callable, Optional, Tuple
+from app.db.mongoengine_db import init_database
+from app.services.run_stats import RunStats
+from app.utils.logger import get_logger
+from app.utils.sharding import Shard
+
+logger = get_logger(__name__)
+
+
+def _init_worker():
+    init_database()
+
+
+def _run_shard(shard: Optional[Shard]) -> RunStats:
+    """Worker process entry point: notify one shard's users about the releases already ingested"""
+    return asyncio.run(_notify_shard(shard))
+
+
+async def _notify_shard(shard: Optional[Shard]) -> RunStats:
+    # Imported in the worker so the parent can import this module from the notifier
+    from app.core.spotify_client import spotify_client
+    from app.repositories.registry import close_repositories, init_repositories
+    from app.services.email_sender import close_smtp_pool
+    from app.services.sms_sender import close_sms_client
+    from app.services.telegram_sender import close_telegram_sender
+    from app.services.notifier import check_new_releases_and_notify
+
+    # The asyncio Mongo client belongs to this worker's event loop
+    await init_repositories()
+    try:
+        return await check_new_releases_and_notify(shard, fetch=False)
+    finally:
+        await close_smtp_pool()
+        await close_sms_client()
+        await close_telegram_sender()
+        await spotify_client.close()
+        await close_repositories()
+
+
+class ShardProcessPool:
+    """Process pool that runs one notifier shard per task.
+
+    Each worker has its own Mongo connection, SMTP pool and dispatcher, so
+    matching and rendering use every core and never block the API. Workers
+    are spawned rather than forked: the parent holds open sockets and
+    event-loop threads a forked child must not inherit.
+    """
+
+    def __init__(
+        self,
+        processes: int,
+        initializer: Callable = _init_worker,
+        initargs: Tuple = ()
+    ):
+        self.processes = processes
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=get_context("spawn"),
+            initializer=initializer,
+            initargs=initargs,
+        )
+
+    async def __aenter__(self) -> "ShardProcessPool":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await asyncio.to_thread(self._executor.shutdown)
+
+    async def run(self, shard: Optional[Shard], target: Callable = _run_shard) -> RunStats:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, target, shard)
@@ -1,13 +1,178 @@
-from twilio.rest import Client
+"""
+Twilio SMS over one pooled async HTTP client
+"""
+import asyncio
+import random
+from typing import Iterable, List, Optional, Tuple, Union
+import httpx
 from app.core.config import settings
+from app.core.spotify_scheduler import parse_retry_after
+from app.utils.logger import get_logger
+from app.utils.rate_limit import TokenBucket
 
+logger = get_logger(__name__)
 
-def send_sms(to_phone: str, message: str):
-    client = Client(settings.twilio_account_sid, settings.twilio_auth_token)
+# Rejected before a message was created: safe to send again
+RETRYABLE_STATUSES = (429, 503)
 
-    message = client.messages.create(
-        body=message,
-        from_=settings.twilio_phone_number,
-        to=to_phone
-    )
-    print(message.sid)
+
+class SMSError(Exception):
+    """Twilio rejected a message, or kept failing after every retry"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code  # Twilio error code, e.g. 21211 for an invalid "To" number
+
+
+class TwilioSMSClient:
+    """Sends SMS through Twilio's Messages REST API.
+
+    One ``httpx.AsyncClient`` keeps its connections to Twilio alive across
+    messages, so sends never block the event loop or pay a TLS handshake each.
+    Every send takes a token from a shared bucket (``rate_per_second``, 0 is
+    unlimited). Only failures where Twilio surely created no message are
+    retried with backoff: connection errors, 429 and 503. Anything else, a
+    read timeout or another 5xx included, raises SMSError straight away and
+    is left to the outbox, so a message is never sent twice.
+    """
+
+    def __init__(
+        self,
+        account_sid: str,
+        auth_token: str,
+        from_number: str,
+        api_url: str = "https://api.twilio.com",
+        rate_per_second: float = 0,
+        max_connections: int = 10,
+        timeout: float = 30,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_number = from_number
+        self.api_url = api_url.rstrip("/")
+        self.bucket = TokenBucket(rate_per_second)
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._transport = transport
+        self._http: Optional[httpx.AsyncClient] = None
+
+    @classmethod
+    def from_settings(cls) -> "TwilioSMSClient":
+        return cls(
+            account_sid=settings.twilio_account_sid,
+            auth_token=settings.twilio_auth_token,
+            from_number=settings.twilio_phone_number,
+            api_url=settings.twilio_api_url,
+            rate_per_second=settings.sms_rate_limit,
+            max_connections=settings.twilio_max_connections,
+            timeout=settings.twilio_timeout,
+        )
+
+    @property
+    def messages_url(self) -> str:
+        return f"{self.api_url}/2010-04-01/Accounts/{self.account_sid}/Messages.json"
+
+    async def start(self):
+        if self._http is not None:
+            return
+        self._http = httpx.AsyncClient(
+            auth=(self.account_sid, self.auth_token),
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            timeout=self.timeout,
+            transport=self._transport,
+        )
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def send(self, to_phone: str, body: str) -> str:
+        """Send one SMS and return its Twilio message SID"""
+        await self.start()
+        data = {"To": to_phone, "From": self.from_number, "Body": body}
+        for attempt in range(1, self.max_retries + 1):
+            await self.bucket.acquire()
+            try:
+                response = await self._http.post(self.messages_url, data=data)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                # The request never reached Twilio
+                if attempt >= self.max_retries:
+                    raise SMSError(f"Twilio unreachable: {e}") from e
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            except httpx.TransportError as e:
+                raise SMSError(f"Twilio request failed: {e}") from e
+
+            if response.status_code < 300:
+                return response.json()["sid"]
+            if response.status_code in RETRYABLE_STATUSES:
+                if attempt < self.max_retries:
+                    delay = (
+                        parse_retry_after(response.headers.get("Retry-After"), self._backoff(attempt))
+                        if response.status_code == 429 else self._backoff(attempt)
+                    )
+                    logger.warning(f"Twilio returned {response.status_code}, retrying in {delay:.1f} seconds")
+                    await asyncio.sleep(delay)
+                    continue
+            raise self._error(response)
+
+    async def send_many(
+        self,
+        messages: Iterable[Tuple[str, str]],
+        concurrency: int = 10
+    ) -> List[Union[str, Exception]]:
+        """Send (to_phone, body) pairs over the pooled connections, at most ``concurrency`` at a time.
+
+        Returns the SID or the exception of each message, in order.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send_one(to_phone: str, body: str) -> str:
+            async with semaphore:
+                return await self.send(to_phone, body)
+
+        return await asyncio.gather(*(send_one(*message) for message in messages), return_exceptions=True)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, self.backoff_base * 2 ** attempt)
+
+    @staticmethod
+    def _error(response: httpx.Response) -> SMSError:
+        try:
+            details = response.json()
+        except ValueError:
+            details = {}
+        return SMSError(
+            f"Twilio returned {response.status_code}: {details.get('message') or response.text}",
+            status_code=response.status_code,
+            code=details.get("code"),
+        )
+
+
+_client: Optional[TwilioSMSClient] = None
+
+
+def get_sms_client() -> TwilioSMSClient:
+    """Process-wide Twilio client, created on first use"""
+    global _client
+    if _client is None:
+        _client = TwilioSMSClient.from_settings()
+    return _client
+
+
+async def close_sms_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+async def send_sms(to_phone: str, message: str) -> str:
+    return await get_sms_client().send(to_phone, message)
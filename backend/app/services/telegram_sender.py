@@ -1,6 +1,157 @@
-from app.core.config import settings
+"""
+Telegram delivery through one long-lived Bot session
+"""
+import asyncio
+import time
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 from telegram import Bot
+from telegram.error import RetryAfter
+from telegram.request import HTTPXRequest
+from app.core.config import settings
+from app.utils.logger import get_logger
+from app.utils.rate_limit import TokenBucket
+
+logger = get_logger(__name__)
+
+
+class TelegramSender:
+    """Sends bot messages over one initialized ``Bot`` and its connection pool.
+
+    Telegram's flood limits are enforced before sending: a global token bucket
+    (``rate_per_second``, about 30 for bots) and at most one message per chat
+    every ``per_chat_interval`` seconds. A ``RetryAfter`` answer pauses every
+    send for the time Telegram asks and the message is retried.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        base_url: str = "https://api.telegram.org/bot",
+        rate_per_second: float = 30,
+        per_chat_interval: float = 1.0,
+        pool_size: int = 32,
+        timeout: float = 10,
+        max_retries: int = 3
+    ):
+        self.bucket = TokenBucket(rate_per_second)
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self.bot = Bot(
+            token=token,
+            base_url=base_url,
+            request=HTTPXRequest(
+                connection_pool_size=pool_size,
+                read_timeout=timeout,
+                write_timeout=timeout,
+                connect_timeout=timeout,
+                # Senders queue for a pooled connection instead of failing after 1s
+                pool_timeout=timeout,
+            ),
+        )
+        self._started = False
+        self._start_lock = asyncio.Lock()
+        self._paused_until = 0.0
+        self._chat_next_send: Dict[str, float] = {}
+
+    @classmethod
+    def from_settings(cls) -> "TelegramSender":
+        return cls(
+            token=settings.telegram_bot_token,
+            base_url=settings.telegram_api_url,
+            rate_per_second=settings.telegram_rate_limit,
+            per_chat_interval=settings.telegram_per_chat_interval,
+            pool_size=settings.telegram_pool_size,
+            timeout=settings.telegram_timeout,
+        )
+
+    async def start(self):
+        """Initialize the bot once (a single getMe call) and open its connection pool"""
+        async with self._start_lock:
+            if not self._started:
+                await self.bot.initialize()
+                self._started = True
+
+    async def close(self):
+        async with self._start_lock:
+            if self._started:
+                await self.bot.shutdown()
+                self._started = False
+
+    async def send(self, chat_id: str, text: str, parse_mode: Optional[str] = None) -> int:
+        """Send one message and return its Telegram message id"""
+        if not self._started:
+            await self.start()
+        for attempt in range(1, self.max_retries + 1):
+            await self._wait_for_chat(chat_id)
+            await self._wait_for_pause()
+            await self.bucket.acquire()
+            try:
+                message = await self.bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+                return message.message_id
+            except RetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = _seconds(e.retry_after)
+                logger.warning(f"Telegram flood limit hit. Pausing all sends for {delay} seconds.")
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    async def send_many(
+        self,
+        messages: Iterable[Tuple[str, str]],
+        parse_mode: Optional[str] = None,
+        concurrency: int = 30
+    ) -> List[Union[int, Exception]]:
+        """Send (chat_id, text) pairs, at most ``concurrency`` at a time.
+
+        Returns the message id or the exception of each message, in order.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send_one(chat_id: str, text: str) -> int:
+            async with semaphore:
+                return await self.send(chat_id, text, parse_mode)
+
+        return await asyncio.gather(*(send_one(*message) for message in messages), return_exceptions=True)
+
+    async def _wait_for_pause(self):
+        delay = self._paused_until - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._paused_until - time.monotonic()
+
+    async def _wait_for_chat(self, chat_id: str):
+        """Reserve the chat's next send slot, then sleep until it comes"""
+        now = time.monotonic()
+        slot = max(now, self._chat_next_send.get(chat_id, 0.0))
+        self._chat_next_send[chat_id] = slot + self.per_chat_interval
+        if len(self._chat_next_send) > 10_000:
+            self._chat_next_send = {chat: at for chat, at in self._chat_next_send.items() if at > now}
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+def _seconds(retry_after: Union[int, float, timedelta]) -> float:
+    return retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+
+
+_sender: Optional[TelegramSender] = None
+
+
+def get_telegram_sender() -> TelegramSender:
+    """Process-wide Telegram sender, created on first use"""
+    global _sender
+    if _sender is None:
+        _sender = TelegramSender.from_settings()
+    return _sender
+
+
+async def close_telegram_sender():
+    global _sender
+    if _sender is not None:
+        await _sender.close()
+        _sender = None
+
 
-async def send_telegram_message(chat_id: str, message: str):
-    async with Bot(token=settings.telegram_bot_token) as bot:
-        await bot.send_message(text=message, chat_id=chat_id)
\ No newline at end of file
+async def send_telegram_message(chat_id: str, message: str, parse_mode: Optional[str] = None) -> int:
+    return await get_telegram_sender().send(chat_id, message, parse_mode)
@@ -0,0 +1,32 @@
+import zlib
+from typing import List, NamedTuple, Tuple
+
+# shard keys are unsigned 32-bit CRCs
+KEY_SPACE = 2 ** 32
+
+
+def shard_key_for(email: str) -> int:
+    """Stable hash of a user's email, identical across processes and restarts"""
+    return zlib.crc32(email.strip().lower().encode("utf-8"))
+
+
+class Shard(NamedTuple):
+    """One of ``count`` equal ranges of the shard key space"""
+    index: int
+    count: int
+
+    @property
+    def name(self) -> str:
+        return f"shard-{self.index + 1}-of-{self.count}"
+
+    def bounds(self) -> Tuple[int, int]:
+        """Half-open [low, high) range of shard keys in this shard"""
+        return (KEY_SPACE * self.index // self.count, KEY_SPACE * (self.index + 1) // self.count)
+
+    def __contains__(self, shard_key: int) -> bool:
+        low, high = self.bounds()
+        return low <= shard_key < high
+
+
+def all_shards(count: int) -> List[Shard]:
+    return [Shard(index, count) for index in range(max(count, 1))]
@@ -0,0 +1,54 @@
+"""
+Benchmark typeahead lookups on a synthetic in-memory artist catalog.
+
+    python -m benchmarks.bench_artist_catalog --artists 1000000 --queries 100000
+"""
+import argparse
+import random
+import string
+import time
+
+from app.services.artist_catalog import ArtistCatalog
+
+
+def synthetic_name(rng: random.Random) -> str:
+    words = rng.randint(1, 3)
+    return " ".join(
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))).title()
+        for _ in range(words)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--artists", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=100_000)
+    parser.add_argument("--min-prefix", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    names = [synthetic_name(rng) for _ in range(args.artists)]
+
+    start = time.perf_counter()
+    catalog = ArtistCatalog()
+    catalog.load_artists(
+        {"id": f"artist{i}", "name": name, "popularity": rng.randint(0, 100)}
+        for i, name in enumerate(names)
+    )
+    print(f"built index for {len(catalog)} artists in {time.perf_counter() - start:.1f}s")
+
+    queries = []
+    for _ in range(args.queries):
+        name = rng.choice(names)
+        queries.append(name[:rng.randint(args.min_prefix, max(args.min_prefix, len(name)))])
+
+    for label in ("cold", "warm"):
+        start = time.perf_counter()
+        for query in queries:
+            catalog.search(query, limit=10)
+        elapsed = time.perf_counter() - start
+        print(f"{label}: {args.queries / elapsed:,.0f} lookups/s ({elapsed / args.queries * 1e6:.1f} µs/lookup)")
+
+
+if __name__ == "__main__":
+    main()
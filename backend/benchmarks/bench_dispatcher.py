@@ -0,0 +1,57 @@
+"""
+Benchmark notification fan-out: sequential awaits vs the per-channel Dispatcher.
+
+Senders are stubs that sleep for a fixed provider latency, so no network is used:
+    python -m benchmarks.bench_dispatcher --messages 100000 --latency 0.2
+"""
+import argparse
+import asyncio
+import time
+
+from app.services.dispatcher import ChannelLimits, Dispatcher, OutgoingMessage
+
+CHANNELS = ("email", "telegram", "sms")
+
+
+def make_sender(latency: float):
+    async def send(message):
+        await asyncio.sleep(latency)
+    return send
+
+
+async def sequential(messages: int, latency: float) -> float:
+    send = make_sender(latency)
+    start = time.perf_counter()
+    for i in range(messages):
+        await send(OutgoingMessage(CHANNELS[i % 3], str(i), "body"))
+    return time.perf_counter() - start
+
+
+async def dispatched(messages: int, latency: float, limits) -> Dispatcher:
+    dispatcher = Dispatcher({channel: make_sender(latency) for channel in CHANNELS}, limits)
+    async with dispatcher:
+        for i in range(messages):
+            await dispatcher.submit(OutgoingMessage(CHANNELS[i % 3], str(i), "body"))
+    return dispatcher
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated provider latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=200, help="workers per channel")
+    parser.add_argument("--sample", type=int, default=50, help="messages timed for the sequential estimate")
+    args = parser.parse_args()
+
+    per_message = await sequential(args.sample, args.latency) / args.sample
+    print(f"sequential: ~{per_message * args.messages / 60:.1f} min for {args.messages} messages (extrapolated)")
+
+    limits = {channel: ChannelLimits(args.concurrency) for channel in CHANNELS}
+    start = time.perf_counter()
+    dispatcher = await dispatched(args.messages, args.latency, limits)
+    elapsed = time.perf_counter() - start
+    print(f"dispatcher: {elapsed:.1f}s for {args.messages} messages, {dispatcher.report()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
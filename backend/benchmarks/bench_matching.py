@@ -0,0 +1,76 @@
+"""
+Benchmark the release matching pass: per-user album loop vs SubscriberIndex.
+
+Run from the backend directory:
+    python -m benchmarks.bench_matching --users 10000 100000 1000000
+"""
+import argparse
+import random
+import time
+
+from app.services.matching import SubscriberIndex
+
+
+def synthetic_users(count: int, artists: int, per_user: int, seed: int = 1):
+    rng = random.Random(seed)
+    return [
+        {
+            "email": f"user{i}@example.com",
+            "subscribed_artists": [{"id": f"artist{a}"} for a in rng.sample(range(artists), per_user)],
+        }
+        for i in range(count)
+    ]
+
+
+def synthetic_albums(count: int, artists: int, seed: int = 2):
+    rng = random.Random(seed)
+    return [
+        {"id": f"album{i}", "artists": [{"id": f"artist{a}"} for a in rng.sample(range(artists), 2)]}
+        for i in range(count)
+    ]
+
+
+def naive_match(users, albums):
+    """The original nested loop from check_new_releases_and_notify"""
+    matches = 0
+    for user in users:
+        subscribed_artists = {artist["id"] for artist in user["subscribed_artists"]}
+        for album in albums:
+            album_artists_ids = {artist["id"] for artist in album["artists"]}
+            if album_artists_ids.intersection(subscribed_artists):
+                matches += 1
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--albums", type=int, default=50)
+    parser.add_argument("--artists", type=int, default=200_000)
+    parser.add_argument("--per-user", type=int, default=10)
+    args = parser.parse_args()
+
+    albums = synthetic_albums(args.albums, args.artists)
+    print(f"{'users':>10} {'naive (s)':>10} {'build (s)':>10} {'match (s)':>10} {'speedup':>8} {'matches':>8}")
+    for count in args.users:
+        users = synthetic_users(count, args.artists, args.per_user)
+
+        start = time.perf_counter()
+        expected = naive_match(users, albums)
+        naive = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = SubscriberIndex.build(users)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matches = sum(1 for _ in index.match(albums))
+        match = time.perf_counter() - start
+
+        assert matches == expected
+        speedup = naive / (build + match)
+        print(f"{count:>10} {naive:>10.3f} {build:>10.3f} {match:>10.6f} {speedup:>7.1f}x {matches:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark outbox delivery under partial provider outages: how many messages go
+out per second, and how long a run takes, when a share of sends fail.
+
+Needs a running MongoDB. Senders are stubs that sleep for a fixed provider
+latency and fail for the given share of recipients:
+    python -m benchmarks.bench_outbox --messages 5000 --failure-rates 0 0.1 0.5 --latency 0.02
+"""
+import argparse
+import asyncio
+import time
+
+from mongoengine import connect
+from mongoengine.connection import get_db
+
+from app.db.indexes import ensure_indexes
+from app.models.mongoengine_models import OutboxMessage
+from app.services.dispatcher import ChannelLimits, Dispatcher, OutgoingMessage
+from app.services.ledger import NotificationLedger
+from app.services.outbox import Outbox, delivery_key
+from app.services.run_stats import RunStats
+
+
+def make_sender(latency: float, failure_rate: float):
+    async def send(message):
+        await asyncio.sleep(latency)
+        # Fail for a fixed share of recipients, like addresses behind a broken provider
+        if hash(message.recipient) % 1000 < failure_rate * 1000:
+            raise ConnectionError("provider unavailable")
+    return send
+
+
+async def seed(outbox: Outbox, messages: int):
+    OutboxMessage._get_collection().delete_many({})
+    for i in range(messages):
+        email = f"user{i}@example.com"
+        await outbox.add(
+            OutgoingMessage("email", email, "New release"),
+            keys=[delivery_key(email, "album", "email")],
+            notifications=[],
+        )
+    await outbox.flush()
+
+
+async def run(args, failure_rate: float):
+    # Retries are never due within the run, so each message is attempted once
+    outbox = Outbox(backoff_base=3600)
+    await seed(outbox, args.messages)
+    dispatcher = Dispatcher(
+        {"email": make_sender(args.latency, failure_rate)},
+        {"email": ChannelLimits(args.concurrency)},
+    )
+    stats = RunStats()
+    start = time.perf_counter()
+    async with NotificationLedger() as ledger:
+        async with dispatcher:
+            await outbox.deliver(dispatcher, ledger, stats, timeout=args.timeout)
+    elapsed = time.perf_counter() - start
+    attempted = stats.notifications_sent + stats.notifications_failed
+    print(
+        f"failure rate {failure_rate:.0%}: {stats.notifications_sent:,} sent, "
+        f"{stats.notifications_failed:,} failed in {elapsed:.2f}s "
+        f"({attempted / elapsed:,.0f} attempts/s, {stats.notifications_sent / elapsed:,.0f} sent/s)"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/music_notifier_bench")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--failure-rates", type=float, nargs="+", default=[0, 0.1, 0.5])
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=None, help="stop claiming after this many seconds")
+    args = parser.parse_args()
+
+    connect(host=args.mongo_uri)
+    ensure_indexes(get_db())
+    for failure_rate in args.failure_rates:
+        await run(args, failure_rate)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
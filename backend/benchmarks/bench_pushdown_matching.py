@@ -0,0 +1,98 @@
+"""
+Benchmark subscriber matching for one album batch: scan every user and match in
+Python vs push the artist filter down to Mongo (multikey subscribed_artists.id index).
+
+Needs a running MongoDB. Seed once, then vary how many distinct artists the
+album batch has, which sets the share of users that match:
+    python -m benchmarks.bench_pushdown_matching --seed 1000000
+    python -m benchmarks.bench_pushdown_matching --album-artists 10 100 1000
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from mongoengine import connect
+from mongoengine.connection import get_db
+
+from app.db.indexes import ensure_indexes
+from app.models.mongoengine_models import User
+from app.repositories.mongoengine_repositories import MongoEngineUserRepository
+from app.services.matching import SubscriberIndex
+from app.utils.sharding import shard_key_for
+
+
+def seed(count: int, artists: int, per_user: int = 10, chunk: int = 10_000):
+    rng = random.Random(1)
+    collection = User._get_collection()
+    collection.drop()
+    for start in range(0, count, chunk):
+        collection.insert_many([
+            {
+                "email": f"user{i}@example.com",
+                "subscribed_artists": [
+                    {"id": f"artist{a}", "name": f"Artist {a}", "url": None}
+                    for a in rng.sample(range(artists), per_user)
+                ],
+                "notification_methods": ["email"],
+                "shard_key": shard_key_for(f"user{i}@example.com"),
+            }
+            for i in range(start, min(start + chunk, count))
+        ])
+    ensure_indexes(get_db())
+
+
+def album_batch(album_artists: int, artists: int, seed: int = 2):
+    rng = random.Random(seed)
+    return [
+        {"id": f"album{a}", "artists": [{"id": f"artist{a}"}]}
+        for a in rng.sample(range(artists), album_artists)
+    ]
+
+
+async def match(batches, albums):
+    users = matches = 0
+    async for batch in batches:
+        users += len(batch)
+        matches += sum(1 for _ in SubscriberIndex.build(batch).match(albums))
+    return users, matches
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/music_notifier_bench")
+    parser.add_argument("--seed", type=int, help="insert this many synthetic users and exit")
+    parser.add_argument("--artists", type=int, default=50_000)
+    parser.add_argument("--album-artists", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    connect(host=args.mongo_uri)
+    if args.seed:
+        seed(args.seed, args.artists)
+        print(f"Seeded {args.seed} users")
+        return
+
+    repository = MongoEngineUserRepository()
+    total = User._get_collection().estimated_document_count()
+    for album_artists in args.album_artists:
+        albums = album_batch(album_artists, args.artists)
+        artist_ids = {artist["id"] for album in albums for artist in album["artists"]}
+
+        start = time.perf_counter()
+        _, scan_matches = await match(repository.iter_batches(args.batch_size), albums)
+        scan = time.perf_counter() - start
+
+        start = time.perf_counter()
+        read, pushdown_matches = await match(repository.find_subscribers(artist_ids, args.batch_size), albums)
+        pushdown = time.perf_counter() - start
+
+        assert scan_matches == pushdown_matches
+        print(
+            f"{album_artists} album artists, {read:,} of {total:,} users match ({read / total:.2%}): "
+            f"scan {scan:.2f}s, pushdown {pushdown:.2f}s, {scan / pushdown:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
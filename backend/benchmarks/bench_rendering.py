@@ -0,0 +1,74 @@
+"""
+Benchmark message rendering for a run: once per match and channel vs memoized
+per (album, matched artists, channel).
+
+Run from the backend directory:
+    python -m benchmarks.bench_rendering --matches 1000000 --albums 200
+"""
+import argparse
+import random
+import time
+
+from app.services.message_templates import RENDERERS, MessageRenderer
+
+CHANNELS = ("email", "telegram", "sms")
+
+
+def synthetic_matches(count: int, albums: int, seed: int = 1):
+    rng = random.Random(seed)
+    catalog = [
+        {
+            "id": f"album{i}",
+            "name": f"Album {i}",
+            "release_date": "2024-01-01",
+            "artists": [{"id": f"artist{i}-{a}", "name": f"Artist {i}-{a}"} for a in range(3)],
+            "external_urls": {"spotify": f"https://open.spotify.com/album/album{i}"},
+        }
+        for i in range(albums)
+    ]
+    matches = []
+    for _ in range(count):
+        album = rng.choice(catalog)
+        matched = {artist["id"] for artist in album["artists"] if rng.random() < 0.5} or {album["artists"][0]["id"]}
+        matches.append((album, matched))
+    return matches
+
+
+def render_every_match(matches):
+    for album, matched in matches:
+        names = [artist["name"] for artist in album["artists"] if artist["id"] in matched]
+        for channel in CHANNELS:
+            RENDERERS[channel](album, names, 160)
+
+
+def render_memoized(matches) -> MessageRenderer:
+    renderer = MessageRenderer()
+    for album, matched in matches:
+        for channel in CHANNELS:
+            renderer.render(album, matched, channel)
+    return renderer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--matches", type=int, default=1_000_000)
+    parser.add_argument("--albums", type=int, default=200)
+    args = parser.parse_args()
+
+    matches = synthetic_matches(args.matches, args.albums)
+
+    start = time.perf_counter()
+    render_every_match(matches)
+    naive = time.perf_counter() - start
+
+    start = time.perf_counter()
+    renderer = render_memoized(matches)
+    memoized = time.perf_counter() - start
+
+    print(f"{args.matches:,} matches x {len(CHANNELS)} channels")
+    print(f"render every match: {naive:.2f}s")
+    print(f"memoized:           {memoized:.2f}s, {naive / memoized:.1f}x ({renderer.renders:,} renders)")
+
+
+if __name__ == "__main__":
+    main()
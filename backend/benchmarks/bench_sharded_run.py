@@ -0,0 +1,137 @@
+"""
+Benchmark a notifier run on the event loop vs sharded across worker processes.
+
+Needs a running MongoDB. Spotify is the local fake API and deliveries are
+no-ops, so the timing covers matching, rendering, dedup queries and ledger
+writes. Seed once, then compare process counts:
+    python -m benchmarks.bench_sharded_run --seed 200000
+    python -m benchmarks.bench_sharded_run --processes 1 2 4 8
+    python -m benchmarks.bench_sharded_run --processes 4 --digest   # one message per user and channel
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+
+from mongoengine import connect
+from mongoengine.connection import get_db
+
+from app.core.config import settings
+from app.core.spotify_client import spotify_client
+from app.core.spotify_scheduler import SpotifyRequestScheduler
+from app.db.indexes import ensure_indexes
+from app.models.mongoengine_models import IngestCursor, JobLease, Notification, Release, User
+from app.services import notifier
+from app.services.shard_runner import ShardProcessPool
+from app.utils.sharding import all_shards, shard_key_for
+from benchmarks import fake_spotify
+
+
+def seed(count: int, artists: int, per_user: int = 10, chunk: int = 10_000):
+    rng = random.Random(1)
+    collection = User._get_collection()
+    collection.drop()
+    for start in range(0, count, chunk):
+        collection.insert_many([
+            {
+                "email": f"user{i}@example.com",
+                "subscribed_artists": [
+                    {"id": f"artist{a}", "name": f"Artist {a}", "url": None}
+                    for a in rng.sample(range(artists), per_user)
+                ],
+                "notification_methods": ["email", "telegram"],
+                "telegram_chat_id": str(i),
+                "shard_key": shard_key_for(f"user{i}@example.com"),
+            }
+            for i in range(start, min(start + chunk, count))
+        ])
+    ensure_indexes(get_db())
+
+
+async def _deliver(*args):
+    pass
+
+
+def stub_delivery():
+    """No-op senders without per-channel rate limits"""
+    settings.email_rate_limit = settings.telegram_rate_limit = settings.sms_rate_limit = 0
+    notifier.send_email = _deliver
+    notifier.send_telegram_message = _deliver
+    notifier.send_sms = _deliver
+
+
+def init_bench_worker(mongo_uri: str, digest: bool = False):
+    connect(host=mongo_uri)
+    settings.notifier_digest = digest
+    stub_delivery()
+
+
+def warm_up(shard):
+    return None
+
+
+def reset():
+    """Forget the previous run so every run matches and records everything again"""
+    for document in (Notification, Release, IngestCursor, JobLease):
+        document._get_collection().delete_many({})
+
+
+async def run_on_event_loop():
+    reset()
+    start = time.perf_counter()
+    stats = await notifier.check_new_releases_and_notify()
+    return time.perf_counter() - start, stats
+
+
+async def run_in_processes(processes: int, mongo_uri: str):
+    reset()
+    initargs = (mongo_uri, settings.notifier_digest)
+    async with ShardProcessPool(processes, initializer=init_bench_worker, initargs=initargs) as pool:
+        await asyncio.gather(*(pool.run(None, target=warm_up) for _ in range(processes)))
+        start = time.perf_counter()
+        stats = await notifier.ingest_releases()
+        for shard_stats in await asyncio.gather(*(pool.run(shard) for shard in all_shards(processes))):
+            stats.merge(shard_stats)
+        return time.perf_counter() - start, stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/music_notifier_bench")
+    parser.add_argument("--seed", type=int, help="insert this many synthetic users and exit")
+    parser.add_argument("--artists", type=int, default=5000)
+    parser.add_argument("--albums", type=int, default=100)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--digest", action="store_true", help="run in digest mode")
+    args = parser.parse_args()
+    settings.notifier_digest = args.digest
+
+    connect(host=args.mongo_uri)
+    if args.seed:
+        seed(args.seed, args.artists)
+        print(f"Seeded {args.seed} users")
+        return
+
+    fake_spotify.NEW_RELEASE_COUNT = args.albums
+    base_url = fake_spotify.serve_in_thread()
+    spotify_client.token_url = f"{base_url}/api/token"
+    spotify_client.api_url = f"{base_url}/v1"
+    spotify_client.scheduler = SpotifyRequestScheduler(rate_per_second=0)
+    settings.notifier_poll_artists = False
+    settings.release_max_pages = math.ceil(args.albums / 50)
+    stub_delivery()
+
+    baseline, stats = await run_on_event_loop()
+    print(f"event loop: {baseline:.2f}s ({stats.matches} matches, {stats.notifications_sent} sent)")
+    for processes in args.processes:
+        elapsed, stats = await run_in_processes(processes, args.mongo_uri)
+        print(
+            f"{processes} processes: {elapsed:.2f}s, {baseline / elapsed:.2f}x "
+            f"({stats.matches} matches, {stats.notifications_sent} sent)"
+        )
+    await spotify_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
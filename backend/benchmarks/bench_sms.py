@@ -0,0 +1,86 @@
+"""
+Benchmark SMS delivery against a local fake Twilio API: a new blocking
+twilio.rest.Client per message on the event loop (the previous send_sms) vs
+the pooled async TwilioSMSClient. Also reports the longest event loop stall,
+which is how long API requests would have waited.
+
+    python -m benchmarks.bench_sms --messages 500 --concurrency 20 --latency 0.05
+"""
+import argparse
+import asyncio
+import time
+
+from twilio.rest import Client
+
+from app.services.sms_sender import TwilioSMSClient
+from benchmarks import fake_twilio
+
+ACCOUNT_SID = "AC00000000000000000000000000000000"
+
+
+class LoopLagMonitor:
+    """Records the longest delay of a coroutine that wakes up every millisecond"""
+
+    def __init__(self):
+        self.max_lag = 0.0
+        self._task = None
+
+    async def _watch(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            self.max_lag = max(self.max_lag, time.perf_counter() - start - 0.001)
+
+    async def __aenter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._watch())
+        await asyncio.sleep(0.01)  # let the watcher start before the workload
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._task.cancel()
+
+
+async def blocking_per_message(api_url: str, messages: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(i):
+        async with semaphore:
+            client = Client(ACCOUNT_SID, "token")
+            client.api.base_url = api_url
+            client.messages.create(body="New release", from_="+15550000000", to=f"+1555{i:07d}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(messages)))
+    return time.perf_counter() - start
+
+
+async def pooled(api_url: str, messages: int, concurrency: int) -> float:
+    client = TwilioSMSClient(ACCOUNT_SID, "token", "+15550000000", api_url=api_url, max_connections=concurrency)
+    start = time.perf_counter()
+    results = await client.send_many([(f"+1555{i:07d}", "New release") for i in range(messages)], concurrency)
+    elapsed = time.perf_counter() - start
+    await client.close()
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        raise errors[0]
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    fake_twilio.LATENCY = args.latency
+    api_url = fake_twilio.serve_in_thread()
+
+    for name, run in (("blocking client per message", blocking_per_message), ("pooled async client", pooled)):
+        async with LoopLagMonitor() as monitor:
+            elapsed = await run(api_url, args.messages, args.concurrency)
+        print(f"{name}: {args.messages / elapsed:,.0f} msg/s, longest event loop stall {monitor.max_lag * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
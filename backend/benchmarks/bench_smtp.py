@@ -0,0 +1,75 @@
+"""
+Benchmark email delivery against a local aiosmtpd server: one connection per
+message (aiosmtplib.send) vs the pooled SMTPPool sessions.
+
+    python -m benchmarks.bench_smtp --messages 2000 --pool-size 4
+"""
+import argparse
+import asyncio
+import socket
+import time
+from email.message import EmailMessage
+
+import aiosmtplib
+from aiosmtpd.controller import Controller
+
+from app.services.email_sender import SMTPPool
+
+
+class NullHandler:
+    async def handle_DATA(self, server, session, envelope):
+        return "250 OK"
+
+
+def make_message(i: int) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = "bot@example.com"
+    message["To"] = f"user{i}@example.com"
+    message["Subject"] = "New release"
+    message.set_content("Body")
+    return message
+
+
+async def per_message(port: int, messages: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(i):
+        async with semaphore:
+            await aiosmtplib.send(make_message(i), hostname="127.0.0.1", port=port, start_tls=False)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(messages)))
+    return time.perf_counter() - start
+
+
+async def pooled(port: int, messages: int, pool_size: int) -> float:
+    pool = SMTPPool("127.0.0.1", port, start_tls=False, size=pool_size, max_messages_per_connection=1000)
+    start = time.perf_counter()
+    await asyncio.gather(*(pool.send(make_message(i)) for i in range(messages)))
+    elapsed = time.perf_counter() - start
+    await pool.close()
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    controller = Controller(NullHandler(), hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        elapsed = await per_message(port, args.messages, args.pool_size)
+        print(f"connection per message: {args.messages / elapsed:,.0f} msg/s")
+        elapsed = await pooled(port, args.messages, args.pool_size)
+        print(f"pooled ({args.pool_size} sessions):  {args.messages / elapsed:,.0f} msg/s")
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
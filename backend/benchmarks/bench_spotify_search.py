@@ -0,0 +1,67 @@
+"""
+Benchmark search_artists latency against a local fake Spotify API: a new
+httpx.AsyncClient per request vs SpotifyClient's shared pooled client.
+
+    python -m benchmarks.bench_spotify_search --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from app.core.spotify_client import SpotifyClient
+from app.core.spotify_scheduler import SpotifyRequestScheduler
+from benchmarks.fake_spotify import serve_in_thread
+
+
+def percentiles(latencies):
+    cuts = statistics.quantiles(latencies, n=100)
+    return cuts[49] * 1000, cuts[98] * 1000
+
+
+async def load(call, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await call(f"artist{i % 100}")
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return percentiles(latencies)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    base_url = serve_in_thread()
+
+    async def client_per_request(keyword):
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{base_url}/v1/search", params={"q": keyword, "type": "artist", "limit": 50})
+            response.raise_for_status()
+            return response.json()
+
+    p50, p99 = await load(client_per_request, args.requests, args.concurrency)
+    print(f"client per request: p50={p50:.1f}ms p99={p99:.1f}ms")
+
+    spotify = SpotifyClient()
+    spotify.token_url = f"{base_url}/api/token"
+    spotify.api_url = f"{base_url}/v1"
+    spotify.scheduler = SpotifyRequestScheduler(rate_per_second=0)  # measure transport, not the rate budget
+    await spotify.start()
+    await spotify.authenticate()
+    p50, p99 = await load(spotify.search_artists, args.requests, args.concurrency)
+    await spotify.close()
+    print(f"shared pooled client: p50={p50:.1f}ms p99={p99:.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
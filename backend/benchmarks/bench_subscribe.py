@@ -0,0 +1,103 @@
+"""
+Load-test POST /subscribe with concurrent clients: the previous handler, which
+called blocking MongoEngine on the event loop, vs the repository backends.
+
+Needs a running MongoDB; the beanie backend also needs the beanie package:
+    python -m benchmarks.bench_subscribe --requests 5000 --concurrency 100
+"""
+import argparse
+import asyncio
+import time
+from unittest.mock import AsyncMock
+
+import httpx
+from fastapi import FastAPI
+from mongoengine import connect
+
+from app.api.v1.routes import subscribe
+from app.models.mongoengine_models import ArtistSubscription, User
+from app.repositories.mongoengine_repositories import MongoEngineNotificationRepository, MongoEngineUserRepository
+from app.repositories.registry import set_repositories
+from app.schema.user import UserIn
+
+
+def blocking_app() -> FastAPI:
+    """The handler as it was: find and save on the event loop thread"""
+    app = FastAPI()
+
+    @app.post("/api/v1/subscribe")
+    async def subscribe_blocking(user: UserIn):
+        artists = [ArtistSubscription(id=a.id, name=a.name or "", url=a.url) for a in user.subscribed_artists or []]
+        existing = User.objects(email=user.email).first()
+        if existing:
+            existing.subscribed_artists = artists
+            existing.notification_methods = user.notification_methods or []
+            existing.save()
+        else:
+            User(email=user.email, subscribed_artists=artists, notification_methods=user.notification_methods or []).save()
+        return {"message": "ok"}
+
+    return app
+
+
+def repository_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(subscribe.router, prefix="/api/v1")
+    return app
+
+
+async def load(app: FastAPI, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i):
+            async with semaphore:
+                response = await client.post("/api/v1/subscribe", json={
+                    "email": f"user{i % 1000}@example.com",
+                    "subscribed_artists": [{"id": f"artist{i % 50}", "name": "Artist", "url": None}],
+                    "notification_methods": ["email"],
+                })
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        return requests / (time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/music_notifier_bench")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    connect(host=args.mongo_uri)
+    User.drop_collection()
+    subscribe.artist_catalog.add_many = AsyncMock()  # measure the user writes only
+
+    throughput = await load(blocking_app(), args.requests, args.concurrency)
+    print(f"blocking handler: {throughput:,.0f} req/s")
+
+    set_repositories(MongoEngineUserRepository(), MongoEngineNotificationRepository())
+    throughput = await load(repository_app(), args.requests, args.concurrency)
+    print(f"mongoengine repository (worker threads): {throughput:,.0f} req/s")
+
+    try:
+        from app.repositories.beanie_repositories import (
+            BeanieNotificationRepository,
+            BeanieUserRepository,
+            connect_beanie,
+        )
+    except ImportError:
+        print("beanie repository: skipped, beanie is not installed")
+        return
+    client = await connect_beanie(args.mongo_uri, args.mongo_uri.rsplit("/", 1)[1])
+    set_repositories(BeanieUserRepository(), BeanieNotificationRepository())
+    throughput = await load(repository_app(), args.requests, args.concurrency)
+    print(f"beanie repository: {throughput:,.0f} req/s")
+    await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+"""
+Benchmark Telegram delivery against a local fake Bot API: a new Bot (getMe
+plus a fresh connection pool) per message, as send_telegram_message used to
+do, vs the long-lived TelegramSender.
+
+    python -m benchmarks.bench_telegram --messages 1000 --concurrency 30 --latency 0.05
+"""
+import argparse
+import asyncio
+import time
+
+from telegram import Bot
+
+from app.services.telegram_sender import TelegramSender
+from benchmarks import fake_telegram
+
+TOKEN = "123:bench"
+
+
+async def bot_per_message(base_url: str, messages: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(i):
+        async with semaphore:
+            async with Bot(token=TOKEN, base_url=base_url) as bot:
+                await bot.send_message(chat_id=i, text="New release")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(messages)))
+    return time.perf_counter() - start
+
+
+async def long_lived(base_url: str, messages: int, concurrency: int) -> float:
+    # Flood limits off: every message goes to a different chat and we measure raw throughput
+    sender = TelegramSender(TOKEN, base_url=base_url, rate_per_second=0, pool_size=concurrency)
+    await sender.start()
+    start = time.perf_counter()
+    results = await sender.send_many([(str(i), "New release") for i in range(messages)], concurrency=concurrency)
+    elapsed = time.perf_counter() - start
+    await sender.close()
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        raise errors[0]
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    fake_telegram.LATENCY = args.latency
+    base_url = fake_telegram.serve_in_thread()
+
+    per_message = await bot_per_message(base_url, args.messages, args.concurrency)
+    print(f"Bot per message: {args.messages / per_message:,.0f} msg/s")
+    pooled = await long_lived(base_url, args.messages, args.concurrency)
+    print(f"long-lived sender: {args.messages / pooled:,.0f} msg/s, {per_message / pooled:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+"""
+Benchmark streaming the users collection for the notifier job.
+
+Needs a running MongoDB. Seed once, then run each mode in its own process so
+the reported peak RSS belongs to that mode alone:
+    python -m benchmarks.bench_user_cursor --seed 1000000
+    python -m benchmarks.bench_user_cursor --mode list
+    python -m benchmarks.bench_user_cursor --mode stream --batch-size 1000
+"""
+import argparse
+import random
+import resource
+import time
+
+from mongoengine import connect
+
+from app.db.user_cursor import iter_user_batches
+from app.models.mongoengine_models import User
+
+
+def seed(count: int, artists: int = 200_000, per_user: int = 10, chunk: int = 10_000):
+    rng = random.Random(1)
+    collection = User._get_collection()
+    collection.drop()
+    for start in range(0, count, chunk):
+        collection.insert_many([
+            {
+                "email": f"user{i}@example.com",
+                "subscribed_artists": [
+                    {"id": f"artist{a}", "name": f"Artist {a}", "url": None}
+                    for a in rng.sample(range(artists), per_user)
+                ],
+                "notification_methods": ["email", "telegram"],
+                "telegram_chat_id": str(i),
+            }
+            for i in range(start, min(start + chunk, count))
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/music_notifier_bench")
+    parser.add_argument("--seed", type=int, help="insert this many synthetic users and exit")
+    parser.add_argument("--mode", choices=["list", "stream"], default="stream")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    connect(host=args.mongo_uri)
+    if args.seed:
+        seed(args.seed)
+        print(f"Seeded {args.seed} users")
+        return
+
+    start = time.perf_counter()
+    if args.mode == "list":
+        count = len(list(User.objects.all()))
+    else:
+        count = sum(len(batch) for batch in iter_user_batches(args.batch_size))
+    elapsed = time.perf_counter() - start
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{args.mode}: {count} users in {elapsed:.2f}s ({count / elapsed:,.0f} users/s), peak RSS {peak_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
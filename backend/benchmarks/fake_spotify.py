@@ -0,0 +1,59 @@
+"""
+Minimal local stand-in for the Spotify Web API used by the benchmarks
+"""
+import socket
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI
+
+app = FastAPI()
+
+# Size of the synthetic browse/new-releases listing; album i is by artist{i}
+NEW_RELEASE_COUNT = 100
+
+
+@app.post("/api/token")
+async def token():
+    return {"access_token": "bench-token", "token_type": "Bearer", "expires_in": 3600}
+
+
+@app.get("/v1/search")
+async def search(q: str, limit: int = 50):
+    return {"artists": {"items": [
+        {"id": f"{q}-{i}", "name": f"{q} {i}", "popularity": 100 - i, "images": []}
+        for i in range(limit)
+    ]}}
+
+
+@app.get("/v1/browse/new-releases")
+async def new_releases(country: str = "US", limit: int = 20, offset: int = 0):
+    end = min(offset + limit, NEW_RELEASE_COUNT)
+    return {"albums": {
+        "items": [
+            {
+                "id": f"album{i}",
+                "name": f"Album {i}",
+                "release_date": "2024-05-01",
+                "album_type": "album",
+                "artists": [{"id": f"artist{i}", "name": f"Artist {i}"}],
+                "external_urls": {"spotify": f"https://open.spotify.com/album/album{i}"},
+            }
+            for i in range(offset, end)
+        ],
+        "total": NEW_RELEASE_COUNT,
+        "next": "more" if end < NEW_RELEASE_COUNT else None,
+    }}
+
+
+def serve_in_thread() -> str:
+    """Start the fake API on a free local port and return its base URL"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
@@ -0,0 +1,46 @@
+"""
+Minimal local stand-in for the Telegram Bot API used by the benchmarks
+"""
+import asyncio
+import itertools
+import socket
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI
+
+app = FastAPI()
+
+# Simulated Bot API latency per call, in seconds
+LATENCY = 0.05
+
+_message_ids = itertools.count(1)
+
+
+@app.post("/bot{token}/getMe")
+async def get_me(token: str):
+    await asyncio.sleep(LATENCY)
+    return {"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}}
+
+
+@app.post("/bot{token}/sendMessage")
+async def send_message(token: str):
+    await asyncio.sleep(LATENCY)
+    return {"ok": True, "result": {
+        "message_id": next(_message_ids),
+        "date": int(time.time()),
+        "chat": {"id": 1, "type": "private"},
+    }}
+
+
+def serve_in_thread() -> str:
+    """Start the fake API on a free local port and return its bot base URL"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/bot"
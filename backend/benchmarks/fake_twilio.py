@@ -0,0 +1,37 @@
+"""
+Minimal local stand-in for Twilio's Messages API used by the benchmarks
+"""
+import asyncio
+import itertools
+import socket
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+app = FastAPI()
+
+# Simulated provider latency per message, in seconds
+LATENCY = 0.05
+
+_sids = itertools.count(1)
+
+
+@app.post("/2010-04-01/Accounts/{account_sid}/Messages.json")
+async def create_message(account_sid: str):
+    await asyncio.sleep(LATENCY)
+    return JSONResponse({"sid": f"SM{next(_sids)}", "status": "queued"}, status_code=201)
+
+
+def serve_in_thread() -> str:
+    """Start the fake API on a free local port and return its base URL"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
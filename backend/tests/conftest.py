@@ -0,0 +1,60 @@
+import mongomock
+import pytest
+from unittest.mock import AsyncMock
+from mongoengine import connect, disconnect
+from mongoengine.connection import get_db
+from app.db.indexes import ensure_indexes
+from app.repositories.memory_repositories import InMemoryNotificationRepository, InMemoryUserRepository
+from app.repositories.registry import set_repositories
+from app.services import notifier
+
+
+@pytest.fixture
+def mongo():
+    """MongoEngine default connection backed by an in-memory mongomock client"""
+    connection = connect(
+        "music_notifier_test",
+        host="mongodb://localhost",
+        mongo_client_class=mongomock.MongoClient,
+    )
+    ensure_indexes(get_db())
+    yield connection
+    disconnect()
+
+
+ALBUM = {
+    "id": "x",
+    "name": "Dawn FM",
+    "release_date": "2022-01-07",
+    "artists": [{"id": "a1", "name": "The Weeknd"}],
+    "external_urls": {"spotify": "https://open.spotify.com/album/x"},
+}
+
+
+@pytest.fixture
+def senders(monkeypatch):
+    """Mocked delivery channels and a Spotify client that returns ALBUM as the only new release"""
+    mocks = {
+        "email": AsyncMock(),
+        "telegram": AsyncMock(),
+        "sms": AsyncMock(),
+    }
+    monkeypatch.setattr(notifier, "send_email", mocks["email"])
+    monkeypatch.setattr(notifier, "send_telegram_message", mocks["telegram"])
+    monkeypatch.setattr(notifier, "send_sms", mocks["sms"])
+    monkeypatch.setattr(
+        notifier.spotify_client,
+        "get_new_releases",
+        AsyncMock(return_value={"albums": {"items": [ALBUM]}}),
+    )
+    monkeypatch.setattr(notifier.spotify_client, "get_artist_albums", AsyncMock(return_value=[]))
+    return mocks
+
+
+@pytest.fixture
+def memory_repositories():
+    """In-memory user and notification repositories installed process-wide"""
+    users, notifications = InMemoryUserRepository(), InMemoryNotificationRepository()
+    set_repositories(users, notifications)
+    yield users, notifications
+    set_repositories(None, None)
@@ -0,0 +1,79 @@
+import httpx
+import json
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta
+from fastapi import FastAPI
+from app.api.v1.routes import admin
+
+
+@pytest.fixture
+def client(memory_repositories):
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/v1/admin")
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest_asyncio.fixture
+async def ledger(memory_repositories):
+    _, notifications = memory_repositories
+    start = datetime(2024, 1, 1)
+    await notifications.insert_many([
+        {
+            "email": f"user{i % 3}@example.com",
+            "album_id": f"album{i}",
+            "album_name": "Dawn FM",
+            "album_artists_ids": ["a1"],
+            "method": "telegram" if i % 2 else "email",
+            "sent_at": start + timedelta(minutes=i),
+            "spotify_url": "https://open.spotify.com/album/x",
+            "telegram_chat_id": None,
+            "phone_number": None,
+            "matched_artist_ids": ["a1"],
+        }
+        for i in range(25)
+    ])
+
+
+@pytest.mark.asyncio
+async def test_pages_through_the_ledger_with_a_cursor(client, ledger):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 10, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/api/v1/admin/notifications", params=params)
+        assert response.status_code == 200
+        seen += [row["album_id"] for row in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert seen == [f"album{i}" for i in reversed(range(25))]
+    assert "_id" not in response.json()[0]
+
+
+@pytest.mark.asyncio
+async def test_filters(client, ledger):
+    response = await client.get("/api/v1/admin/notifications", params={
+        "email": "user0@example.com",
+        "method": "telegram",
+        "since": "2024-01-01T00:05:00Z",
+        "until": "2024-01-01T00:21:00Z",
+    })
+
+    assert [row["album_id"] for row in response.json()] == ["album15", "album9"]
+    assert response.json()[0]["sent_at"] == "2024-01-01T00:15:00"
+
+
+@pytest.mark.asyncio
+async def test_ndjson_export_streams_every_match(client, ledger):
+    response = await client.get("/api/v1/admin/notifications", params={"format": "ndjson", "method": "email", "limit": 1})
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["album_id"] for row in rows] == [f"album{i}" for i in reversed(range(0, 25, 2))]
+
+
+@pytest.mark.asyncio
+async def test_rejects_a_malformed_cursor(client, ledger):
+    response = await client.get("/api/v1/admin/notifications", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
@@ -0,0 +1,97 @@
+import time
+import pytest
+from datetime import datetime, timedelta
+from app.models.mongoengine_models import Artist
+from app.services import artist_catalog as catalog_module
+from app.services.artist_catalog import ArtistCatalog
+
+
+def test_search_matches_word_prefixes_ranked_by_popularity():
+    catalog = ArtistCatalog()
+    catalog.load_artists([
+        {"id": "a1", "name": "The Weeknd", "popularity": 95},
+        {"id": "a2", "name": "Weezer", "popularity": 70},
+        {"id": "a3", "name": "Beyoncé", "popularity": 90},
+        {"id": "a4", "name": "Adele", "popularity": 88},
+    ])
+
+    assert [a["id"] for a in catalog.search("wee")] == ["a1", "a2"]
+    assert [a["id"] for a in catalog.search("The W")] == ["a1"]
+    assert [a["id"] for a in catalog.search("beyonce")] == ["a3"]
+    assert [a["id"] for a in catalog.search("wee", limit=1)] == ["a1"]
+    assert catalog.search("zz") == []
+
+
+@pytest.mark.asyncio
+async def test_add_many_reindexes_and_persists(mongo):
+    catalog = ArtistCatalog()
+    await catalog.add_many([{"id": "a1", "name": "Weeknd", "popularity": 95, "image_url": "img"}])
+    assert [a["id"] for a in catalog.search("week")] == ["a1"]
+
+    # subscriptions only know the name; popularity and image are kept
+    await catalog.add_many([{"id": "a1", "name": "The Weeknd"}])
+    assert catalog.search("the")[0]["popularity"] == 95
+
+    reloaded = ArtistCatalog()
+    await reloaded.load()
+    assert reloaded.search("the weeknd") == [
+        {"id": "a1", "name": "The Weeknd", "popularity": 95, "image_url": "img"}
+    ]
+    assert Artist.objects.count() == 1
+
+
+@pytest.mark.asyncio
+async def test_renames_in_a_batch_replace_their_old_keys(mongo):
+    catalog = ArtistCatalog()
+    catalog.load_artists([{"id": "a1", "name": "Weeknd", "popularity": 95}])
+
+    await catalog.add_many([
+        {"id": "a1", "name": "The Weeknd"},
+        {"id": "a2", "name": "Weezer", "popularity": 70},
+        {"id": "a2", "name": "Weezer", "popularity": 70},
+    ])
+
+    assert [a["id"] for a in catalog.search("wee")] == ["a1", "a2"]
+    assert [a["id"] for a in catalog.search("the")] == ["a1"]
+    assert len(catalog._index) == 3  # "the weeknd", "weeknd", "weezer"
+
+
+@pytest.mark.asyncio
+async def test_artists_go_stale_after_the_refresh_period_even_across_restarts(mongo):
+    now = [datetime(2024, 1, 1)]
+    catalog = ArtistCatalog(refresh_seconds=60, clock=lambda: now[0])
+    catalog.load_artists([{"id": "a0", "name": "Radiohead", "popularity": 80}])
+    assert not catalog.is_fresh(catalog.search("ra"))
+
+    # What a Spotify search for "ra" returned also answers "rad" and "radio"
+    await catalog.add_many([{"id": "a0", "name": "Radiohead"}, {"id": "a1", "name": "Radio Moscow", "popularity": 40}])
+    assert catalog.is_fresh(catalog.search("radio"))
+
+    reloaded = ArtistCatalog(refresh_seconds=60, clock=lambda: now[0])
+    await reloaded.load()
+    assert [a["id"] for a in reloaded.search("rad")] == ["a0", "a1"]
+    assert reloaded.is_fresh(reloaded.search("rad"))
+    now[0] += timedelta(seconds=61)
+    assert not reloaded.is_fresh(reloaded.search("rad"))
+
+
+@pytest.mark.asyncio
+async def test_small_batches_update_a_large_index_in_place(monkeypatch):
+    catalog = ArtistCatalog()
+    catalog.load_artists({"id": f"a{i}", "name": f"Artist{i} Band", "popularity": 1} for i in range(200_000))
+    monkeypatch.setattr(catalog, "_persist", lambda artists: None)
+    index = catalog._index
+
+    start = time.perf_counter()
+    await catalog.add_many({"id": f"new{i}", "name": f"Newcomer{i}", "popularity": 50} for i in range(50))
+    assert time.perf_counter() - start < 0.25  # a full re-merge of 400k keys takes longer
+    assert catalog._index is index
+    assert [a["id"] for a in catalog.search("newcomer7", limit=3)] == ["new7"]
+
+    # A batch too big to insert key by key is merged off the event loop
+    monkeypatch.setattr(catalog_module, "MAX_IN_PLACE_KEYS", 10)
+    await catalog.add_many([{"id": "a1", "name": "Renamed"}, *({"id": f"x{i}", "name": f"Extra{i}"} for i in range(20))])
+    assert catalog._index is not index
+    assert [a["id"] for a in catalog.search("renamed")] == ["a1"]
+    assert catalog.search("artist1 band") == []
+    assert len(catalog._index) == 400_000 + 50 + 20 - 1
@@ -0,0 +1,99 @@
+import pytest
+from unittest.mock import AsyncMock
+from app.core.spotify_scheduler import RateLimitedError
+from app.models.mongoengine_models import ArtistWatermark
+from app.services.artist_poller import ArtistPoller
+
+
+def album(album_id, release_date, *artist_ids):
+    return {"id": album_id, "release_date": release_date, "artists": [{"id": a} for a in artist_ids]}
+
+
+async def poll(poller, artist_ids):
+    """Consume a poll the way ingestion does: take every album, then commit"""
+    albums = [a async for a in poller.poll(artist_ids)]
+    await poller.commit()
+    return albums
+
+
+class FakeSpotify:
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.get_albums = AsyncMock(side_effect=self._albums)
+
+    async def get_artist_albums(self, artist_id, since=None):
+        return self.catalog.get(artist_id, [])
+
+    async def _albums(self, ids):
+        everything = {a["id"]: a for albums in self.catalog.values() for a in albums}
+        return [everything[i] for i in ids]
+
+
+@pytest.mark.asyncio
+async def test_first_poll_only_sets_watermarks_then_new_albums_are_yielded(mongo):
+    spotify = FakeSpotify({
+        "a1": [album("old", "2023-01-01", "a1")],
+        "a2": [album("older", "2022-05-01", "a2")],
+    })
+    poller = ArtistPoller(spotify)
+
+    assert await poll(poller, ["a1", "a2"]) == []
+    assert ArtistWatermark.objects.count() == 2
+
+    collab = album("collab", "2024-02-02", "a1", "a2")
+    spotify.catalog["a1"] = [collab, album("same-day", "2023-01-01", "a1"), album("old", "2023-01-01", "a1")]
+    spotify.catalog["a2"] = [collab, album("older", "2022-05-01", "a2")]
+
+    new = [a["id"] for a in await poll(poller, ["a1", "a2"])]
+
+    assert sorted(new) == ["collab", "same-day"]
+    spotify.get_albums.assert_awaited_once()
+    assert ArtistWatermark.objects.get(artist_id="a1").last_release_date == "2024-02-02"
+
+    assert await poll(poller, ["a1", "a2"]) == []
+
+
+@pytest.mark.asyncio
+async def test_failed_hydration_keeps_the_watermark_for_the_next_poll(mongo):
+    spotify = FakeSpotify({"a1": [album("old", "2023-01-01", "a1")], "a2": []})
+    poller = ArtistPoller(spotify)
+    assert await poll(poller, ["a1", "a2"]) == []
+
+    spotify.catalog["a1"] = [album("new", "2024-02-02", "a1"), album("old", "2023-01-01", "a1")]
+    spotify.catalog["a2"] = [album("other", "2024-03-03", "a2")]
+    spotify.get_albums.side_effect = [ConnectionError("spotify down")]
+
+    assert await poll(poller, ["a1", "a2"]) == []
+    assert ArtistWatermark.objects.get(artist_id="a1").last_release_date == "2023-01-01"
+
+    spotify.get_albums.side_effect = spotify._albums
+    assert sorted([a["id"] for a in await poll(poller, ["a1", "a2"])]) == ["new", "other"]
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_artist_keeps_its_watermark(mongo):
+    spotify = FakeSpotify({"a1": [album("old", "2023-01-01", "a1")]})
+    poller = ArtistPoller(spotify)
+    assert await poll(poller, ["a1"]) == []
+
+    spotify.catalog["a1"] = [album("new", "2024-02-02", "a1"), album("old", "2023-01-01", "a1")]
+    spotify.get_artist_albums = AsyncMock(side_effect=RateLimitedError("429"))
+
+    assert await poll(poller, ["a1"]) == []
+    assert ArtistWatermark.objects.get(artist_id="a1").last_release_date == "2023-01-01"
+
+
+@pytest.mark.asyncio
+async def test_watermarks_wait_for_the_consumer_to_commit(mongo):
+    spotify = FakeSpotify({"a1": [album("old", "2023-01-01", "a1")]})
+    poller = ArtistPoller(spotify)
+    await poll(poller, ["a1"])
+
+    spotify.catalog["a1"] = [album("new", "2024-02-02", "a1"), album("old", "2023-01-01", "a1")]
+    # The consumer fails before storing what it was given
+    assert [a["id"] async for a in poller.poll(["a1"])] == ["new"]
+    assert ArtistWatermark.objects.get(artist_id="a1").last_release_date == "2023-01-01"
+
+    retry = ArtistPoller(spotify)
+    assert [a["id"] for a in await poll(retry, ["a1"])] == ["new"]
+    assert ArtistWatermark.objects.get(artist_id="a1").last_release_date == "2024-02-02"
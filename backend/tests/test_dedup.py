@@ -0,0 +1,31 @@
+from app.models.mongoengine_models import Notification
+from app.services.dedup import fetch_sent_keys
+
+
+def save(email, album_id, method):
+    Notification(
+        email=email,
+        album_id=album_id,
+        album_name="Album",
+        method=method,
+        spotify_url=f"https://open.spotify.com/album/{album_id}",
+    ).save()
+
+
+def test_fetch_sent_keys_returns_existing_triples_for_batch(mongo):
+    save("alice@example.com", "x", "email")
+    save("alice@example.com", "x", "telegram")
+    save("bob@example.com", "y", "sms")
+    save("carol@example.com", "x", "email")
+
+    keys = fetch_sent_keys(["alice@example.com", "bob@example.com"], ["x", "y"])
+
+    assert keys == {
+        ("alice@example.com", "x", "email"),
+        ("alice@example.com", "x", "telegram"),
+        ("bob@example.com", "y", "sms"),
+    }
+
+
+def test_fetch_sent_keys_skips_query_for_empty_batch(mongo):
+    assert fetch_sent_keys([], ["x"]) == set()
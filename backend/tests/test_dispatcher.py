@@ -0,0 +1,70 @@
+import asyncio
+import time
+import pytest
+from app.services.dispatcher import ChannelLimits, Dispatcher, OutgoingMessage
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_caps_concurrency_per_channel():
+    in_flight = {"email": 0, "sms": 0}
+    peak = {"email": 0, "sms": 0}
+
+    def sender(channel):
+        async def send(message):
+            in_flight[channel] += 1
+            peak[channel] = max(peak[channel], in_flight[channel])
+            await asyncio.sleep(0.01)
+            in_flight[channel] -= 1
+        return send
+
+    dispatcher = Dispatcher(
+        {"email": sender("email"), "sms": sender("sms")},
+        {"email": ChannelLimits(concurrency=4), "sms": ChannelLimits(concurrency=1)},
+    )
+    async with dispatcher:
+        for i in range(12):
+            await dispatcher.submit(OutgoingMessage("email", f"user{i}@example.com", "hi"))
+            await dispatcher.submit(OutgoingMessage("sms", f"+{i}", "hi"))
+
+    assert peak == {"email": 4, "sms": 1}
+    assert dispatcher.stats()["email"].sent == 12
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_applies_rate_limit():
+    async def send(message):
+        pass
+
+    dispatcher = Dispatcher({"telegram": send}, {"telegram": ChannelLimits(concurrency=10, rate_per_second=50)})
+    start = time.monotonic()
+    async with dispatcher:
+        for i in range(60):
+            await dispatcher.submit(OutgoingMessage("telegram", str(i), "hi"))
+
+    # 50 burst tokens, then 10 more at 50/s
+    assert time.monotonic() - start >= 0.18
+
+
+@pytest.mark.asyncio
+async def test_failed_send_runs_on_failed_and_keeps_going():
+    recorded, errors = [], []
+
+    async def send(message):
+        if message.recipient == "bad@example.com":
+            raise ConnectionError("smtp down")
+
+    async def on_sent():
+        recorded.append(True)
+
+    async def on_failed(error):
+        errors.append(error)
+
+    dispatcher = Dispatcher({"email": send}, {"email": ChannelLimits(concurrency=1)})
+    async with dispatcher:
+        for recipient in ("bad@example.com", "good@example.com"):
+            await dispatcher.submit(OutgoingMessage("email", recipient, "hi", on_sent=on_sent, on_failed=on_failed))
+
+    assert recorded == [True]
+    assert [str(error) for error in errors] == ["smtp down"]
+    assert dispatcher.stats()["email"].failed == 1
+    assert dispatcher.stats()["email"].sent == 1
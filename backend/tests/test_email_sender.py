@@ -1,8 +1,56 @@
-from unittest.mock import patch
-from app.services.email_sender import send_email
+import socket
+from email.message import EmailMessage
+import pytest
+from unittest.mock import AsyncMock, patch
+from aiosmtpd.controller import Controller
+from app.services.email_sender import SMTPPool, send_email
 
-@patch("app.services.email_sender.aiohttp.ClientSession.post")
-async def test_send_email(mock_post):
-    mock_post.return_value.__aenter__.return_value.status = 200
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp_server():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    yield handler, port
+    controller.stop()
+
+
+@pytest.mark.asyncio
+@patch("app.services.email_sender.get_smtp_pool")
+async def test_send_email(mock_get_pool):
+    mock_get_pool.return_value.send = AsyncMock()
     await send_email("test@example.com", "Subject", "Body")
-    mock_post.assert_called()
\ No newline at end of file
+    message = mock_get_pool.return_value.send.await_args.args[0]
+    assert message["To"] == "test@example.com"
+    assert message["Subject"] == "Subject"
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_and_recycles_sessions(smtp_server):
+    handler, port = smtp_server
+    pool = SMTPPool("127.0.0.1", port, start_tls=False, size=2, max_messages_per_connection=2)
+
+    for i in range(5):
+        message = EmailMessage()
+        message["From"] = "bot@example.com"
+        message["To"] = f"user{i}@example.com"
+        message["Subject"] = "New release"
+        message.set_content("Body")
+        await pool.send(message)
+    await pool.close()
+
+    assert len(handler.messages) == 5
+    # two sessions alternate, each recycled after two messages
+    assert pool.connections_opened == 3
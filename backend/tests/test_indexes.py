@@ -0,0 +1,156 @@
+import os
+import pytest
+from datetime import datetime
+from bson import ObjectId
+from mongoengine.connection import get_db
+from pymongo import MongoClient
+from app.db.indexes import INDEXES, ensure_indexes
+from app.repositories.base import NOTIFICATION_SORT, NotificationFilter, notification_filter
+from app.services.outbox import CLAIM_SORT, claim_filter
+from app.utils.sharding import Shard, shard_key_for
+
+MONGO_TEST_URI = os.environ.get("MONGO_TEST_URI")
+
+
+def test_creates_wanted_indexes_and_drops_redundant_ones(mongo):
+    database = get_db()
+    database.users.create_index("created_at")
+    database.notifications.create_index("album_id")
+    database.notifications.create_index("sent_at")
+    database.notifications.drop_index("email_1_album_id_1_method_1")
+    database.notifications.create_index([("email", 1), ("album_id", 1), ("method", 1)])  # not unique
+
+    dropped = ensure_indexes(database)
+
+    assert dropped == {
+        "users": ["created_at_1"],
+        "notifications": ["email_1_album_id_1_method_1", "album_id_1", "sent_at_1"],
+    }
+    for collection, wanted in INDEXES.items():
+        assert set(database[collection].index_information()) == {"_id_"} | {i.document["name"] for i in wanted}
+    assert database.notifications.index_information()["email_1_album_id_1_method_1"]["unique"]
+    assert ensure_indexes(database) == {}
+
+
+def test_keeps_unknown_indexes_and_rebuilds_changed_options(mongo, monkeypatch):
+    database = get_db()
+    database.users.create_index("phone_number", name="phone_number_1")  # added by hand
+    ttl = next(index for index in INDEXES["outbox"] if index.document["name"] == "sent_at_1")
+    monkeypatch.setitem(ttl.document, "expireAfterSeconds", 60)
+
+    assert ensure_indexes(database) == {"outbox": ["sent_at_1"]}
+    assert "phone_number_1" in database.users.index_information()
+    assert database.outbox.index_information()["sent_at_1"]["expireAfterSeconds"] == 60
+
+
+def test_unique_index_is_not_rebuilt_over_duplicates(mongo):
+    database = get_db()
+    database.notifications.drop_index("email_1_album_id_1_method_1")
+    database.notifications.create_index([("email", 1), ("album_id", 1), ("method", 1)])  # not unique
+    database.notifications.insert_many([{"email": "a@example.com", "album_id": "x", "method": "email"} for _ in range(2)])
+
+    assert ensure_indexes(database) == {}
+    assert not database.notifications.index_information()["email_1_album_id_1_method_1"].get("unique")
+
+
+# Every hot query: (collection, equality fields, then sorted or range fields with
+# their direction, None for a range). Checked against INDEXES on every run, and
+# against explain() with MONGO_TEST_URI
+HOT_QUERY_SHAPES = {
+    "user by email": ("users", ["email"], []),
+    "subscribers of artists": ("users", ["subscribed_artists.id"], []),
+    "subscribers in a shard": ("users", ["subscribed_artists.id"], []),
+    "users in a shard": ("users", [], [("shard_key", None)]),
+    "dedup lookup": ("notifications", ["email", "album_id"], []),
+    "admin list": ("notifications", [], [("sent_at", -1), ("_id", -1)]),
+    "admin list by email": ("notifications", ["email"], [("sent_at", -1), ("_id", -1)]),
+    "admin list by album and method": ("notifications", ["album_id"], [("sent_at", -1), ("_id", -1)]),
+    "outbox claim": ("outbox", ["channel", "state"], [("next_attempt_at", 1)]),
+    "outbox dedup": ("outbox", ["keys"], []),
+}
+
+
+def serves(index_keys: list, equality: list, order: list) -> bool:
+    """Whether an index with these keys serves the query shape without a scan or in-memory sort"""
+    if not equality and not order:
+        return False
+    if {field for field, _ in index_keys[:len(equality)]} != set(equality):
+        return False
+    rest = index_keys[len(equality):len(equality) + len(order)]
+    if [field for field, _ in rest] != [field for field, _ in order]:
+        return False
+    # Sorts can walk an index backwards, as long as every direction flips together
+    sorted_pairs = [(direction, wanted) for (_, direction), (_, wanted) in zip(rest, order) if wanted is not None]
+    return len({direction == wanted for direction, wanted in sorted_pairs}) <= 1
+
+
+@pytest.mark.parametrize("name", HOT_QUERY_SHAPES)
+def test_every_hot_query_has_an_index(name):
+    collection, equality, order = HOT_QUERY_SHAPES[name]
+    indexes = [list(index.document["key"].items()) for index in INDEXES[collection]]
+
+    assert any(serves(keys, equality, order) for keys in indexes), f"no index serves {name}"
+
+
+def plan_stages(plan) -> set:
+    """Every stage name anywhere in an explain() plan"""
+    if isinstance(plan, list):
+        return set().union(*map(plan_stages, plan)) if plan else set()
+    if not isinstance(plan, dict):
+        return set()
+    stages = {plan["stage"]} if "stage" in plan else set()
+    return stages.union(*(plan_stages(value) for value in plan.values()))
+
+
+@pytest.mark.skipif(not MONGO_TEST_URI, reason="set MONGO_TEST_URI to run explain() against a real MongoDB")
+def test_hot_queries_use_indexes():
+    client = MongoClient(MONGO_TEST_URI)
+    database = client["music_notifier_index_test"]
+    try:
+        database.users.insert_many([
+            {
+                "email": f"user{i}@example.com",
+                "subscribed_artists": [{"id": f"artist{i % 50}"}, {"id": f"artist{i % 7}"}],
+                "shard_key": shard_key_for(f"user{i}@example.com"),
+            }
+            for i in range(500)
+        ])
+        database.notifications.insert_many([
+            {"email": f"user{i}@example.com", "album_id": f"album{i % 20}", "method": "email", "sent_at": i}
+            for i in range(500)
+        ])
+        ensure_indexes(database)
+        low, high = Shard(1, 4).bounds()
+
+        cursors = {
+            "user by email": database.users.find({"email": "user1@example.com"}),
+            "subscribers of artists": database.users.find({"subscribed_artists.id": {"$in": ["artist1", "artist2"]}}),
+            "subscribers in a shard": database.users.find(
+                {"subscribed_artists.id": {"$in": ["artist1"]}, "shard_key": {"$gte": low, "$lt": high}}
+            ),
+            "users in a shard": database.users.find({"shard_key": {"$gte": low, "$lt": high}}),
+            "dedup lookup": database.notifications.find(
+                {"email": {"$in": ["user1@example.com", "user2@example.com"]}, "album_id": {"$in": ["album1"]}}
+            ),
+            # State $in is two index ranges merged in next_attempt_at order, not a sort
+            "outbox claim": database.outbox.find(claim_filter("email", datetime.utcnow()), sort=CLAIM_SORT, limit=1),
+        }
+        after = (250, ObjectId())
+        admin_pages = {
+            "admin list": NotificationFilter(),
+            "admin list by email": NotificationFilter(email="user1@example.com"),
+            "admin list by album and method": NotificationFilter(album_id="album1", method="email"),
+        }
+        for name, filters in admin_pages.items():
+            cursors[name] = database.notifications.find(
+                notification_filter(filters, after), sort=NOTIFICATION_SORT, limit=100
+            )
+        assert set(cursors) <= set(HOT_QUERY_SHAPES)
+        for name, cursor in cursors.items():
+            stages = plan_stages(cursor.explain()["queryPlanner"])
+            assert "COLLSCAN" not in stages, f"{name} scans the collection: {stages}"
+            if name in admin_pages or name == "outbox claim":
+                assert "SORT" not in stages, f"{name} sorts in memory: {stages}"
+    finally:
+        client.drop_database(database)
+        client.close()
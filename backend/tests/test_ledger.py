@@ -0,0 +1,61 @@
+import pytest
+from unittest.mock import AsyncMock
+from app.models.mongoengine_models import Notification
+from app.services.ledger import NotificationLedger, notification_record
+
+ALBUM = {
+    "id": "x",
+    "name": "Dawn FM",
+    "artists": [{"id": "a1", "name": "The Weeknd"}],
+    "external_urls": {"spotify": "https://open.spotify.com/album/x"},
+}
+
+
+def sent(method, user):
+    return notification_record(method, user, ALBUM, {"a1"})
+
+
+@pytest.mark.asyncio
+async def test_ledger_flushes_in_bulk_when_buffer_is_full(mongo):
+    ledger = NotificationLedger(flush_size=2, flush_interval=60)
+    async with ledger:
+        await ledger.record_many([sent("email", {"email": "a@example.com"})])
+        assert Notification.objects.count() == 0
+        await ledger.record_many([sent("email", {"email": "b@example.com"})])
+        assert Notification.objects.count() == 2
+        await ledger.record_many([sent("sms", {"email": "b@example.com", "phone_number": "+1"})])
+
+    assert ledger.write_ops == 2
+    notification = Notification.objects(method="sms").first()
+    assert notification.album_name == "Dawn FM"
+    assert notification.album_artists_ids == ["a1"]
+    assert notification.phone_number == "+1"
+
+
+@pytest.mark.asyncio
+async def test_ledger_ignores_already_recorded_deliveries(mongo):
+    async with NotificationLedger() as ledger:
+        await ledger.record_many([sent("email", {"email": "a@example.com"})])
+
+    ledger = NotificationLedger()
+    async with ledger:
+        await ledger.record_many([sent("email", {"email": "a@example.com"})])
+        await ledger.record_many([sent("telegram", {"email": "a@example.com"})])
+
+    assert ledger.inserted == 1
+    assert Notification.objects.count() == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_its_records_for_the_next_one(mongo):
+    ledger = NotificationLedger(flush_size=1, flush_interval=60)
+    insert_many = ledger.repository.insert_many
+    ledger.repository.insert_many = AsyncMock(side_effect=ConnectionError("mongo down"))
+
+    with pytest.raises(ConnectionError):
+        await ledger.record_many([sent("email", {"email": "a@example.com"})])
+    ledger.repository.insert_many = insert_many
+    await ledger.record_many([sent("email", {"email": "b@example.com"})])
+
+    assert ledger.inserted == 2
+    assert sorted(n.email for n in Notification.objects) == ["a@example.com", "b@example.com"]
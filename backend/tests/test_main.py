@@ -0,0 +1,21 @@
+import pytest
+from unittest.mock import AsyncMock, Mock
+from app import main
+from app.db import mongoengine_db
+
+
+@pytest.mark.asyncio
+async def test_shutdown_closes_everything_even_when_one_close_fails(monkeypatch):
+    closers = {name: AsyncMock() for name in ("close_sms_client", "close_telegram_sender", "close_repositories")}
+    for name, close in closers.items():
+        monkeypatch.setattr(main, name, close)
+    monkeypatch.setattr(main, "close_smtp_pool", AsyncMock(side_effect=ConnectionError("smtp gone")))
+    monkeypatch.setattr(main.spotify_client, "close", AsyncMock())
+    close_connection = Mock()
+    monkeypatch.setattr(mongoengine_db, "close_connection", close_connection)
+
+    await main.shutdown_event()
+
+    assert all(close.await_count == 1 for close in closers.values())
+    main.spotify_client.close.assert_awaited_once()
+    close_connection.assert_called_once()
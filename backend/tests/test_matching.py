@@ -0,0 +1,30 @@
+from app.services.matching import SubscriberIndex
+
+
+def make_user(email, *artist_ids):
+    return {"email": email, "subscribed_artists": [{"id": a, "name": a} for a in artist_ids]}
+
+
+def make_album(album_id, *artist_ids):
+    return {"id": album_id, "artists": [{"id": a, "name": a} for a in artist_ids]}
+
+
+def test_match_goes_from_album_artists_to_subscribers():
+    alice = make_user("alice@example.com", "a1", "a2")
+    bob = make_user("bob@example.com", "a2")
+    carol = make_user("carol@example.com", "a3")
+    index = SubscriberIndex.build([alice, bob, carol])
+
+    matches = list(index.match([make_album("x", "a1", "a2"), make_album("y", "a9")]))
+
+    assert [(m.user["email"], m.album["id"], m.matched_artist_ids) for m in matches] == [
+        ("alice@example.com", "x", {"a1", "a2"}),
+        ("bob@example.com", "x", {"a2"}),
+    ]
+
+
+def test_duplicate_subscriptions_are_indexed_once():
+    index = SubscriberIndex.build([make_user("alice@example.com", "a1", "a1")])
+
+    assert index.subscribers("a1") == [make_user("alice@example.com", "a1", "a1")]
+    assert len(list(index.match([make_album("x", "a1")]))) == 1
@@ -0,0 +1,75 @@
+from app.services.message_templates import DIGEST_COMPOSERS, DIGEST_ITEM_RENDERERS, MessageRenderer, escape_markdown_v2
+
+ALBUM = {
+    "id": "x",
+    "name": "Dawn FM (Alternate World)",
+    "release_date": "2022-01-07",
+    "artists": [{"id": "a1", "name": "The Weeknd"}, {"id": "a2", "name": "Tyler, the Creator & Co."}],
+    "external_urls": {"spotify": "https://open.spotify.com/album/x"},
+}
+
+
+def test_renders_each_album_artists_and_channel_once():
+    renderer = MessageRenderer()
+
+    first = renderer.render(ALBUM, {"a1"}, "email")
+    assert renderer.render(ALBUM, ["a1"], "email") is first
+    renderer.render(ALBUM, {"a1", "a2"}, "email")
+    renderer.render(ALBUM, {"a1"}, "telegram")
+
+    assert (renderer.renders, renderer.hits) == (3, 1)
+    assert first.subject == "🎵 New Release: The Weeknd just dropped Dawn FM (Alternate World)!"
+    assert "👤 By: The Weeknd (matched your subscriptions)" in first.body
+
+
+def test_channel_formats():
+    renderer = MessageRenderer(sms_max_length=60)
+
+    email = renderer.render(ALBUM, {"a2"}, "email")
+    assert "Tyler, the Creator &amp; Co." in email.html
+    assert '<a href="https://open.spotify.com/album/x">' in email.html
+
+    telegram = renderer.render(ALBUM, {"a1"}, "telegram")
+    assert telegram.subject is None and telegram.html is None
+    assert "*New Album Released: Dawn FM \\(Alternate World\\)*" in telegram.body
+    assert "📅 Release Date: 2022\\-01\\-07" in telegram.body
+    assert telegram.body.endswith("[Listen on Spotify](https://open.spotify.com/album/x)")
+
+    sms = renderer.render(ALBUM, {"a1", "a2"}, "sms")
+    assert len(sms.body) <= 60
+    assert sms.body.endswith("... https://open.spotify.com/album/x")
+    assert sms.body.startswith("New release: Dawn FM")
+
+
+def test_escape_markdown_v2():
+    assert escape_markdown_v2("a_b*c[d](e)~f`g>h#i+j-k=l|m{n}o.p!q\\") == (
+        "a\\_b\\*c\\[d\\]\\(e\\)\\~f\\`g\\>h\\#i\\+j\\-k\\=l\\|m\\{n\\}o\\.p\\!q\\\\"
+    )
+
+
+def test_oversized_digests_are_split_so_every_album_is_listed():
+    albums = [
+        ({**ALBUM, "id": f"album{i}", "name": f"Album number {i}"}, {"a1"})
+        for i in range(100)
+    ]
+    renderer = MessageRenderer(sms_max_length=160)
+
+    for channel, max_length in (("telegram", 4096), ("sms", 160)):
+        parts = renderer.render_digest(albums, channel)
+        assert len(parts) > 1
+        assert [album["id"] for part in parts for album, _ in part.items] == [album["id"] for album, _ in albums]
+        for (message, listed), following in zip(parts, parts[1:] + [None]):
+            assert len(message.body) <= max_length
+            assert all(album["name"] in message.body for album, _ in listed)
+            if following is not None:
+                # Packed tight: one more album would not have fit
+                lines = [
+                    renderer._render(DIGEST_ITEM_RENDERERS, {}, album, matched, channel)
+                    for album, matched in listed + following.items[:1]
+                ]
+                assert len(DIGEST_COMPOSERS[channel](lines, 160).body) > max_length
+
+    [email] = renderer.render_digest(albums, "email")
+    assert email.message.subject == "🎵 100 new releases from artists you follow"
+    [single] = renderer.render_digest(albums[:1], "sms")
+    assert single.message is renderer.render(*albums[0], "sms")
@@ -0,0 +1,232 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+from app.core.config import settings
+from app.models.mongoengine_models import IngestCursor, Notification, OutboxMessage, User, ArtistSubscription
+from app.services import notifier
+from app.utils.sharding import all_shards, shard_key_for
+from conftest import ALBUM
+
+
+@pytest.mark.asyncio
+async def test_notifies_subscribers_once_per_method(mongo, senders):
+    User(
+        email="fan@example.com",
+        subscribed_artists=[ArtistSubscription(id="a1", name="The Weeknd")],
+        notification_methods=["email", "telegram"],
+        telegram_chat_id="42",
+    ).save()
+    User(email="other@example.com", subscribed_artists=[ArtistSubscription(id="a2", name="Other")]).save()
+
+    stats = await notifier.check_new_releases_and_notify()
+
+    assert stats.notifications_sent == 2
+    assert stats.users == 1  # only the album's subscribers are read
+    assert stats.messages_rendered == 2  # one email, one telegram message
+    assert stats.dedup_queries == 2  # ledger and outbox
+    senders["email"].assert_awaited_once()
+    assert senders["email"].await_args.args[0] == "fan@example.com"
+    senders["telegram"].assert_awaited_once()
+    senders["sms"].assert_not_awaited()
+    assert Notification.objects.count() == 2
+
+    # The album is already in the release store, so the next run skips it
+    stats = await notifier.check_new_releases_and_notify()
+
+    assert stats.releases_seen == 1
+    assert stats.albums == 0
+    assert stats.users == 0
+    assert senders["email"].await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_delivery_is_retried_from_the_outbox(mongo, senders):
+    User(
+        email="fan@example.com",
+        subscribed_artists=[ArtistSubscription(id="a1", name="The Weeknd")],
+        notification_methods=["email"],
+    ).save()
+    senders["email"].side_effect = [ConnectionError("smtp down"), None]
+
+    stats = await notifier.check_new_releases_and_notify()
+    assert stats.notifications_queued == 1
+    assert stats.notifications_failed == 1
+    assert Notification.objects.count() == 0
+    message = OutboxMessage.objects.get()
+    assert (message.state, message.attempts) == ("pending", 1)
+
+    # The album is not matched again, and its retry is not due yet
+    stats = await notifier.check_new_releases_and_notify()
+    assert stats.albums == 0
+    assert senders["email"].await_count == 1
+
+    OutboxMessage.objects.update(next_attempt_at=datetime.utcnow())
+    stats = await notifier.deliver_outbox()
+    assert stats.notifications_sent == 1
+    assert Notification.objects.count() == 1
+    assert OutboxMessage.objects.get().state == "sent"
+
+
+@pytest.mark.asyncio
+async def test_failing_recipient_does_not_hold_back_the_others(mongo, senders, monkeypatch):
+    monkeypatch.setattr(settings, "outbox_max_attempts", 1)
+    for i in range(3):
+        User(
+            email=f"fan{i}@example.com",
+            subscribed_artists=[ArtistSubscription(id="a1", name="The Weeknd")],
+            notification_methods=["email"],
+        ).save()
+
+    def send_email(to, *args):
+        if to == "fan1@example.com":
+            raise ValueError("mailbox unavailable")
+
+    senders["email"].side_effect = send_email
+
+    stats = await notifier.check_new_releases_and_notify()
+
+    assert (stats.notifications_sent, stats.notifications_failed, stats.notifications_dead) == (2, 1, 1)
+    assert sorted(Notification.objects.scalar("email")) == ["fan0@example.com", "fan2@example.com"]
+    dead = OutboxMessage.objects.get(state="dead")
+    assert dead.recipient == "fan1@example.com"
+    assert dead.last_error == "ValueError: mailbox unavailable"
+
+
+@pytest.mark.asyncio
+async def test_each_shard_notifies_its_own_users(mongo, senders):
+    shards = all_shards(2)
+    emails = {}
+    i = 0
+    while len(emails) < 2:
+        email = f"fan{i}@example.com"
+        shard = next(s for s in shards if shard_key_for(email) in s)
+        emails.setdefault(shard, email)
+        i += 1
+    for email in emails.values():
+        User(
+            email=email,
+            subscribed_artists=[ArtistSubscription(id="a1", name="The Weeknd")],
+            notification_methods=["email"],
+        ).save()
+
+    first = await notifier.check_new_releases_and_notify(shards[0])
+    second = await notifier.check_new_releases_and_notify(shards[1])
+
+    # The album is recorded once but each shard keeps its own cursor
+    assert (first.albums, second.albums) == (1, 1)
+    assert (first.users, second.users) == (1, 1)
+    assert sorted(call.args[0] for call in senders["email"].await_args_list) == sorted(emails.values())
+
+
+@pytest.mark.asyncio
+async def test_scan_matching_reads_every_user(mongo, senders, monkeypatch):
+    monkeypatch.setattr(settings, "notifier_matching", "scan")
+    User(
+        email="fan@example.com",
+        subscribed_artists=[ArtistSubscription(id="a1", name="The Weeknd")],
+        notification_methods=["email"],
+    ).save()
+    User(email="other@example.com", subscribed_artists=[ArtistSubscription(id="a2", name="Other")]).save()
+
+    stats = await notifier.check_new_releases_and_notify()
+
+    assert stats.users == 2
+    assert stats.notifications_sent == 1
+    assert senders["email"].await_args.args[0] == "fan@example.com"
+
+
+@pytest.mark.asyncio
+async def test_subscribers_of_the_same_album_share_one_rendered_message(mongo, senders):
+    for i in range(3):
+        User(
+            email=f"fan{i}@example.com",
+            subscribed_artists=[ArtistSubscription(id="a1", name="The Weeknd")],
+            notification_methods=["email"],
+        ).save()
+
+    stats = await notifier.check_new_releases_and_notify()
+
+    assert stats.notifications_sent == 3
+    assert stats.messages_rendered == 1
+    assert {call.args[1:] for call in senders["email"].await_args_list} == {senders["email"].await_args.args[1:]}
+
+
+def new_releases(monkeypatch, *albums):
+    monkeypatch.setattr(
+        notifier.spotify_client,
+        "get_new_releases",
+        AsyncMock(return_value={"albums": {"items": list(albums)}}),
+    )
+
+
+@pytest.mark.asyncio
+async def test_digest_sends_one_message_per_user_and_channel(mongo, senders, monkeypatch):
+    monkeypatch.setattr(settings, "notifier_digest", True)
+    new_releases(monkeypatch, ALBUM, {**ALBUM, "id": "y", "name": "After Hours"})
+    User(
+        email="fan@example.com",
+        subscribed_artists=[ArtistSubscription(id="a1", name="The Weeknd")],
+        notification_methods=["email", "telegram"],
+        telegram_chat_id="42",
+    ).save()
+
+    stats = await notifier.check_new_releases_and_notify()
+
+    assert stats.notifications_sent == 2
+    senders["email"].assert_awaited_once()
+    assert senders["email"].await_args.args[1] == "🎵 2 new releases from artists you follow"
+    assert "After Hours" in senders["telegram"].await_args.args[1]
+    # Every album is still recorded per channel for dedup
+    assert sorted(Notification.objects.scalar("album_id", "method")) == [
+        ("x", "email"), ("x", "telegram"), ("y", "email"), ("y", "telegram"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_digest_window_holds_releases_until_it_closes(mongo, senders, monkeypatch):
+    monkeypatch.setattr(settings, "notifier_digest", True)
+    monkeypatch.setattr(settings, "notifier_digest_window_seconds", 3600)
+    User(
+        email="fan@example.com",
+        subscribed_artists=[ArtistSubscription(id="a1", name="The Weeknd")],
+        notification_methods=["email"],
+    ).save()
+
+    assert (await notifier.check_new_releases_and_notify()).notifications_sent == 1
+
+    new_releases(monkeypatch, {**ALBUM, "id": "y", "name": "After Hours"})
+    stats = await notifier.check_new_releases_and_notify()
+    assert stats.notifications_sent == 0
+    assert stats.releases_seen == 1
+
+    new_releases(monkeypatch, {**ALBUM, "id": "z", "name": "Starboy"})
+    IngestCursor.objects(source="digest").update(last_success_at=datetime.utcnow() - timedelta(hours=2))
+    stats = await notifier.check_new_releases_and_notify()
+    assert stats.notifications_sent == 1
+    assert stats.albums == 2
+    assert senders["email"].await_args.args[1] == "🎵 2 new releases from artists you follow"
+
+
+@pytest.mark.asyncio
+async def test_digest_leaves_out_albums_already_in_the_outbox(mongo, senders, monkeypatch):
+    monkeypatch.setattr(settings, "notifier_digest", True)
+    new_releases(monkeypatch, ALBUM, {**ALBUM, "id": "y", "name": "After Hours"})
+    User(
+        email="fan@example.com",
+        subscribed_artists=[ArtistSubscription(id="a1", name="The Weeknd")],
+        notification_methods=["email"],
+    ).save()
+    # Queued by a run that crashed before committing its cursors, retry not due yet
+    OutboxMessage(
+        channel="email",
+        recipient="fan@example.com",
+        body="Dawn FM",
+        keys=["fan@example.com|x|email"],
+        next_attempt_at=datetime.utcnow() + timedelta(hours=1),
+    ).save()
+
+    stats = await notifier.check_new_releases_and_notify()
+
+    assert stats.notifications_queued == 1
+    assert "After Hours" in senders["email"].await_args.args[1]
+    assert OutboxMessage.objects.get(state="sent").keys == ["fan@example.com|y|email"]
@@ -0,0 +1,150 @@
+import asyncio
+import time
+import pytest
+from datetime import datetime, timedelta
+from app.models.mongoengine_models import OutboxMessage
+from app.services.dispatcher import ChannelLimits, Dispatcher, OutgoingMessage
+from app.services.ledger import NotificationLedger
+from app.services.outbox import Outbox, _without_queued, delivery_key
+from app.services.run_stats import RunStats
+
+
+async def queue(outbox: Outbox, *emails: str):
+    for email in emails:
+        await outbox.add(
+            OutgoingMessage("email", email, "New release"),
+            keys=[delivery_key(email, "x", "email")],
+            notifications=[{"email": email, "album_id": "x", "method": "email"}],
+        )
+    await outbox.flush()
+
+
+@pytest.mark.asyncio
+async def test_each_message_is_claimed_once_oldest_first(mongo):
+    await queue(Outbox(owner="a"), "first@example.com", "second@example.com")
+
+    first = await Outbox(owner="a").claim("email")
+    second = await Outbox(owner="b").claim("email")
+
+    assert (first["recipient"], first["claimed_by"], first["attempts"]) == ("first@example.com", "a", 1)
+    assert (second["recipient"], second["claimed_by"]) == ("second@example.com", "b")
+    assert await Outbox(owner="c").claim("email") is None
+    assert await Outbox(owner="c").claim("sms") is None
+
+
+@pytest.mark.asyncio
+async def test_queued_deliveries_are_not_queued_again(mongo):
+    outbox = Outbox()
+    await queue(outbox, "fan@example.com")
+    await queue(outbox, "fan@example.com", "other@example.com")
+
+    assert outbox.queued == 2
+    assert OutboxMessage.objects.count() == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_sends_back_off_then_dead_letter(mongo):
+    outbox = Outbox(max_attempts=2, backoff_base=30)
+    await queue(outbox, "fan@example.com")
+
+    message = await outbox.claim("email")
+    assert await outbox.fail(message, ConnectionError("smtp down")) == "pending"
+    retry_at = OutboxMessage.objects.get().next_attempt_at
+    assert timedelta(seconds=29) < retry_at - datetime.utcnow() <= timedelta(seconds=30)
+    assert await outbox.claim("email") is None
+
+    OutboxMessage.objects.update(next_attempt_at=datetime.utcnow())
+    message = await outbox.claim("email")
+    assert await outbox.fail(message, ConnectionError("smtp down")) == "dead"
+    dead = OutboxMessage.objects.get()
+    assert (dead.state, dead.attempts, dead.last_error) == ("dead", 2, "ConnectionError: smtp down")
+    assert await outbox.claim("email") is None
+
+
+def test_backoff_doubles_up_to_its_cap():
+    outbox = Outbox(backoff_base=30, backoff_max=100)
+
+    assert [outbox.backoff(attempts) for attempts in (1, 2, 3, 4)] == [30, 60, 100, 100]
+
+
+@pytest.mark.asyncio
+async def test_expired_claim_is_taken_over(mongo):
+    await queue(Outbox(), "fan@example.com")
+    stale = await Outbox(owner="dead-worker", lease_seconds=0).claim("email")
+
+    message = await Outbox(owner="b").claim("email")
+    assert (message["claimed_by"], message["attempts"]) == ("b", 2)
+
+    # The first claim's late failure doesn't touch the message
+    await Outbox(owner="dead-worker").fail(stale, ConnectionError("smtp down"))
+    assert OutboxMessage.objects.get().state == "sending"
+
+
+@pytest.mark.asyncio
+async def test_delivery_stops_claiming_at_its_deadline(mongo):
+    outbox = Outbox()
+    await queue(outbox, *(f"fan{i}@example.com" for i in range(20)))
+
+    async def send(message):
+        await asyncio.sleep(0.05)
+
+    stats = RunStats()
+    start = time.monotonic()
+    async with NotificationLedger() as ledger:
+        async with Dispatcher({"email": send}, {"email": ChannelLimits(concurrency=1)}) as dispatcher:
+            await outbox.deliver(dispatcher, ledger, stats, timeout=0.1)
+
+    assert time.monotonic() - start < 0.5
+    assert 0 < stats.notifications_sent < 20
+    assert OutboxMessage.objects(state="sent").count() == stats.notifications_sent
+    assert OutboxMessage.objects(state="pending").count() == 20 - stats.notifications_sent
+
+
+@pytest.mark.asyncio
+async def test_digest_overlapping_a_queued_message_keeps_only_the_rest(mongo):
+    await queue(Outbox(), "fan@example.com")
+    digest = {
+        "_id": "rejected",
+        "body": "2 new releases",
+        "keys": [delivery_key("fan@example.com", album_id, "email") for album_id in ("x", "y")],
+        "notifications": [{"album_id": album_id} for album_id in ("x", "y")],
+    }
+
+    assert await Outbox().queued_keys([("fan@example.com", "x"), ("fan@example.com", "y")]) == {
+        ("fan@example.com", "x", "email"),
+    }
+    # What a unique-key rejection of the digest is queued again with
+    assert _without_queued(digest) == {
+        "body": "2 new releases",
+        "keys": ["fan@example.com|y|email"],
+        "notifications": [{"album_id": "y"}],
+    }
+
+
+@pytest.mark.asyncio
+async def test_a_sent_message_is_recorded_and_marked_sent_despite_a_failed_write(mongo, monkeypatch):
+    outbox = Outbox()
+    await queue(outbox, "fan@example.com")
+    complete = outbox.complete
+    calls = []
+
+    async def flaky_complete(message):
+        calls.append(message["_id"])
+        if len(calls) == 1:
+            raise ConnectionError("mongo blip")
+        await complete(message)
+
+    monkeypatch.setattr(outbox, "complete", flaky_complete)
+
+    async def send(message):
+        pass
+
+    stats = RunStats()
+    async with NotificationLedger() as ledger:
+        async with Dispatcher({"email": send}, {"email": ChannelLimits(concurrency=1)}) as dispatcher:
+            await outbox.deliver(dispatcher, ledger, stats)
+
+    assert len(calls) == 2
+    assert OutboxMessage.objects.get().state == "sent"
+    assert ledger.inserted == 1
+    assert stats.notifications_sent == 1
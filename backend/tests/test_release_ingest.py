@@ -0,0 +1,40 @@
+import pytest
+from app.services.release_ingest import PAGE_SIZE, batched, iter_new_releases
+
+
+class FakeBrowse:
+    def __init__(self, albums_by_market):
+        self.albums_by_market = albums_by_market
+        self.calls = []
+
+    async def get_new_releases(self, country, limit, offset):
+        self.calls.append((country, offset))
+        albums = self.albums_by_market[country]
+        page = albums[offset:offset + limit]
+        return {"albums": {
+            "items": page,
+            "total": len(albums),
+            "next": "more" if offset + limit < len(albums) else None,
+        }}
+
+
+@pytest.mark.asyncio
+async def test_pages_markets_concurrently_and_dedupes_albums():
+    us = [{"id": f"album{i}"} for i in range(120)]
+    gb = [{"id": "album0"}, {"id": "uk-only"}]
+    client = FakeBrowse({"US": us, "GB": gb})
+
+    albums = [album["id"] async for album in iter_new_releases(client, ["US", "GB"], max_pages=2)]
+
+    assert sorted(client.calls) == [("GB", 0), ("US", 0), ("US", PAGE_SIZE)]
+    assert len(albums) == len(set(albums)) == 2 * PAGE_SIZE + 1
+    assert "uk-only" in albums
+
+
+@pytest.mark.asyncio
+async def test_batched_groups_the_stream():
+    async def stream():
+        for i in range(5):
+            yield i
+
+    assert [batch async for batch in batched(stream(), 2)] == [[0, 1], [2, 3], [4]]
@@ -0,0 +1,101 @@
+import pytest
+from datetime import datetime, timedelta
+from app.models.mongoengine_models import IngestCursor, Release
+from app.services.release_store import SOURCE_ARTISTS, SOURCE_NEW_RELEASES, ReleaseStore
+
+
+def album(album_id):
+    return {
+        "id": album_id,
+        "name": f"Album {album_id}",
+        "release_date": "2024-05-01",
+        "artists": [{"id": "a1", "name": "Artist", "uri": "spotify:artist:a1"}],
+        "external_urls": {"spotify": f"https://open.spotify.com/album/{album_id}"},
+        "available_markets": ["US", "GB"],
+    }
+
+
+@pytest.mark.asyncio
+async def test_record_new_returns_only_first_sightings(mongo):
+    store = ReleaseStore()
+    await store.load_cursors()
+
+    first = await store.record_new([(SOURCE_NEW_RELEASES, album("x")), (SOURCE_ARTISTS, album("y"))])
+    again = await store.record_new([(SOURCE_NEW_RELEASES, album("x")), (SOURCE_NEW_RELEASES, album("z"))])
+
+    assert [a["id"] for a in first] == ["x", "y"]
+    assert [a["id"] for a in again] == ["z"]
+    assert "available_markets" not in first[0]
+    assert Release.objects.count() == 3
+    assert Release.objects.get(album_id="y").source == SOURCE_ARTISTS
+    assert Release.objects.get(album_id="x").artist_ids == ["a1"]
+
+
+@pytest.mark.asyncio
+async def test_pending_holds_albums_until_a_run_commits(mongo):
+    store = ReleaseStore()
+    await store.load_cursors()
+    await store.record_new([(SOURCE_NEW_RELEASES, album("x"))])
+
+    # A run that did not commit leaves its albums pending for the next one
+    next_run = ReleaseStore()
+    await next_run.load_cursors()
+    assert [a["id"] for a in await next_run.pending()] == ["x"]
+
+    await next_run.commit()
+    assert IngestCursor.objects.get(source=SOURCE_NEW_RELEASES).last_success_at is not None
+
+    later_run = ReleaseStore()
+    await later_run.load_cursors()
+    assert await later_run.pending() == []
+
+
+@pytest.mark.asyncio
+async def test_pending_uses_each_sources_cursor(mongo):
+    now = datetime.utcnow()
+    IngestCursor(source=SOURCE_NEW_RELEASES, last_success_at=now).save()
+    IngestCursor(source=SOURCE_ARTISTS, last_success_at=now - timedelta(hours=2)).save()
+    await ReleaseStore().record_new([(SOURCE_NEW_RELEASES, album("x")), (SOURCE_ARTISTS, album("y"))])
+    Release.objects(album_id="x").update(set__first_seen_at=now - timedelta(hours=1))
+    Release.objects(album_id="y").update(set__first_seen_at=now - timedelta(hours=1))
+
+    store = ReleaseStore()
+    await store.load_cursors()
+
+    assert [a["id"] for a in await store.pending()] == ["y"]
+
+
+@pytest.mark.asyncio
+async def test_scopes_keep_separate_cursors(mongo):
+    shards = ["shard-1-of-2", "shard-2-of-2"]
+    IngestCursor(source=SOURCE_NEW_RELEASES, last_success_at=datetime.utcnow() - timedelta(hours=1)).save()
+    first = ReleaseStore(scope="shard-1-of-2", peers=shards)
+    await first.load_cursors()
+    assert [a["id"] for a in await first.record_new([(SOURCE_NEW_RELEASES, album("x"))])] == ["x"]
+    await first.commit()
+
+    # Seeded together with the first shard, not from its newer cursor
+    second = ReleaseStore(scope="shard-2-of-2", peers=shards)
+    await second.load_cursors()
+    assert [a["id"] for a in await second.record_new([(SOURCE_NEW_RELEASES, album("x"))])] == ["x"]
+    assert IngestCursor.objects(source="shard-1-of-2:new_releases").count() == 1
+
+
+@pytest.mark.asyncio
+async def test_new_scopes_start_where_earlier_runs_left_off(mongo):
+    now = datetime.utcnow().replace(microsecond=0)  # Mongo keeps milliseconds
+    await ReleaseStore().record_new([(SOURCE_NEW_RELEASES, album("old")), (SOURCE_ARTISTS, album("y"))])
+    Release.objects(album_id="old").update(set__first_seen_at=now - timedelta(days=30))
+    Release.objects(album_id="y").update(set__first_seen_at=now - timedelta(days=30))
+    IngestCursor(source=SOURCE_NEW_RELEASES, last_success_at=now - timedelta(days=1)).save()
+    IngestCursor(source=f"shard-1-of-2:{SOURCE_ARTISTS}", last_success_at=now - timedelta(days=2)).save()
+    IngestCursor(source=f"shard-2-of-2:{SOURCE_ARTISTS}", last_success_at=now - timedelta(days=1)).save()
+    await ReleaseStore().record_new([(SOURCE_NEW_RELEASES, album("new"))])
+
+    store = ReleaseStore(scope="shard-3-of-4", peers=[f"shard-{i}-of-4" for i in range(1, 5)])
+    await store.load_cursors()
+
+    # The 30-day-old history is not replayed
+    assert [a["id"] for a in await store.pending()] == ["new"]
+    assert store.cursors == {SOURCE_NEW_RELEASES: now - timedelta(days=1), SOURCE_ARTISTS: now - timedelta(days=2)}
+    assert IngestCursor.objects(source__startswith="shard-1-of-4:").count() == 2
@@ -0,0 +1,142 @@
+import pytest
+from datetime import datetime, timedelta
+from app.repositories.base import NotificationFilter, UserRepository
+from app.repositories.memory_repositories import InMemoryNotificationRepository, InMemoryUserRepository
+from app.repositories.mongoengine_repositories import MongoEngineNotificationRepository, MongoEngineUserRepository
+from app.utils.sharding import all_shards
+
+
+@pytest.fixture(params=["memory", "mongoengine"])
+def repositories(request):
+    if request.param == "memory":
+        return InMemoryUserRepository(), InMemoryNotificationRepository()
+    request.getfixturevalue("mongo")
+    return MongoEngineUserRepository(), MongoEngineNotificationRepository()
+
+
+def subscriber(email, *artist_ids, **fields):
+    return {
+        "email": email,
+        "subscribed_artists": [{"id": artist_id, "name": artist_id.upper(), "url": None} for artist_id in artist_ids],
+        "notification_methods": ["email"],
+        **fields,
+    }
+
+
+def notification(email, album_id, method="email", sent_at=datetime(2024, 1, 1)):
+    return {"email": email, "album_id": album_id, "album_name": "Album", "method": method, "sent_at": sent_at}
+
+
+@pytest.mark.asyncio
+async def test_upsert_creates_then_replaces_preferences(repositories):
+    users, _ = repositories
+
+    assert await users.upsert(subscriber("fan@example.com", "a1")) is True
+    created = await users.get("fan@example.com")
+    assert await users.upsert(subscriber("fan@example.com", "a2", telegram_chat_id="42")) is False
+
+    user = await users.get("fan@example.com")
+    assert user["subscribed_artists"] == [{"id": "a2", "name": "A2", "url": None}]
+    assert user["telegram_chat_id"] == "42"
+    assert user["created_at"] == created["created_at"]
+    assert isinstance(user["shard_key"], int)
+    assert await users.get("nobody@example.com") is None
+
+
+@pytest.mark.asyncio
+async def test_update_only_touches_existing_users(repositories):
+    users, _ = repositories
+    await users.upsert(subscriber("fan@example.com", "a1"))
+
+    assert await users.update("fan@example.com", phone_number="+100") is True
+    assert await users.update("nobody@example.com", phone_number="+100") is False
+    assert (await users.get("fan@example.com"))["phone_number"] == "+100"
+
+
+@pytest.mark.asyncio
+async def test_iter_batches_projects_and_shards(repositories):
+    users, _ = repositories
+    for i in range(7):
+        await users.upsert(subscriber(f"user{i}@example.com", f"a{i}"))
+
+    batches = [batch async for batch in users.iter_batches(batch_size=3)]
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert batches[0][0]["subscribed_artists"] == [{"id": "a0"}]
+    assert "created_at" not in batches[0][0]
+
+    sharded = [
+        row["email"]
+        for shard in all_shards(2)
+        async for batch in users.iter_batches(batch_size=10, shard=shard)
+        for row in batch
+    ]
+    assert sorted(sharded) == sorted(f"user{i}@example.com" for i in range(7))
+
+
+@pytest.mark.asyncio
+async def test_find_subscribers_returns_only_matching_users(repositories):
+    users, _ = repositories
+    await users.upsert(subscriber("both@example.com", "a1", "a2"))
+    await users.upsert(subscriber("one@example.com", "a3", "a1"))
+    await users.upsert(subscriber("none@example.com", "a4"))
+
+    found = [row async for batch in users.find_subscribers({"a1", "a2"}, batch_size=1) for row in batch]
+    assert sorted(row["email"] for row in found) == ["both@example.com", "one@example.com"]
+    assert "created_at" not in found[0]
+
+    sharded = [
+        row["email"]
+        for shard in all_shards(2)
+        async for batch in users.find_subscribers(["a3"], shard=shard)
+        for row in batch
+    ]
+    assert sharded == ["one@example.com"]
+
+
+@pytest.mark.asyncio
+async def test_insert_many_skips_recorded_notifications(repositories):
+    _, notifications = repositories
+
+    assert await notifications.insert_many([notification("a@example.com", "x"), notification("b@example.com", "x")]) == 2
+    assert await notifications.insert_many([notification("a@example.com", "x"), notification("a@example.com", "x", "sms")]) == 1
+
+    keys = await notifications.sent_keys(["a@example.com", "c@example.com"], ["x", "y"])
+    assert keys == {("a@example.com", "x", "email"), ("a@example.com", "x", "sms")}
+    assert await notifications.sent_keys([], ["x"]) == set()
+
+
+@pytest.mark.asyncio
+async def test_notification_pages_follow_sent_at_then_id(repositories):
+    _, notifications = repositories
+    start = datetime(2024, 1, 1)
+    # Three notifications share each timestamp, so pages have to break ties on _id
+    await notifications.insert_many([
+        notification(f"user{i % 2}@example.com", f"album{i}", sent_at=start + timedelta(minutes=i // 3))
+        for i in range(12)
+    ])
+
+    pages, after = [], None
+    while True:
+        page = await notifications.page(NotificationFilter(), limit=5, after=after)
+        if not page:
+            break
+        pages.append(page)
+        after = (page[-1]["sent_at"], page[-1]["_id"])
+    rows = [row for page in pages for row in page]
+    assert [len(page) for page in pages] == [5, 5, 2]
+    assert len({row["_id"] for row in rows}) == 12
+    assert rows == sorted(rows, key=lambda row: (row["sent_at"], row["_id"]), reverse=True)
+
+    filters = NotificationFilter(email="user1@example.com", since=start + timedelta(minutes=1), until=start + timedelta(minutes=3))
+    streamed = [row async for batch in notifications.iter_batches(filters, batch_size=2) for row in batch]
+    assert [row["album_id"] for row in streamed] == ["album7", "album5", "album3"]
+    assert streamed == await notifications.page(filters, limit=10)
+
+
+def test_a_repository_must_implement_every_method():
+    class Partial(UserRepository):
+        async def get(self, email):
+            return None
+
+    with pytest.raises(TypeError, match="iter_batches"):
+        Partial()
@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from app.models.mongoengine_models import JobLease
+from app.services.run_coordinator import LeaseLock, RunCoordinator
+
+
+@pytest.mark.asyncio
+async def test_only_one_instance_runs_a_cycle(mongo):
+    runs = []
+
+    async def job(shard):
+        runs.append(shard)
+        await asyncio.sleep(0.05)
+        return "done"
+
+    instances = [RunCoordinator("notifier", owner=f"worker-{i}", min_interval=60) for i in range(3)]
+    results = await asyncio.gather(*(instance.run_cycle(job) for instance in instances))
+
+    assert runs == [None]
+    assert sorted(map(len, results)) == [0, 0, 1]
+
+    # A late instance doesn't repeat the cycle that just completed
+    assert await RunCoordinator("notifier", owner="late", min_interval=60).run_cycle(job) == []
+    assert JobLease.objects.get(name="notifier").completed_at is not None
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_taken_over(mongo):
+    crashed = LeaseLock("notifier", "crashed-worker", ttl=60)
+    assert await crashed.acquire()
+    assert not await LeaseLock("notifier", "worker-2", ttl=60).acquire()
+
+    JobLease.objects(name="notifier").update(set__expires_at=datetime.utcnow() - timedelta(seconds=1))
+
+    assert await LeaseLock("notifier", "worker-2", ttl=60).acquire()
+    assert not await crashed.renew()
+
+
+@pytest.mark.asyncio
+async def test_instances_split_the_shards(mongo):
+    runs = []
+
+    async def job(shard):
+        runs.append(shard.index)
+        await asyncio.sleep(0.02)
+        return shard.index
+
+    instances = [RunCoordinator("notifier", owner=f"worker-{i}", shard_count=4, min_interval=60) for i in range(2)]
+    results = await asyncio.gather(*(instance.run_cycle(job) for instance in instances))
+
+    assert sorted(runs) == [0, 1, 2, 3]
+    assert all(results)
+
+
+@pytest.mark.asyncio
+async def test_job_is_cancelled_when_the_lease_is_lost(mongo):
+    started = asyncio.Event()
+
+    async def job(shard):
+        started.set()
+        await asyncio.sleep(10)
+
+    coordinator = RunCoordinator("notifier", owner="worker-1", ttl=0.15)
+    run = asyncio.create_task(coordinator.run_cycle(job))
+    await started.wait()
+    JobLease.objects(name="notifier").update(set__owner="worker-2")
+
+    assert await asyncio.wait_for(run, timeout=2) == []
+
+
+@pytest.mark.asyncio
+async def test_a_failed_shard_does_not_abandon_the_others(mongo):
+    async def job(shard):
+        if shard.index == 0:
+            raise RuntimeError("worker crashed")
+        await asyncio.sleep(0.05)
+        return shard.index
+
+    coordinator = RunCoordinator("notifier", owner="worker", shard_count=3, concurrency=3)
+
+    assert sorted(await coordinator.run_cycle(job)) == [1, 2]
+    # Every lease was released, the failed shard's without marking it complete
+    leases = {lease.name: lease for lease in JobLease.objects}
+    assert all(lease.expires_at <= datetime.utcnow() for lease in leases.values())
+    assert leases["notifier:shard-1-of-3"].completed_at is None
+    assert leases["notifier:shard-3-of-3"].completed_at is not None
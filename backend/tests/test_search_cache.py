@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from app.services.search_cache import InMemoryCacheBackend, RedisCacheBackend, SearchCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+
+@pytest.mark.asyncio
+async def test_in_memory_backend_expires_and_evicts_least_recently_used():
+    clock = FakeClock()
+    backend = InMemoryCacheBackend(max_size=2, clock=clock)
+    await backend.set("a", 1, ttl=10)
+    await backend.set("b", 2, ttl=10)
+    await backend.get("a")
+    await backend.set("c", 3, ttl=10)
+
+    assert await backend.get("b") is None
+    assert await backend.get("a") == 1
+
+    clock.now = 11
+    assert await backend.get("a") is None
+    assert len(backend) == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_queries_share_one_fetch():
+    calls = []
+
+    async def fetch(query):
+        calls.append(query)
+        await asyncio.sleep(0.01)
+        return [{"id": "a1", "name": query}]
+
+    cache = SearchCache(InMemoryCacheBackend(), ttl=60)
+    results = await asyncio.gather(*(cache.get_or_fetch(q, fetch) for q in ["Weeknd", "weeknd ", " WEEKND"]))
+    await cache.get_or_fetch("weeknd", fetch)
+
+    assert calls == ["Weeknd"]
+    assert results[0] == results[1] == results[2]
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_round_trips_json():
+    redis = FakeRedis()
+    cache = SearchCache(RedisCacheBackend(redis), ttl=60)
+
+    async def fetch(query):
+        return [{"id": "a1"}]
+
+    await cache.get_or_fetch("adele", fetch)
+
+    assert list(redis.data) == ["search_artists:adele"]
+    assert await cache.get_or_fetch("Adele", fetch) == [{"id": "a1"}]
+    assert cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_fetch_is_not_cached():
+    async def fetch(query):
+        raise ConnectionError("spotify down")
+
+    cache = SearchCache(InMemoryCacheBackend(), ttl=60)
+    with pytest.raises(ConnectionError):
+        await cache.get_or_fetch("adele", fetch)
+    assert len(cache.backend) == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelling_the_first_caller_does_not_cancel_the_others():
+    async def fetch(query):
+        await asyncio.sleep(0.02)
+        return [{"id": "a1"}]
+
+    cache = SearchCache(InMemoryCacheBackend(), ttl=60)
+    leader = asyncio.create_task(cache.get_or_fetch("adele", fetch))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.get_or_fetch("adele", fetch))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == [{"id": "a1"}]
+    assert leader.cancelled()
+    assert await cache.backend.get("adele") == [{"id": "a1"}]
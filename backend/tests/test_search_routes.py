@@ -0,0 +1,37 @@
+import httpx
+import pytest
+from unittest.mock import AsyncMock
+from fastapi import FastAPI
+from app.api.v1.routes import spotify_search
+from app.core.spotify_scheduler import RateLimitedError
+from app.services.artist_catalog import ArtistCatalog
+from app.services.search_cache import InMemoryCacheBackend, SearchCache
+
+
+@pytest.fixture
+def client(monkeypatch):
+    catalog = ArtistCatalog()
+    monkeypatch.setattr(catalog, "add_many", AsyncMock())
+    monkeypatch.setattr(spotify_search, "artist_catalog", catalog)
+    monkeypatch.setattr(spotify_search, "search_cache", SearchCache(InMemoryCacheBackend(), ttl=60))
+    app = FastAPI()
+    app.include_router(spotify_search.router, prefix="/api/v1")
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_search_is_a_503_and_is_not_remembered(client, monkeypatch):
+    search = AsyncMock(side_effect=RateLimitedError("429"))
+    monkeypatch.setattr(spotify_search.spotify_client, "search_artists", search)
+
+    response = await client.get("/api/v1/search_artists", params={"q": "adele"})
+
+    assert response.status_code == 503
+    assert len(spotify_search.search_cache.backend) == 0
+    spotify_search.artist_catalog.add_many.assert_not_awaited()
+
+    search.side_effect = None
+    search.return_value = [{"id": "a1", "name": "Adele", "popularity": 88, "image_url": None}]
+    response = await client.get("/api/v1/search_artists", params={"q": "adele"})
+    assert [artist["id"] for artist in response.json()["artists"]] == ["a1"]
+    spotify_search.artist_catalog.add_many.assert_awaited_once()
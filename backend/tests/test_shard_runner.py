@@ -0,0 +1,79 @@
+import pytest
+from app.core.config import settings
+from app.models.mongoengine_models import ArtistSubscription, User
+from app.services import notifier
+from app.services.run_stats import RunStats
+from app.services.shard_runner import ShardProcessPool
+from app.utils.sharding import Shard
+
+
+def _no_database():
+    pass
+
+
+def _count_shard(shard):
+    return RunStats(users=shard.index + 1)
+
+
+@pytest.mark.asyncio
+async def test_pool_runs_shards_in_worker_processes():
+    async with ShardProcessPool(2, initializer=_no_database) as pool:
+        results = [await pool.run(Shard(i, 3), target=_count_shard) for i in range(3)]
+
+    assert [stats.users for stats in results] == [1, 2, 3]
+
+
+class InProcessPool:
+    """Stands in for worker processes, which can't see the mongomock database"""
+
+    def __init__(self, processes):
+        self.shards = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def run(self, shard):
+        self.shards.append(shard)
+        return await notifier.check_new_releases_and_notify(shard, fetch=False)
+
+
+@pytest.mark.asyncio
+async def test_process_mode_ingests_once_and_merges_shard_stats(mongo, senders, monkeypatch):
+    pools = []
+    monkeypatch.setattr(notifier, "ShardProcessPool", lambda processes: pools.append(InProcessPool(processes)) or pools[-1])
+    monkeypatch.setattr(settings, "notifier_processes", 2)
+    monkeypatch.setattr(settings, "notifier_shard_count", 4)
+    for i in range(8):
+        User(
+            email=f"fan{i}@example.com",
+            subscribed_artists=[ArtistSubscription(id="a1", name="The Weeknd")],
+            notification_methods=["email"],
+        ).save()
+
+    stats = await notifier.run_notifier_cycle()
+
+    notifier.spotify_client.get_new_releases.assert_awaited_once()
+    assert sorted(shard.index for shard in pools[0].shards) == [0, 1, 2, 3]
+    assert stats.releases_seen == 1
+    assert stats.users == 8
+    assert stats.notifications_sent == 8
+
+
+@pytest.mark.asyncio
+async def test_event_loop_mode_also_ingests_once_per_cycle(mongo, senders, monkeypatch):
+    monkeypatch.setattr(settings, "notifier_shard_count", 4)
+    for i in range(8):
+        User(
+            email=f"fan{i}@example.com",
+            subscribed_artists=[ArtistSubscription(id="a1", name="The Weeknd")],
+            notification_methods=["email"],
+        ).save()
+
+    stats = await notifier.run_notifier_cycle()
+
+    notifier.spotify_client.get_new_releases.assert_awaited_once()
+    assert stats.releases_seen == 1
+    assert stats.notifications_sent == 8
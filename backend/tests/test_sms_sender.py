@@ -0,0 +1,135 @@
+import asyncio
+import base64
+import socket
+import threading
+import time
+from urllib.parse import parse_qs
+import pytest
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.services.sms_sender import SMSError, TwilioSMSClient
+
+
+class FakeTwilio:
+    """Local stand-in for Twilio's Messages endpoint that records what it receives"""
+
+    def __init__(self):
+        self.messages = []
+        self.requests = 0
+        self.client_ports = set()
+        self.responses = []  # queued (status, body, headers) to return before succeeding
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delay = 0.0
+        self.app = FastAPI()
+        self.app.post("/2010-04-01/Accounts/{account_sid}/Messages.json")(self.create_message)
+
+    async def create_message(self, account_sid: str, request: Request):
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            self.client_ports.add(request.client.port)
+            if self.responses:
+                status, body, headers = self.responses.pop(0)
+                return JSONResponse(body, status_code=status, headers=headers)
+            form = {key: values[0] for key, values in parse_qs((await request.body()).decode()).items()}
+            self.messages.append({"account_sid": account_sid, "auth": request.headers["authorization"], **form})
+            return JSONResponse({"sid": f"SM{len(self.messages)}", "status": "queued"}, status_code=201)
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture
+def twilio():
+    fake = FakeTwilio()
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(fake.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield fake, f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join()
+
+
+def make_client(api_url, **kwargs):
+    return TwilioSMSClient("AC123", "secret", "+15550000000", api_url=api_url, backoff_base=0.01, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_sends_over_one_pooled_connection(twilio):
+    fake, api_url = twilio
+    client = make_client(api_url)
+
+    sids = [await client.send(f"+1555000000{i}", f"Hello {i}") for i in range(3)]
+    await client.close()
+
+    assert sids == ["SM1", "SM2", "SM3"]
+    assert fake.messages[1]["To"] == "+15550000001"
+    assert fake.messages[0]["From"] == "+15550000000"
+    assert fake.messages[2]["Body"] == "Hello 2"
+    assert fake.messages[0]["auth"] == "Basic " + base64.b64encode(b"AC123:secret").decode()
+    assert len(fake.client_ports) == 1  # keep-alive, no new connection per message
+
+
+@pytest.mark.asyncio
+async def test_retries_rate_limits_but_not_rejections(twilio):
+    fake, api_url = twilio
+    client = make_client(api_url)
+
+    fake.responses = [(429, {"code": 20429, "message": "Too Many Requests"}, {"Retry-After": "0"}), (503, {}, {})]
+    assert await client.send("+15551234567", "Hello") == "SM1"
+
+    fake.responses = [(400, {"code": 21211, "message": "Invalid 'To' Phone Number"}, {})]
+    with pytest.raises(SMSError) as error:
+        await client.send("not-a-number", "Hello")
+    assert (error.value.status_code, error.value.code) == (400, 21211)
+    assert fake.responses == []
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_errors_that_may_have_sent_the_message_are_not_retried(twilio):
+    fake, api_url = twilio
+    client = make_client(api_url)
+
+    fake.responses = [(500, {"message": "Internal Server Error"}, {}), (503, {}, {})]
+    with pytest.raises(SMSError) as error:
+        await client.send("+15551234567", "Hello")
+    assert (error.value.status_code, fake.requests) == (500, 1)
+
+    fake.responses = []
+    fake.delay = 0.2
+    client.timeout = 0.05
+    await client.close()
+    with pytest.raises(SMSError):
+        await client.send("+15551234567", "Hello")
+    # The timed-out request may have created the message, so it is not sent again
+    assert fake.requests == 2
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_send_many_bounds_concurrency_and_keeps_order(twilio):
+    fake, api_url = twilio
+    fake.delay = 0.02
+    client = make_client(api_url, max_retries=1)
+    fake.responses = [(400, {"code": 21211, "message": "Invalid 'To' Phone Number"}, {})]
+
+    results = await client.send_many([(f"+1555000{i:04d}", "Hello") for i in range(20)], concurrency=4)
+    await client.close()
+
+    # Results line up with the input, one rejection included
+    sids = {message["To"]: f"SM{i}" for i, message in enumerate(fake.messages, start=1)}
+    assert [type(result) for result in results].count(SMSError) == 1
+    assert all(
+        result == sids[f"+1555000{i:04d}"] for i, result in enumerate(results) if not isinstance(result, SMSError)
+    )
+    assert fake.max_in_flight <= 4
+    assert len(fake.client_ports) <= 4
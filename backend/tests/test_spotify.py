@@ -1,5 +1,8 @@
+import asyncio
+import httpx
 import pytest
 from unittest.mock import AsyncMock
+from app.core.config import settings
 from app.core.spotify_client import SpotifyClient
 
 @pytest.mark.asyncio
@@ -13,3 +16,111 @@ async def test_get_new_releases(monkeypatch):
     result = await client.get_new_releases()
     assert result == fake_data
     client.request_with_retry.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_requests_share_one_pooled_client():
+    seen_clients = set()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/token":
+            return httpx.Response(200, json={"access_token": "token", "expires_in": 3600})
+        return httpx.Response(200, json={"artists": {"items": [
+            {"name": "The Weeknd", "id": "a1", "popularity": 90, "images": []}
+        ]}})
+
+    client = SpotifyClient(transport=httpx.MockTransport(handler))
+    await client.start()
+    seen_clients.add(id(client._http))
+    artists = await client.search_artists("weeknd")
+    await client.search_artists("weeknd")
+    seen_clients.add(id(client._http))
+    await client.close()
+
+    assert artists[0]["id"] == "a1"
+    assert len(seen_clients) == 1
+    assert client._http is None
+
+
+def token_server(api_handler=None):
+    token_calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/token":
+            token_calls.append(request)
+            return httpx.Response(200, json={"access_token": f"token-{len(token_calls)}", "expires_in": 3600})
+        if api_handler:
+            return api_handler(request)
+        return httpx.Response(200, json={"albums": {"items": []}})
+
+    return httpx.MockTransport(handler), token_calls
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_token_refresh():
+    transport, token_calls = token_server()
+    client = SpotifyClient(transport=transport)
+
+    await asyncio.gather(*(client.get_new_releases() for _ in range(20)))
+    await client.close()
+
+    assert len(token_calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_401_refreshes_token_and_retries_once():
+    def api(request):
+        if request.headers["Authorization"] == "Bearer token-1":
+            return httpx.Response(401)
+        return httpx.Response(200, json={"albums": {"items": [{"id": "x"}]}})
+
+    transport, token_calls = token_server(api)
+    client = SpotifyClient(transport=transport)
+
+    result = await client.get_new_releases()
+    await client.close()
+
+    assert result == {"albums": {"items": [{"id": "x"}]}}
+    assert len(token_calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_token_is_renewed_in_background_before_expiry(monkeypatch):
+    monkeypatch.setattr(settings, "spotify_token_refresh_margin", 3599.9)
+    transport, token_calls = token_server()
+    client = SpotifyClient(transport=transport)
+
+    await client.authenticate()
+    await asyncio.sleep(0.3)
+    await client.close()
+
+    assert len(token_calls) >= 2
+    assert client.access_token != "token-1"
+
+
+@pytest.mark.asyncio
+async def test_artist_albums_are_paged_per_group_back_to_the_watermark():
+    pages = {
+        ("album", "0"): (["2024-05-01", "2024-01-01"], "2"),
+        ("album", "2"): (["2023-06-01", "2022-01-01"], "4"),
+        ("single", "0"): (["2024-06-01"], None),
+    }
+    requests = []
+
+    def albums(request: httpx.Request) -> httpx.Response:
+        group, offset = request.url.params["include_groups"], request.url.params.get("offset", "0")
+        requests.append((group, offset))
+        dates, next_offset = pages[(group, offset)]
+        next_url = f"{request.url.copy_with(query=None)}?include_groups={group}&offset={next_offset}" if next_offset else None
+        items = [{"id": f"{group}-{date}", "release_date": date} for date in dates]
+        return httpx.Response(200, json={"items": items, "next": next_url})
+
+    transport, _ = token_server(albums)
+    client = SpotifyClient(transport=transport)
+
+    found = await client.get_artist_albums("a1", since="2023-01-01")
+    await client.close()
+
+    assert requests == [("album", "0"), ("album", "2"), ("single", "0")]
+    assert [album["id"] for album in found][-1] == "single-2024-06-01"
+    assert len(found) == 5
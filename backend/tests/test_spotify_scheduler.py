@@ -0,0 +1,134 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+import httpx
+import pytest
+from app.core.spotify_client import SpotifyClient
+from app.core.spotify_scheduler import CircuitOpenError, Priority, RateLimitedError, SpotifyRequestScheduler, parse_retry_after
+
+
+def mock_spotify(handler):
+    client = SpotifyClient(transport=httpx.MockTransport(handler))
+    client.access_token = "token"
+    client.scheduler = SpotifyRequestScheduler(rate_per_second=0, backoff_base=0.001, failure_threshold=2, reset_timeout=60)
+    return client
+
+
+def test_parse_retry_after_accepts_seconds_and_bad_values():
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after("0.5") == 0.5
+    assert parse_retry_after(None) == 1.0
+    assert parse_retry_after("soon") == 1.0
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_every_caller():
+    calls = []
+
+    def handler(request):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0.2"})
+        return httpx.Response(200, json={"ok": True})
+
+    client = mock_spotify(handler)
+    start = time.monotonic()
+    first = asyncio.create_task(client.request_with_retry("https://api.spotify.com/v1/x", {}))
+    await asyncio.sleep(0.05)  # first call has been rate limited by now
+    others = [client.request_with_retry("https://api.spotify.com/v1/x", {}) for _ in range(2)]
+    results = await asyncio.gather(first, *others)
+
+    assert results == [{"ok": True}] * 3
+    # callers that arrived during the pause waited it out too
+    assert len(calls) == 4
+    assert all(t - start >= 0.2 for t in calls[1:])
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_are_served_before_background():
+    order = []
+    scheduler = SpotifyRequestScheduler(rate_per_second=100, burst=1)
+
+    async def call(name, priority):
+        async def send():
+            order.append(name)
+            return httpx.Response(200)
+        await scheduler.run(send, priority=priority)
+
+    await asyncio.gather(
+        call("poll-1", Priority.BACKGROUND),
+        call("poll-2", Priority.BACKGROUND),
+        call("poll-3", Priority.BACKGROUND),
+        call("search", Priority.INTERACTIVE),
+    )
+
+    assert order.index("search") < order.index("poll-3")
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_after_consecutive_failures():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(503)
+
+    client = mock_spotify(handler)
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.request_with_retry("https://api.spotify.com/v1/x", {}, max_retries=2)
+    assert client.scheduler.circuit_open
+
+    with pytest.raises(CircuitOpenError):
+        await client.request_with_retry("https://api.spotify.com/v1/x", {})
+    assert len(requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_lets_the_next_request_probe_again():
+    scheduler = SpotifyRequestScheduler(rate_per_second=0, failure_threshold=1, reset_timeout=0)
+    scheduler._record_failure()
+    assert scheduler.circuit_open
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(scheduler.run(hang), timeout=0.05)
+
+    async def ok():
+        return httpx.Response(200)
+
+    assert (await scheduler.run(ok)).status_code == 200
+    assert not scheduler.circuit_open
+
+
+@pytest.mark.asyncio
+async def test_search_raises_when_rate_limited_to_the_end():
+    client = mock_spotify(lambda request: httpx.Response(429, headers={"Retry-After": "0"}))
+    client.expires_at = datetime.now() + timedelta(hours=1)
+
+    with pytest.raises(RateLimitedError):
+        await client.search_artists("weeknd")
+
+
+@pytest.mark.asyncio
+async def test_album_lookups_raise_when_rate_limited_to_the_end():
+    pages = []
+
+    def handler(request):
+        # The first page of albums arrives; everything after it is rate limited
+        if request.url.path.endswith("/albums") and "artists" in request.url.path and not pages:
+            pages.append(request)
+            return httpx.Response(200, json={
+                "items": [{"id": "new", "release_date": "2024-02-01"}],
+                "next": f"{request.url}&offset=1",
+            })
+        return httpx.Response(429, headers={"Retry-After": "0"})
+
+    client = mock_spotify(handler)
+    client.expires_at = datetime.now() + timedelta(hours=1)
+
+    with pytest.raises(RateLimitedError):
+        await client.get_artist_albums("a1", since="2024-01-01")
+    with pytest.raises(RateLimitedError):
+        await client.get_albums(["new"])
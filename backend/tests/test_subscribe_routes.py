@@ -0,0 +1,46 @@
+import httpx
+import pytest
+from unittest.mock import AsyncMock
+from fastapi import FastAPI
+from app.api.v1.routes import subscribe
+
+
+@pytest.fixture
+def client(memory_repositories, monkeypatch):
+    monkeypatch.setattr(subscribe.artist_catalog, "add_many", AsyncMock())
+    app = FastAPI()
+    app.include_router(subscribe.router, prefix="/api/v1")
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_subscribe_creates_then_updates(client, memory_repositories):
+    users, _ = memory_repositories
+    body = {
+        "email": "fan@example.com",
+        "subscribed_artists": [{"id": "a1", "name": "The Weeknd", "url": None}],
+        "notification_methods": ["email"],
+    }
+
+    assert (await client.post("/api/v1/subscribe", json=body)).status_code == 201
+    body["notification_methods"] = ["email", "sms"]
+    assert (await client.post("/api/v1/subscribe", json=body)).status_code == 200
+
+    response = await client.get("/api/v1/subscribe", params={"email": "fan@example.com"})
+    assert response.status_code == 200
+    assert response.json()["notification_methods"] == ["email", "sms"]
+    assert response.json()["subscribed_artists"][0]["name"] == "The Weeknd"
+    assert len(users.users) == 1
+
+
+@pytest.mark.asyncio
+async def test_contact_updates(client):
+    await client.post("/api/v1/subscribe", json={"email": "fan@example.com", "subscribed_artists": []})
+
+    telegram = await client.post("/api/v1/update-telegram-id", json={"email": "fan@example.com", "telegram_chat_id": "42"})
+    phone = await client.post("/api/v1/update-phone-number", json={"email": "fan@example.com", "phone_number": "+100"})
+    missing = await client.post("/api/v1/update-phone-number", json={"email": "nobody@example.com", "phone_number": "+1"})
+
+    assert (telegram.status_code, phone.status_code, missing.status_code) == (200, 200, 404)
+    user = (await client.get("/api/v1/subscribe", params={"email": "fan@example.com"})).json()
+    assert (user["telegram_chat_id"], user["phone_number"]) == ("42", "+100")
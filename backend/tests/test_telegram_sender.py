@@ -0,0 +1,112 @@
+import asyncio
+import socket
+import threading
+import time
+from urllib.parse import parse_qs
+import pytest
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from telegram.error import RetryAfter
+from app.services.telegram_sender import TelegramSender
+
+
+class FakeBotAPI:
+    """Local stand-in for the Telegram Bot API that records what it receives"""
+
+    def __init__(self):
+        self.get_me_calls = 0
+        self.messages = []
+        self.client_ports = set()
+        self.flood_limited = 0  # answer this many sendMessage calls with a 429 first
+        self.app = FastAPI()
+        self.app.post("/bot{token}/getMe")(self.get_me)
+        self.app.post("/bot{token}/sendMessage")(self.send_message)
+
+    async def get_me(self, token: str):
+        self.get_me_calls += 1
+        return {"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "Notifier", "username": "notifier_bot"}}
+
+    async def send_message(self, token: str, request: Request):
+        self.client_ports.add(request.client.port)
+        if self.flood_limited:
+            self.flood_limited -= 1
+            return JSONResponse(
+                {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1", "parameters": {"retry_after": 1}},
+                status_code=429,
+            )
+        form = {key: values[0] for key, values in parse_qs((await request.body()).decode()).items()}
+        self.messages.append({**form, "at": time.monotonic()})
+        return {"ok": True, "result": {
+            "message_id": len(self.messages),
+            "date": int(time.time()),
+            "chat": {"id": int(form["chat_id"]), "type": "private"},
+            "text": form["text"],
+        }}
+
+
+@pytest.fixture
+def bot_api():
+    fake = FakeBotAPI()
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(fake.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield fake, f"http://127.0.0.1:{port}/bot"
+    server.should_exit = True
+    thread.join()
+
+
+def make_sender(base_url, **kwargs):
+    return TelegramSender("123:token", base_url=base_url, rate_per_second=0, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_initializes_once_and_reuses_connections(bot_api):
+    fake, base_url = bot_api
+    sender = make_sender(base_url, per_chat_interval=0, pool_size=2)
+
+    message_ids = [await sender.send(str(100 + i), f"Hello *{i}*", "MarkdownV2") for i in range(5)]
+    await sender.close()
+
+    assert message_ids == [1, 2, 3, 4, 5]
+    assert fake.get_me_calls == 1
+    assert fake.messages[0]["parse_mode"] == "MarkdownV2"
+    assert fake.messages[4]["text"] == "Hello *4*"
+    assert len(fake.client_ports) == 1
+
+
+@pytest.mark.asyncio
+async def test_spaces_messages_to_the_same_chat(bot_api):
+    fake, base_url = bot_api
+    sender = make_sender(base_url, per_chat_interval=0.1)
+
+    await sender.send_many([("1", "a"), ("1", "b"), ("2", "c"), ("1", "d")])
+    await sender.close()
+
+    same_chat = [message["at"] for message in fake.messages if message["chat_id"] == "1"]
+    assert len(same_chat) == 3
+    assert all(later - earlier >= 0.09 for earlier, later in zip(same_chat, same_chat[1:]))
+    other_chat = next(message["at"] for message in fake.messages if message["chat_id"] == "2")
+    assert other_chat < same_chat[1]  # other chats are not held back
+
+
+@pytest.mark.asyncio
+async def test_retries_after_flood_limit(bot_api):
+    fake, base_url = bot_api
+    sender = make_sender(base_url, per_chat_interval=0, max_retries=2)
+
+    fake.flood_limited = 1
+    start = time.monotonic()
+    results = await sender.send_many([("1", "a"), ("2", "b")])
+    assert time.monotonic() - start >= 1
+    assert sorted(results) == [1, 2]
+
+    fake.flood_limited = sender.max_retries
+    with pytest.raises(RetryAfter):
+        await asyncio.wait_for(sender.send("3", "c"), timeout=10)
+    await sender.close()
@@ -0,0 +1,39 @@
+from app.db.user_cursor import ensure_shard_keys, iter_user_batches
+from app.models.mongoengine_models import User, ArtistSubscription
+from app.utils.sharding import all_shards, shard_key_for
+
+
+def test_iter_user_batches_streams_projected_rows(mongo):
+    for i in range(5):
+        User(
+            email=f"user{i}@example.com",
+            subscribed_artists=[ArtistSubscription(id=f"a{i}", name=f"Artist {i}")],
+            notification_methods=["email"],
+        ).save()
+
+    batches = list(iter_user_batches(batch_size=2))
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    row = batches[0][0]
+    assert isinstance(row, dict)
+    assert row["subscribed_artists"] == [{"id": "a0"}]
+    assert "created_at" not in row and "updated_at" not in row
+
+
+def test_shards_partition_users_and_backfill_keys(mongo):
+    for i in range(20):
+        User(email=f"user{i}@example.com").save()
+    User._get_collection().update_many({"email": {"$in": ["user0@example.com", "user1@example.com"]}},
+                                       {"$unset": {"shard_key": ""}})
+
+    assert ensure_shard_keys(batch_size=1) == 2
+
+    shards = all_shards(3)
+    emails = [
+        [row["email"] for batch in iter_user_batches(batch_size=10, shard=shard) for row in batch]
+        for shard in shards
+    ]
+    assert sorted(sum(emails, [])) == sorted(f"user{i}@example.com" for i in range(20))
+    assert all(emails)
+    for shard, shard_emails in zip(shards, emails):
+        assert all(shard_key_for(email) in shard for email in shard_emails)